@@ -0,0 +1,161 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+""" Tailles de référence des jeux synthétiques """
+TAILLES = {'10k': 10_000, '1M': 1_000_000, '10M': 10_000_000}
+
+""" Colonnes numériques d'eco2mix-national-tr.csv (voir Preprocessing 1.py) """
+COLONNES_ECO2MIX = ["consommation", "prevision_j1", "prevision_j", "fioul", "charbon", "gaz", "nucleaire",
+                    "eolien", "solaire", "hydraulique", "pompage", "bioenergies", "ech_physiques", "taux_co2",
+                    "fioul_tac", "fioul_cogen", "fioul_autres", "gaz_tac", "gaz_cogen", "gaz_ccg",
+                    "hydraulique_fil_eau_eclusee", "hydraulique_lacs", "hydraulique_step_turbinage",
+                    "bioenergies_dechets", "bioenergies_biomasse", "bioenergies_biogaz"]
+
+COLONNE_GAZ = 'Consommation brute gaz (MW PCS 0°C) - GRTgaz'
+COLONNE_GAZ_TEREGA = 'Consommation brute gaz (MW PCS 0°C) - Teréga'
+COLONNE_ELEC = 'Consommation brute électricité (MW) - RTE'
+COLONNE_TOTALE = 'Consommation brute totale (MW)'
+
+REGIONS = ['Auvergne-Rhône-Alpes', 'Bourgogne-Franche-Comté', 'Bretagne', 'Centre-Val de Loire', 'Corse',
+           'Grand Est', 'Hauts-de-France', 'Île-de-France', 'Normandie', 'Nouvelle-Aquitaine', 'Occitanie',
+           'Pays de la Loire', 'Provence-Alpes-Côte dAzur']
+
+
+def parse_size(taille):
+    """Convertit '10k', '1M', '10M' ou un entier en nombre de lignes."""
+    if isinstance(taille, int):
+        return taille
+    if taille in TAILLES:
+        return TAILLES[taille]
+    multiplicateurs = {'k': 1_000, 'M': 1_000_000}
+    if taille[-1] in multiplicateurs:
+        return int(float(taille[:-1]) * multiplicateurs[taille[-1]])
+    return int(taille)
+
+
+def _horodatages(n, debut='1800-01-01'):
+    """Horodatages réguliers : horaires tant que la plage de dates le permet, au quart d'heure au-delà."""
+    pas = 'h' if n <= 3_000_000 else '15min'
+    return pd.date_range(debut, periods=n, freq=pas, tz='UTC')
+
+
+def _profil(horodatages, rng, base, amplitude, bruit):
+    """Consommation avec cycles annuel, hebdomadaire et journalier, plus un bruit gaussien."""
+    jour = horodatages.dayofyear.to_numpy()
+    heure = horodatages.hour.to_numpy()
+    semaine = horodatages.dayofweek.to_numpy()
+    valeurs = (base + amplitude * np.cos(2 * np.pi * (jour - 15) / 365.25)
+               + 0.15 * amplitude * np.sin(2 * np.pi * (heure - 7) / 24) - 0.1 * amplitude * (semaine >= 5))
+    return valeurs + rng.normal(0, bruit, len(horodatages))
+
+
+def grtgaz_frame(n, seed=0, taux_manquants=0.01):
+    """
+    Jeu horaire au format attendu par les tableaux de bord (Consomation&Mouvement enrichi) :
+    consommations gaz GRTgaz/Teréga, électricité RTE, totale et indicateur de mouvement social.
+    """
+    rng = np.random.default_rng(seed)
+    horodatages = _horodatages(n)
+    gaz = _profil(horodatages, rng, 60000, 40000, 3000).round()
+    terega = _profil(horodatages, rng, 3000, 2000, 200).round()
+    elec = _profil(horodatages, rng, 55000, 15000, 2000).round()
+    gaz[rng.random(n) < taux_manquants] = np.nan
+    return pd.DataFrame({
+        'Date - Heure': horodatages.strftime('%Y-%m-%dT%H:%M:%S+00:00'),
+        'Date': horodatages.strftime('%Y-%m-%d'),
+        'Heure': horodatages.strftime('%H:%M'),
+        COLONNE_GAZ: gaz,
+        'Statut - GRTgaz': rng.choice(['Définitif', 'Provisoire'], n, p=[0.9, 0.1]),
+        COLONNE_GAZ_TEREGA: terega,
+        'Statut - Teréga': rng.choice(['Définitif', 'Provisoire'], n, p=[0.9, 0.1]),
+        COLONNE_ELEC: elec,
+        'Statut - RTE': rng.choice(['Consolidé', 'Définitif'], n, p=[0.8, 0.2]),
+        COLONNE_TOTALE: np.nan_to_num(gaz, nan=60000) + terega + elec,
+        'operateur': rng.choice(['GRTgaz', 'Teréga'], n),
+        'mouvement_social': rng.random(n) < 0.05,
+    })
+
+
+def eco2mix_frame(n, seed=0):
+    """Jeu au format eco2mix-national-tr.csv (séparateur ';'), avec quelques valeurs manquantes."""
+    rng = np.random.default_rng(seed)
+    horodatages = _horodatages(n)
+    df = pd.DataFrame({'perimetre': 'France', 'nature': 'Données temps réel',
+                       'date': horodatages.strftime('%Y-%m-%d'), 'heure': horodatages.strftime('%H:%M'),
+                       'date_heure': horodatages.strftime('%Y-%m-%dT%H:%M:%S+00:00')})
+    consommation = _profil(horodatages, rng, 55000, 15000, 2000)
+    for colonne in COLONNES_ECO2MIX:
+        valeurs = consommation * rng.uniform(0.01, 0.3) + rng.normal(0, 500, n)
+        valeurs[rng.random(n) < 0.01] = np.nan
+        df[colonne] = valeurs.round()
+    df['consommation'] = consommation.round()
+    return df
+
+
+def dpe_frame(n, seed=0):
+    """Jeu au format dpe-france.csv (séparateur ';', virgule décimale, dates jj/mm/aaaa)."""
+    rng = np.random.default_rng(seed)
+    classes = np.array(list('ABCDEFG') + ['N'])
+    departements = np.array([f"{d:02d}" for d in range(1, 96) if d != 20] + ['2A', '2B'])
+    dates = pd.Timestamp('2013-01-01') + pd.to_timedelta(rng.integers(0, 3650, n), unit='D')
+    consommation = rng.gamma(4, 55, n).round(2)
+    departement = rng.choice(departements, n)
+    return pd.DataFrame({
+        'nom_methode_dpe': rng.choice(['3CL - DPE', 'Méthode 3CL', 'Méthode Facture', 'FACTURE - DPE'], n),
+        'version_methode_dpe': rng.choice(['V2012', '3CL-DPE, version 1.3', 'VERSION_2012'], n),
+        'date_etablissement_dpe': dates.strftime('%d/%m/%Y'),
+        'consommation_energie': consommation,
+        'classe_consommation_energie': classes[np.clip(np.searchsorted([50, 90, 150, 230, 330, 450], consommation)
+                                                       + (rng.random(n) < 0.1) * 7, 0, 7)],
+        'estimation_ges': rng.gamma(2, 15, n).round(2),
+        'classe_estimation_ges': rng.choice(classes, n),
+        'annee_construction': rng.integers(1850, 2022, n),
+        'surface_thermique_lot': rng.gamma(3, 30, n).round(2),
+        'latitude': rng.uniform(42, 51, n).round(6),
+        'longitude': rng.uniform(-4, 8, n).round(6),
+        'tr001_modele_dpe_type_libelle': rng.choice(['Vente', 'Location', 'Neuf'], n, p=[0.78, 0.18, 0.04]),
+        'tr002_type_batiment_description': rng.choice(['Maison Individuelle', 'Logement'], n),
+        'code_insee_commune_actualise': np.char.add(departement.astype(str),
+                                                    rng.integers(1, 700, n).astype(str).astype('<U3')),
+        'tv016_departement_code': departement,
+        'geo_adresse': '',
+        'geo_score': rng.uniform(0, 1, n).round(2),
+    })
+
+
+def regional_frame(n, seed=0):
+    """Jeu au format 'donnée concatenées.csv' utilisé par geolocalisation.py."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'annee': pd.to_datetime(rng.integers(2011, 2023, n).astype(str), format='%Y'),
+        'region': rng.choice(REGIONS, n),
+        'filiere': rng.choice(['Electricité', 'Gaz'], n),
+        'valeur': rng.gamma(2, 5000, n),
+    })
+
+
+""" Format d'écriture CSV de chaque jeu, identique aux fichiers réels """
+FORMATS_CSV = {
+    'grtgaz': {'generateur': grtgaz_frame, 'sep': ',', 'decimal': '.', 'encoding': 'utf-8'},
+    'eco2mix': {'generateur': eco2mix_frame, 'sep': ';', 'decimal': '.', 'encoding': 'utf-8'},
+    'dpe': {'generateur': dpe_frame, 'sep': ';', 'decimal': ',', 'encoding': 'cp850'},
+}
+
+
+def synthetic_csv(nom, n, data_dir, seed=0):
+    """
+    Écrit (une seule fois) un CSV synthétique et retourne son chemin.
+
+    Les fichiers sont réutilisés d'une exécution à l'autre : leur nom contient le jeu, la taille et la graine.
+    """
+    spec = FORMATS_CSV[nom]
+    os.makedirs(data_dir, exist_ok=True)
+    chemin = os.path.join(data_dir, f"{nom}_{n}_{seed}.csv")
+    if not os.path.exists(chemin):
+        temporaire = chemin + '.tmp'
+        spec['generateur'](n, seed).to_csv(temporaire, sep=spec['sep'], decimal=spec['decimal'],
+                                           encoding=spec['encoding'], index=False)
+        os.replace(temporaire, chemin)
+    return chemin
@@ -0,0 +1,343 @@
+"""
+Suite de benchmarks des chargements, agrégations, prévisions et rendus du projet.
+
+Exemples :
+    python run_benchmarks.py run --sizes 10k,1M
+    python run_benchmarks.py run --sizes 10k --cases load,plot_average
+    python run_benchmarks.py compare results/avant.json results/apres.json
+"""
+import argparse
+import ast
+import datetime
+import gc
+import importlib.util
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import types
+
+import matplotlib
+matplotlib.use('Agg')
+
+import pandas as pd
+
+from datasets import eco2mix_frame, parse_size, regional_frame, synthetic_csv
+
+PROJET = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DASHBOARD = os.path.join(PROJET, 'dashboard')
+SCRIPTS = os.path.join(PROJET, 'script', 'script_données_consommation_energies')
+SCRIPTS_DPE = os.path.join(PROJET, 'script', 'script_dpe')
+
+DOSSIER_RESULTATS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+DOSSIER_DONNEES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'donnees_synthetiques')
+
+""" Ralentissement relatif au-delà duquel compare signale une régression """
+SEUIL_REGRESSION = 1.2
+
+
+def load_module(chemin, nom):
+    """Importe un module à partir de son chemin (son répertoire est ajouté au sys.path pour ses imports)."""
+    repertoire = os.path.dirname(chemin)
+    if repertoire not in sys.path:
+        sys.path.insert(0, repertoire)
+    spec = importlib.util.spec_from_file_location(nom, chemin)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_functions(chemin, nom):
+    """
+    Charge les imports, constantes littérales et fonctions d'un script sans exécuter son code de niveau module.
+
+    Utile pour les scripts qui lisent des fichiers et tracent des graphiques à l'import.
+    """
+    with open(chemin, encoding='utf-8') as f:
+        arbre = ast.parse(f.read(), chemin)
+    conserves = []
+    for noeud in arbre.body:
+        if isinstance(noeud, (ast.Import, ast.ImportFrom, ast.FunctionDef)):
+            conserves.append(noeud)
+        elif isinstance(noeud, ast.Assign):
+            try:
+                ast.literal_eval(noeud.value)
+                conserves.append(noeud)
+            except ValueError:
+                pass
+    espace = {'__name__': nom, '__file__': chemin}
+    exec(compile(ast.Module(body=conserves, type_ignores=[]), chemin, 'exec'), espace)
+    return types.SimpleNamespace(**espace)
+
+
+class Contexte:
+    """Modules chargés à la demande et jeux de données mis en cache pendant une exécution."""
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self._modules = {}
+        self._cache = {}
+
+    def module(self, nom):
+        if nom not in self._modules:
+            chargeurs = {
+                'engie_pandas': lambda: load_module(os.path.join(DASHBOARD, 'engie_pandas.py'), 'engie_pandas'),
+                'engie': lambda: load_module(os.path.join(DASHBOARD, 'engie.py'), 'engie'),
+                'data_analysis': lambda: load_module(os.path.join(SCRIPTS, 'Data_Analysis.py'), 'Data_Analysis'),
+                'preprocessing': lambda: load_module(os.path.join(SCRIPTS, 'Preprocessing 1.py'), 'Preprocessing'),
+                'geolocalisation': lambda: load_functions(os.path.join(SCRIPTS, 'geolocalisation.py'),
+                                                          'geolocalisation'),
+                'dpe_loader': lambda: load_module(os.path.join(SCRIPTS_DPE, 'dpe_loader.py'), 'dpe_loader'),
+                'dpe_ingest': lambda: load_module(os.path.join(SCRIPTS_DPE, 'dpe_ingest.py'), 'dpe_ingest'),
+            }
+            self._modules[nom] = chargeurs[nom]()
+            _silence_streamlit()
+        return self._modules[nom]
+
+    def cached(self, cle, calcul):
+        if cle not in self._cache:
+            self._cache[cle] = calcul()
+        return self._cache[cle]
+
+    def csv(self, jeu, n):
+        return self.cached(('csv', jeu, n), lambda: synthetic_csv(jeu, n, self.data_dir))
+
+    def grtgaz_loaded(self, n):
+        """Données horaires chargées par load_data_pandas (entrée des graphiques du tableau de bord)."""
+        return self.cached(('grtgaz_charge', n),
+                           lambda: self.module('engie_pandas').load_data_pandas(self.csv('grtgaz', n)))
+
+    def spark(self):
+        def creer():
+            from pyspark.sql import SparkSession
+            return (SparkSession.builder.master('local[*]').appName('benchmarks')
+                    .config('spark.ui.enabled', 'false').getOrCreate())
+        return self.cached('spark', creer)
+
+    def close(self):
+        if 'spark' in self._cache:
+            self._cache['spark'].stop()
+
+
+def _silence_streamlit():
+    """Les appels st.* hors `streamlit run` émettent un avertissement « missing ScriptRunContext » par appel."""
+    logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').disabled = True
+
+
+def _plot_case(nom_fonction, max_rows=1_000_000):
+    return {
+        'nom': f'engie_pandas.{nom_fonction}',
+        'jeu': 'grtgaz',
+        'max_rows': max_rows,
+        'preparer': lambda ctx, n: (ctx.module('engie_pandas'), ctx.grtgaz_loaded(n)),
+        'executer': lambda module, df: getattr(module, nom_fonction)(df),
+    }
+
+
+def _spark_load(ctx, n):
+    engie = ctx.module('engie')
+    return engie, ctx.spark(), ctx.csv('grtgaz', n)
+
+
+""" Cas mesurés : préparation (non chronométrée) puis exécution (chronométrée) """
+CAS = [
+    {
+        'nom': 'engie_pandas.load_data_pandas',
+        'jeu': 'grtgaz',
+        'preparer': lambda ctx, n: (ctx.module('engie_pandas'), ctx.csv('grtgaz', n)),
+        'executer': lambda module, chemin: module.load_data_pandas(chemin),
+    },
+    {
+        'nom': 'engie.load_data (Spark local)',
+        'jeu': 'grtgaz',
+        'preparer': _spark_load,
+        # count() force l'évaluation du plan Spark
+        'executer': lambda module, spark, chemin: module.load_data(spark, chemin).count(),
+    },
+    _plot_case('plot_average_consumption_per_year'),
+    _plot_case('plot_monthly_average_consumption'),
+    _plot_case('plot_gas_vs_electricity_consumption'),
+    _plot_case('plot_heatmap_daily_hourly_consumption'),
+    _plot_case('plot_smoothed_time_series'),
+    _plot_case('plot_correlation'),
+    _plot_case('plot_monthly_boxplot'),
+    {
+        'nom': 'Data_Analysis.forecast_arima',
+        'jeu': 'eco2mix',
+        'max_rows': 100_000,
+        'preparer': lambda ctx, n: (ctx.module('data_analysis'), ctx.cached(('eco2mix', n), lambda: eco2mix_frame(n))),
+        'executer': lambda module, df: module.forecast_arima(df),
+    },
+    {
+        'nom': 'Preprocessing.fillna_with_mean',
+        'jeu': 'eco2mix',
+        'preparer': lambda ctx, n: (ctx.module('preprocessing'),
+                                    ctx.cached(('eco2mix', n), lambda: eco2mix_frame(n)).copy()),
+        'executer': lambda module, df: module.fillna_with_mean(df, module.columns_to_fill),
+    },
+    {
+        'nom': 'geolocalisation.calculate_consumption_totals',
+        'jeu': 'regional',
+        'preparer': lambda ctx, n: (ctx.module('geolocalisation'),
+                                    ctx.cached(('regional', n), lambda: regional_frame(n))),
+        'executer': lambda module, df: module.calculate_consumption_totals(df, 2015),
+    },
+    {
+        'nom': 'dpe_loader.load_dpe',
+        'jeu': 'dpe',
+        'preparer': lambda ctx, n: (ctx.module('dpe_loader'), ctx.csv('dpe', n)),
+        'executer': lambda module, chemin: module.load_dpe(chemin),
+    },
+    {
+        # Même fichier, découpé en plages analysées par un processus par cœur
+        'nom': 'dpe_ingest.ingest',
+        'jeu': 'dpe',
+        'preparer': lambda ctx, n: (ctx.module('dpe_ingest'), ctx.csv('dpe', n),
+                                    os.path.join(ctx.data_dir, f"dpe_dataset_{n}")),
+        'executer': lambda module, chemin, sortie: module.ingest([chemin], sortie),
+    },
+]
+
+
+def measure(cas, ctx, n, repetitions):
+    """
+    Mesure un cas : meilleur temps sur `repetitions` exécutions, puis une exécution sous tracemalloc
+    pour le pic mémoire (allocations Python et NumPy ; la mémoire de la JVM Spark n'est pas vue).
+    """
+    resultat = {'cas': cas['nom'], 'jeu': cas['jeu'], 'rows': n}
+    if n > cas.get('max_rows', float('inf')):
+        resultat.update(status='ignore', raison=f"au-delà de max_rows={cas['max_rows']}")
+        return resultat
+    try:
+        durees = []
+        for _ in range(repetitions):
+            arguments = cas['preparer'](ctx, n)
+            gc.collect()
+            debut = time.perf_counter()
+            cas['executer'](*arguments)
+            durees.append(time.perf_counter() - debut)
+
+        arguments = cas['preparer'](ctx, n)
+        gc.collect()
+        tracemalloc.start()
+        cas['executer'](*arguments)
+        _, pic = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    except ImportError as e:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        resultat.update(status='ignore', raison=f"dépendance absente : {e}")
+        return resultat
+    except Exception as e:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        resultat.update(status='erreur', raison=f"{type(e).__name__}: {e}")
+        return resultat
+
+    meilleur = min(durees)
+    resultat.update(status='ok', seconds=meilleur, rows_per_s=n / meilleur if meilleur > 0 else None,
+                    peak_mb=pic / 1e6, repetitions=repetitions)
+    return resultat
+
+
+def _git_version():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=PROJET, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'inconnue'
+
+
+def run(sizes, filtres, repetitions, data_dir, output_dir):
+    """Exécute les cas sélectionnés pour chaque taille et enregistre les résultats en JSON."""
+    cas_retenus = [c for c in CAS if not filtres or any(f in c['nom'] for f in filtres)]
+    ctx = Contexte(data_dir)
+    resultats = []
+    try:
+        for taille in sizes:
+            n = parse_size(taille)
+            for cas in cas_retenus:
+                resultat = measure(cas, ctx, n, repetitions)
+                resultats.append(resultat)
+                if resultat['status'] == 'ok':
+                    print(f"{cas['nom']:<55} {n:>10} lignes  {resultat['seconds']:9.3f} s  "
+                          f"{resultat['rows_per_s']:>14,.0f} lignes/s  {resultat['peak_mb']:9.1f} Mo")
+                else:
+                    print(f"{cas['nom']:<55} {n:>10} lignes  {resultat['status']} ({resultat['raison']})")
+    finally:
+        ctx.close()
+
+    rapport = {
+        'version': _git_version(),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.platform(),
+        'cpu': os.cpu_count(),
+        'results': resultats,
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    chemin = os.path.join(output_dir, f"{datetime.datetime.now():%Y%m%d-%H%M%S}_{rapport['version']}.json")
+    with open(chemin, 'w', encoding='utf-8') as f:
+        json.dump(rapport, f, indent=2, ensure_ascii=False)
+    print(f"Résultats enregistrés dans {chemin}")
+    return chemin
+
+
+def compare(reference, candidat, seuil=SEUIL_REGRESSION):
+    """
+    Compare deux fichiers de résultats et signale les cas ralentis de plus de `seuil`.
+
+    Returns:
+    - list : Les régressions (cas, lignes, ratio).
+    """
+    with open(reference, encoding='utf-8') as f:
+        avant = json.load(f)
+    with open(candidat, encoding='utf-8') as f:
+        apres = json.load(f)
+    temps_avant = {(r['cas'], r['rows']): r for r in avant['results'] if r['status'] == 'ok'}
+    regressions = []
+    print(f"{avant['version']} -> {apres['version']}")
+    for r in apres['results']:
+        ancien = temps_avant.get((r['cas'], r['rows']))
+        if r['status'] != 'ok' or ancien is None:
+            continue
+        ratio = r['seconds'] / ancien['seconds'] if ancien['seconds'] > 0 else float('inf')
+        memoire = r['peak_mb'] / ancien['peak_mb'] if ancien['peak_mb'] > 0 else float('inf')
+        marque = '  REGRESSION' if ratio > seuil else ''
+        print(f"{r['cas']:<55} {r['rows']:>10}  temps x{ratio:6.2f}  mémoire x{memoire:6.2f}{marque}")
+        if ratio > seuil:
+            regressions.append((r['cas'], r['rows'], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks du projet EngieDataSobriety")
+    commandes = parser.add_subparsers(dest='commande', required=True)
+
+    parser_run = commandes.add_parser('run', help="Mesurer les cas sur des jeux synthétiques")
+    parser_run.add_argument('--sizes', default='10k,1M', help="Tailles séparées par des virgules (10k,1M,10M)")
+    parser_run.add_argument('--cases', default='', help="Filtres sur les noms de cas, séparés par des virgules")
+    parser_run.add_argument('--repeat', type=int, default=1, help="Nombre de répétitions chronométrées")
+    parser_run.add_argument('--data-dir', default=DOSSIER_DONNEES, help="Répertoire des CSV synthétiques")
+    parser_run.add_argument('--output-dir', default=DOSSIER_RESULTATS, help="Répertoire des résultats JSON")
+
+    parser_compare = commandes.add_parser('compare', help="Comparer deux fichiers de résultats")
+    parser_compare.add_argument('reference')
+    parser_compare.add_argument('candidat')
+    parser_compare.add_argument('--threshold', type=float, default=SEUIL_REGRESSION)
+
+    args = parser.parse_args()
+    if args.commande == 'run':
+        run([t for t in args.sizes.split(',') if t], [c for c in args.cases.split(',') if c],
+            args.repeat, args.data_dir, args.output_dir)
+    else:
+        sys.exit(1 if compare(args.reference, args.candidat, args.threshold) else 0)
+
+
+if __name__ == '__main__':
+    main()
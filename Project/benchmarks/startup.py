@@ -0,0 +1,148 @@
+"""
+Benchmark de démarrage : temps d'import des modules et temps jusqu'au premier rendu des applications,
+chacun mesuré dans un processus Python neuf.
+
+Avec --ref, les mêmes mesures sont faites sur une autre révision git du projet (extraite dans un
+répertoire temporaire) pour comparer avant / après.
+
+Exemples :
+    python startup.py
+    python startup.py --ref HEAD~1 --rows 10k --repeat 3
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from datasets import eco2mix_frame, grtgaz_frame, parse_size
+from run_benchmarks import DOSSIER_RESULTATS, PROJET
+
+SCRIPTS = os.path.join('script', 'script_données_consommation_energies')
+DASHBOARD = 'dashboard'
+
+""" Mesures : (nom, répertoire relatif au projet, type, cible) """
+MESURES = [
+    ('import Data_Analysis', SCRIPTS, 'import', 'Data_Analysis'),
+    ('import impact_stats', DASHBOARD, 'import', 'impact_stats'),
+    ('import engie_pandas', DASHBOARD, 'import', 'engie_pandas'),
+    ('premier rendu energy_analysis_visulation.py', SCRIPTS, 'app', 'energy_analysis_visulation.py'),
+    ('premier rendu engie_pandas.py', DASHBOARD, 'app', 'engie_pandas.py'),
+]
+
+""" Code exécuté dans le processus mesuré : le chronomètre démarre avant tout import """
+CODE_IMPORT = """
+import time
+debut = time.perf_counter()
+import {cible}
+print(time.perf_counter() - debut)
+"""
+
+CODE_APP = """
+import time
+debut = time.perf_counter()
+import logging, runpy
+import streamlit
+logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').disabled = True
+logging.getLogger('streamlit.runtime.caching.cache_data_api').disabled = True
+runpy.run_path({cible!r}, run_name='__main__')
+print(time.perf_counter() - debut)
+"""
+
+
+def prepare_data(repertoire, n):
+    """Écrit les CSV lus à l'ouverture des applications (eco2mix et Consomation&Mouvement)."""
+    eco2mix_frame(n).to_csv(os.path.join(repertoire, 'eco2mix-national-tr.csv'), sep=';', index=False)
+    grtgaz_frame(n).to_csv(os.path.join(repertoire, 'Consomation&Mouvement.csv'), index=False)
+
+
+def measure_once(projet, repertoire_relatif, type_mesure, cible, donnees):
+    """Durée (s) d'une mesure dans un processus neuf lancé depuis le répertoire des données."""
+    repertoire = os.path.join(projet, repertoire_relatif)
+    if type_mesure == 'import':
+        code = CODE_IMPORT.format(cible=cible)
+    else:
+        code = CODE_APP.format(cible=os.path.join(repertoire, cible))
+    environnement = dict(os.environ, MPLBACKEND='Agg', PYTHONDONTWRITEBYTECODE='1',
+                         PYTHONPATH=repertoire + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    resultat = subprocess.run([sys.executable, '-c', code], cwd=donnees, env=environnement,
+                              capture_output=True, text=True)
+    if resultat.returncode != 0:
+        raise RuntimeError(resultat.stderr.strip().splitlines()[-1] if resultat.stderr else 'échec')
+    return float(resultat.stdout.strip().splitlines()[-1])
+
+
+def measure_project(projet, donnees, repetitions):
+    """Médiane des durées de chaque mesure (None si la mesure échoue)."""
+    resultats = {}
+    for nom, repertoire, type_mesure, cible in MESURES:
+        if not os.path.exists(os.path.join(projet, repertoire, cible if type_mesure == 'app' else cible + '.py')):
+            resultats[nom] = {'statut': 'absent'}
+            continue
+        try:
+            durees = [measure_once(projet, repertoire, type_mesure, cible, donnees) for _ in range(repetitions)]
+            resultats[nom] = {'statut': 'ok', 'duree_s': statistics.median(durees)}
+        except RuntimeError as e:
+            resultats[nom] = {'statut': 'erreur', 'erreur': str(e)}
+    return resultats
+
+
+def extract_revision(revision, destination):
+    """Extrait le répertoire Project d'une révision git et retourne son chemin."""
+    racine = os.path.dirname(PROJET)
+    archive = subprocess.run(['git', 'archive', revision, os.path.basename(PROJET)], cwd=racine,
+                             capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', destination], input=archive, check=True)
+    return os.path.join(destination, os.path.basename(PROJET))
+
+
+def _afficher(resultats, reference=None):
+    for nom, _, _, _ in MESURES:
+        apres = resultats[nom]
+        texte = f"{apres['duree_s']:.2f} s" if apres['statut'] == 'ok' else apres['statut']
+        if reference is not None:
+            avant = reference[nom]
+            texte_avant = f"{avant['duree_s']:.2f} s" if avant['statut'] == 'ok' else avant['statut']
+            gain = (f"x{avant['duree_s'] / apres['duree_s']:.1f}"
+                    if avant['statut'] == 'ok' and apres['statut'] == 'ok' else '')
+            print(f"{nom:<46} {texte_avant:>10} -> {texte:>10} {gain}")
+        else:
+            print(f"{nom:<46} {texte:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps de démarrage des modules et applications")
+    parser.add_argument('--rows', default='10k', help="Taille des CSV lus au démarrage")
+    parser.add_argument('--repeat', type=int, default=3, help="Nombre de processus par mesure (médiane)")
+    parser.add_argument('--ref', default=None, help="Révision git de référence (ex. HEAD~1)")
+    parser.add_argument('--output-dir', default=DOSSIER_RESULTATS, help="Répertoire des résultats JSON")
+    args = parser.parse_args()
+
+    temporaire = tempfile.mkdtemp(prefix='startup_')
+    try:
+        donnees = os.path.join(temporaire, 'donnees')
+        os.makedirs(donnees)
+        prepare_data(donnees, parse_size(args.rows))
+        resultats = measure_project(PROJET, donnees, args.repeat)
+        reference = None
+        if args.ref is not None:
+            reference = measure_project(extract_revision(args.ref, temporaire), donnees, args.repeat)
+    finally:
+        shutil.rmtree(temporaire, ignore_errors=True)
+
+    _afficher(resultats, reference)
+    os.makedirs(args.output_dir, exist_ok=True)
+    horodatage = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    chemin = os.path.join(args.output_dir, f"startup_{horodatage}.json")
+    with open(chemin, 'w', encoding='utf-8') as f:
+        json.dump({'rows': parse_size(args.rows), 'repeat': args.repeat, 'ref': args.ref,
+                   'results': resultats, 'reference': reference}, f, indent=2, ensure_ascii=False)
+    print(f"Résultats écrits dans {chemin}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import json
+import os
+import threading
+import warnings
+
+import numpy as np
+import pandas as pd
+
+COLONNE_VALEUR = 'Consommation brute totale (MW)'
+COLONNE_DATE = 'Date_Heure'
+
+""" Paramètres par défaut de la détection (série horaire) """
+FENETRE_MAD = 168          # une semaine glissante pour la médiane et le MAD
+SEMAINES_SAISON = 4        # nombre de semaines passées pour le profil heure x jour de semaine
+FENETRE_RESIDUS = 336      # deux semaines pour normaliser les résidus saisonniers
+SEUIL_Z = 4.0
+PERIODE_SAISON = 168       # une semaine en heures
+
+""" Facteur rendant le MAD comparable à un écart-type pour une loi normale """
+FACTEUR_MAD = 1.4826
+
+COLONNES_ANOMALIES = [COLONNE_DATE, 'valeur', 'mediane', 'z_robuste', 'z_saisonnier', 'type']
+
+
+def hourly_series(df, colonne=COLONNE_VALEUR, colonne_date=COLONNE_DATE):
+    """
+    Construit la série horaire régulière (heures manquantes à NaN) à partir des données chargées.
+
+    Args:
+    - df : DataFrame : Données de consommation (par exemple issues de load_data_pandas).
+    - colonne : str : Colonne de consommation.
+    - colonne_date : str : Colonne datetime.
+
+    Returns:
+    - Series : Consommation indexée par heure.
+    """
+    serie = df.groupby(colonne_date)[colonne].mean().sort_index()
+    return serie.asfreq('h')
+
+
+def lookback(fenetre_mad=FENETRE_MAD, semaines=SEMAINES_SAISON, fenetre_residus=FENETRE_RESIDUS):
+    """Nombre d'heures d'historique nécessaires pour scorer une nouvelle heure."""
+    return max(2 * fenetre_mad, semaines * PERIODE_SAISON + fenetre_residus)
+
+
+def score(serie, fenetre_mad=FENETRE_MAD, semaines=SEMAINES_SAISON, fenetre_residus=FENETRE_RESIDUS):
+    """
+    Calcule les scores d'anomalie de chaque heure avec des fenêtres glissantes vectorisées.
+
+    Toutes les fenêtres sont causales (elles ne regardent que le passé et l'heure courante) :
+    le score d'une heure ne change pas quand de nouvelles heures sont ajoutées, ce qui permet
+    le mode incrémental.
+
+    - z_robuste : écart à la médiane glissante, divisé par le MAD glissant.
+    - z_saisonnier : résidu par rapport à la médiane des mêmes heures des semaines précédentes,
+      normalisé par la moyenne et l'écart-type glissants des résidus.
+
+    Args:
+    - serie : Series : Série horaire régulière (voir hourly_series).
+    - fenetre_mad : int : Taille de la fenêtre médiane / MAD en heures.
+    - semaines : int : Nombre de semaines du profil saisonnier.
+    - fenetre_residus : int : Taille de la fenêtre de normalisation des résidus en heures.
+
+    Returns:
+    - DataFrame : valeur, mediane, z_robuste, saison, z_saisonnier indexés comme la série.
+    """
+    valeurs = serie.astype('float64')
+    minimum = max(2, fenetre_mad // 2)
+    mediane = valeurs.rolling(fenetre_mad, min_periods=minimum).median()
+    mad = (valeurs - mediane).abs().rolling(fenetre_mad, min_periods=minimum).median()
+    z_robuste = (valeurs - mediane) / (FACTEUR_MAD * mad.replace(0, np.nan))
+
+    # Profil saisonnier : médiane des mêmes heures sur les semaines précédentes
+    if semaines < 1:
+        raise ValueError("Le profil saisonnier nécessite au moins une semaine d'historique")
+    decalees = np.column_stack([valeurs.shift(PERIODE_SAISON * k).to_numpy() for k in range(1, semaines + 1)])
+    with warnings.catch_warnings():
+        # Les premières semaines n'ont pas d'historique : la médiane y est simplement NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        saison = pd.Series(np.nanmedian(decalees, axis=1), index=valeurs.index)
+    residus = valeurs - saison
+    minimum = max(2, fenetre_residus // 2)
+    moyenne_residus = residus.rolling(fenetre_residus, min_periods=minimum).mean()
+    ecart_residus = residus.rolling(fenetre_residus, min_periods=minimum).std()
+    z_saisonnier = (residus - moyenne_residus) / ecart_residus.replace(0, np.nan)
+
+    return pd.DataFrame({'valeur': valeurs, 'mediane': mediane, 'z_robuste': z_robuste,
+                         'saison': saison, 'z_saisonnier': z_saisonnier})
+
+
+def detect_anomalies(serie, seuil=SEUIL_Z, **parametres):
+    """
+    Détecte les heures anormales d'une série horaire.
+
+    Args:
+    - serie : Series : Série horaire régulière.
+    - seuil : float : Seuil sur la valeur absolue des scores.
+    - parametres : Paramètres de fenêtre transmis à score.
+
+    Returns:
+    - DataFrame : Les heures anormales (colonnes COLONNES_ANOMALIES), 'type' valant
+      'robuste', 'saisonnier' ou 'robuste+saisonnier'.
+    """
+    return _anomalies(score(serie, **parametres), seuil)
+
+
+def _anomalies(scores, seuil):
+    robuste = (scores['z_robuste'].abs() > seuil).to_numpy()
+    saisonnier = (scores['z_saisonnier'].abs() > seuil).to_numpy()
+    types = np.select([robuste & saisonnier, robuste, saisonnier],
+                      ['robuste+saisonnier', 'robuste', 'saisonnier'], default='')
+    anomalies = scores.assign(type=types)[robuste | saisonnier]
+    anomalies = anomalies.rename_axis(COLONNE_DATE).reset_index()
+    return anomalies[COLONNES_ANOMALIES]
+
+
+def score_new_hours(serie, depuis, seuil=SEUIL_Z, **parametres):
+    """
+    Détecte les anomalies des seules heures postérieures à `depuis`.
+
+    Seul l'historique nécessaire aux fenêtres (voir lookback) est relu : le coût est proportionnel
+    au nombre de nouvelles heures.
+
+    Args:
+    - serie : Series : Série horaire régulière complète (historique + nouvelles heures).
+    - depuis : Timestamp : Dernière heure déjà scorée (None pour tout scorer).
+    - seuil : float : Seuil sur la valeur absolue des scores.
+
+    Returns:
+    - DataFrame : Les anomalies parmi les nouvelles heures.
+    """
+    if depuis is None:
+        return detect_anomalies(serie, seuil, **parametres)
+    debut = serie.index.searchsorted(depuis, side='right')
+    debut_contexte = max(0, debut - lookback(**parametres))
+    scores = score(serie.iloc[debut_contexte:], **parametres)
+    return _anomalies(scores.iloc[debut - debut_contexte:], seuil)
+
+
+class AnomalyStore:
+    """
+    Table des anomalies (CSV) alimentée incrémentalement, destinée à être superposée aux graphiques.
+
+    Un fichier d'état JSON mémorise la dernière heure scorée pour ne traiter ensuite que les
+    heures ajoutées. Les mises à jour sont sérialisées : les sessions d'un même processus
+    (Streamlit) n'ajoutent pas deux fois les mêmes heures.
+    """
+
+    _verrou = threading.Lock()
+
+    def __init__(self, csv_path, seuil=SEUIL_Z):
+        self.csv_path = csv_path
+        self.etat_path = os.path.splitext(csv_path)[0] + '_etat.json'
+        self.seuil = seuil
+
+    def last_scored(self):
+        """Dernière heure scorée, ou None si la table n'a jamais été alimentée."""
+        if not os.path.exists(self.etat_path):
+            return None
+        with open(self.etat_path, encoding='utf-8') as f:
+            return pd.Timestamp(json.load(f)['derniere_heure'])
+
+    def update(self, serie):
+        """
+        Score les heures de la série postérieures à la dernière heure scorée et ajoute les anomalies.
+
+        Returns:
+        - DataFrame : Les nouvelles anomalies ajoutées à la table.
+        """
+        # Les heures finales encore vides seront scorées lorsqu'elles seront renseignées
+        serie = serie.sort_index().loc[:serie.last_valid_index()]
+        with self._verrou:
+            depuis = self.last_scored()
+            if serie.count() == 0 or (depuis is not None and serie.index[-1] <= depuis):
+                return pd.DataFrame(columns=COLONNES_ANOMALIES)
+            nouvelles = score_new_hours(serie, depuis, self.seuil)
+            nouvelles.to_csv(self.csv_path, mode='a', index=False,
+                             header=not os.path.exists(self.csv_path))
+            with open(self.etat_path, 'w', encoding='utf-8') as f:
+                json.dump({'derniere_heure': serie.index[-1].isoformat()}, f)
+            return nouvelles
+
+    def load(self, debut=None, fin=None):
+        """Anomalies de la table, éventuellement restreintes à une période."""
+        if not os.path.exists(self.csv_path):
+            return pd.DataFrame(columns=COLONNES_ANOMALIES)
+        anomalies = pd.read_csv(self.csv_path, parse_dates=[COLONNE_DATE])
+        if debut is not None:
+            anomalies = anomalies[anomalies[COLONNE_DATE] >= pd.Timestamp(debut)]
+        if fin is not None:
+            anomalies = anomalies[anomalies[COLONNE_DATE] <= pd.Timestamp(fin)]
+        return anomalies
@@ -0,0 +1,244 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+COLONNE_DATE = 'Date_Heure'
+
+""" Colonnes conservées : nom court -> colonne des données chargées """
+COLONNES = {
+    'gaz': 'Consommation brute gaz (MW PCS 0°C) - GRTgaz',
+    'electricite': 'Consommation brute électricité (MW) - RTE',
+    'totale': 'Consommation brute totale (MW)',
+}
+
+""" Les colonnes partagent une grille horaire régulière : une semaine = 168 lignes """
+HEURES_PAR_SEMAINE = 168
+
+""" Lectures du manifeste tentées si la version qu'il désigne disparaît pendant l'ouverture """
+TENTATIVES_OUVERTURE = 3
+
+
+def _source_fingerprint(source):
+    """Identifiant du fichier source (chemin, taille, date de modification)."""
+    if source is None:
+        return None
+    info = os.stat(source)
+    return {'chemin': os.path.abspath(source), 'taille': info.st_size, 'mtime_ns': info.st_mtime_ns}
+
+
+class ColumnStore:
+    """
+    Colonnes gaz / électricité / totale en float32 sur une grille horaire régulière, stockées en
+    fichiers .npy ouverts en mémoire partagée (np.load(mmap_mode='r')).
+
+    Plusieurs processus du tableau de bord ouvrant le même répertoire partagent les mêmes pages
+    du cache du système au lieu d'en garder chacun une copie. Les calculs (ratio, corrélation
+    croisée décalée, agrégats hebdomadaires) travaillent sur des vues des tableaux, sans copie.
+
+    Chaque construction écrit une nouvelle version dans un sous-répertoire puis bascule le
+    manifeste ; la version précédente est conservée jusqu'à la construction suivante, si bien
+    qu'un processus qui vient de lire l'ancien manifeste peut encore l'ouvrir. Si la version lue
+    a malgré tout été supprimée (deux constructions entre-temps), le manifeste est relu.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        for tentative in range(TENTATIVES_OUVERTURE):
+            try:
+                self._open()
+                break
+            except FileNotFoundError:
+                if tentative == TENTATIVES_OUVERTURE - 1:
+                    raise
+        self.debut = self.timestamps[0] if len(self.timestamps) else None
+
+    def _open(self):
+        with open(os.path.join(self.directory, 'manifest.json'), encoding='utf-8') as f:
+            self.manifeste = json.load(f)
+        version = os.path.join(self.directory, self.manifeste['version'])
+        self.timestamps = np.load(os.path.join(version, 'timestamps.npy'), mmap_mode='r')
+        self.colonnes = {nom: np.load(os.path.join(version, f"{nom}.npy"), mmap_mode='r')
+                         for nom in self.manifeste['colonnes']}
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __getitem__(self, nom):
+        return self.colonnes[nom]
+
+    @classmethod
+    def build(cls, df, directory, source=None):
+        """
+        Écrit les colonnes de df sur une grille horaire régulière (moyenne par heure, heures absentes à NaN).
+
+        Args:
+        - df : DataFrame : Données chargées, avec la colonne 'Date_Heure'.
+        - directory : str : Répertoire du stockage.
+        - source : str : Fichier dont df est issu (enregistré pour open_or_build).
+
+        Returns:
+        - ColumnStore : Le stockage ouvert.
+        """
+        noms = [nom for nom, colonne in COLONNES.items() if colonne in df.columns]
+        if COLONNE_DATE not in df.columns or not noms:
+            raise ValueError("Les données doivent contenir 'Date_Heure' et au moins une colonne de consommation")
+        dates = df[COLONNE_DATE]
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_convert('UTC').dt.tz_localize(None)
+        horaire = df[[COLONNES[nom] for nom in noms]].groupby(dates.dt.floor('h').to_numpy()).mean()
+        grille = pd.date_range(horaire.index[0], horaire.index[-1], freq='h')
+        horaire = horaire.reindex(grille)
+
+        version = f"v{time.time_ns()}"
+        repertoire = os.path.join(directory, version)
+        os.makedirs(repertoire)
+        np.save(os.path.join(repertoire, 'timestamps.npy'), grille.to_numpy().astype('datetime64[ns]'))
+        manquantes = {}
+        for nom in noms:
+            valeurs = horaire[COLONNES[nom]].to_numpy(dtype='float32')
+            manquantes[nom] = int(np.isnan(valeurs).sum())
+            np.save(os.path.join(repertoire, f"{nom}.npy"), valeurs)
+
+        manifeste = {'version': version, 'colonnes': noms, 'lignes': len(grille), 'manquantes': manquantes,
+                     'source': _source_fingerprint(source)}
+        chemin = os.path.join(directory, 'manifest.json')
+        precedente = None
+        if os.path.exists(chemin):
+            with open(chemin, encoding='utf-8') as f:
+                precedente = json.load(f)['version']
+        with open(chemin + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifeste, f, ensure_ascii=False, indent=2)
+        os.replace(chemin + '.tmp', chemin)
+        # La version précédente reste disponible pour les processus qui viennent de lire l'ancien manifeste ;
+        # les plus anciennes restent lisibles par ceux qui les ont déjà ouvertes (mmap)
+        for ancienne in os.listdir(directory):
+            if ancienne.startswith('v') and ancienne not in (version, precedente):
+                shutil.rmtree(os.path.join(directory, ancienne), ignore_errors=True)
+        return cls(directory)
+
+    @classmethod
+    def open_or_build(cls, directory, df=None, source=None):
+        """Ouvre le stockage s'il est à jour par rapport à `source`, sinon le (re)construit à partir de df."""
+        chemin = os.path.join(directory, 'manifest.json')
+        if os.path.exists(chemin):
+            with open(chemin, encoding='utf-8') as f:
+                manifeste = json.load(f)
+            if source is None or manifeste['source'] == _source_fingerprint(source):
+                return cls(directory)
+        if df is None:
+            raise ValueError(f"Stockage absent ou périmé dans {directory} et aucune donnée pour le construire")
+        return cls.build(df, directory, source)
+
+    def index(self):
+        """Index horaire (UTC) des colonnes."""
+        return pd.DatetimeIndex(self.timestamps).tz_localize('UTC')
+
+    def ratio(self, numerateur='gaz', denominateur='electricite', out=None):
+        """
+        Ratio heure par heure entre deux colonnes (NaN là où le dénominateur est nul ou manquant).
+
+        Args:
+        - out : ndarray : Tableau float32 de sortie à réutiliser (alloué sinon).
+        """
+        if out is None:
+            out = np.empty(len(self), dtype='float32')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(self[numerateur], self[denominateur], out=out)
+        out[~np.isfinite(out)] = np.nan
+        return out
+
+    def _complete(self, nom):
+        return self.manifeste['manquantes'].get(nom, 1) == 0
+
+    def cross_correlation(self, a='gaz', b='electricite', max_lag=48):
+        """
+        Corrélation de Pearson entre a(t) et b(t + k) pour k de -max_lag à max_lag heures.
+
+        Les paires sont des vues décalées des deux colonnes et les sommes sont accumulées en
+        float64 sans copie par décalage. Si des heures manquent, les colonnes sont recopiées une
+        seule fois, NaN remplacés par 0, avec leurs indicateurs de validité (0 ou 1) : chaque somme
+        d'une paire est pondérée par l'indicateur de l'autre colonne.
+
+        Returns:
+        - Series : Corrélation indexée par le décalage k (heures).
+        """
+        x_tout, y_tout = self[a], self[b]
+        n = len(self)
+        complets = self._complete(a) and self._complete(b)
+        if not complets:
+            valides_x = (~np.isnan(x_tout)).astype('float32')
+            valides_y = (~np.isnan(y_tout)).astype('float32')
+            x_tout, y_tout = np.where(valides_x > 0, x_tout, 0), np.where(valides_y > 0, y_tout, 0)
+        decalages = np.arange(-max_lag, max_lag + 1)
+        correlations = np.full(len(decalages), np.nan)
+        for i, k in enumerate(decalages):
+            if abs(k) >= n - 1:
+                continue
+            x = x_tout[:n - k] if k >= 0 else x_tout[-k:]
+            y = y_tout[k:] if k >= 0 else y_tout[:n + k]
+            if complets:
+                effectif = len(x)
+                sx, sy = x.sum(dtype=np.float64), y.sum(dtype=np.float64)
+                sxx = np.einsum('i,i->', x, x, dtype=np.float64)
+                syy = np.einsum('i,i->', y, y, dtype=np.float64)
+            else:
+                vx = valides_x[:n - k] if k >= 0 else valides_x[-k:]
+                vy = valides_y[k:] if k >= 0 else valides_y[:n + k]
+                effectif = int(np.einsum('i,i->', vx, vy, dtype=np.float64))
+                sx = np.einsum('i,i->', x, vy, dtype=np.float64)
+                sy = np.einsum('i,i->', vx, y, dtype=np.float64)
+                sxx = np.einsum('i,i,i->', x, x, vy, dtype=np.float64)
+                syy = np.einsum('i,i,i->', vx, y, y, dtype=np.float64)
+            # Les NaN étant remplacés par 0, x * y ne compte que les paires valides
+            sxy = np.einsum('i,i->', x, y, dtype=np.float64)
+            if effectif < 2:
+                continue
+            covariance = sxy - sx * sy / effectif
+            variances = (sxx - sx * sx / effectif) * (syy - sy * sy / effectif)
+            if variances > 0:
+                correlations[i] = covariance / np.sqrt(variances)
+        return pd.Series(correlations, index=pd.Index(decalages, name='decalage_h'), name=f"corr({a}, {b})")
+
+    def _week_starts(self):
+        """Indices de début de chaque semaine (lundi 00:00 UTC) dans la grille horaire."""
+        if len(self) == 0:
+            return np.array([], dtype='int64')
+        debut = self.debut.astype('datetime64[h]').astype('int64')
+        # L'époque (1970-01-01) est un jeudi : les lundis sont à 96 h (mod 168) de l'époque
+        decalage = (HEURES_PAR_SEMAINE - (debut - 96) % HEURES_PAR_SEMAINE) % HEURES_PAR_SEMAINE
+        suivants = np.arange(decalage, len(self), HEURES_PAR_SEMAINE)
+        return suivants if decalage == 0 else np.concatenate([[0], suivants])
+
+    def weekly(self, valeurs):
+        """
+        Moyennes hebdomadaires (semaines du lundi au dimanche) d'un tableau aligné sur la grille.
+
+        Args:
+        - valeurs : ndarray : Une colonne du stockage ou un tableau calculé (ex. ratio).
+
+        Returns:
+        - Series : Moyenne par semaine, indexée par le début de semaine (UTC).
+        """
+        debuts = self._week_starts()
+        if len(debuts) == 0:
+            return pd.Series(dtype='float64')
+        valides = ~np.isnan(valeurs)
+        if valides.all():
+            sommes = np.add.reduceat(valeurs, debuts, dtype=np.float64)
+            effectifs = np.diff(np.append(debuts, len(valeurs)))
+        else:
+            sommes = np.add.reduceat(np.where(valides, valeurs, 0), debuts, dtype=np.float64)
+            effectifs = np.add.reduceat(valides, debuts, dtype=np.int64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            moyennes = sommes / effectifs
+        semaines = (self.debut.astype('datetime64[h]') + debuts.astype('timedelta64[h]'))
+        semaines[0] = semaines[0] - ((semaines[0].astype('int64') - 96) % HEURES_PAR_SEMAINE).astype('timedelta64[h]')
+        return pd.Series(moyennes, index=pd.DatetimeIndex(semaines.astype('datetime64[ns]')).tz_localize('UTC'))
+
+    def weekly_means(self, noms=('gaz', 'electricite')):
+        """Moyennes hebdomadaires de plusieurs colonnes."""
+        return pd.DataFrame({COLONNES[nom]: self.weekly(self[nom]) for nom in noms})
@@ -1,11 +1,13 @@
 import streamlit as st
 from pyspark.sql import SparkSession
 from pyspark.sql.functions import col, when, avg, dayofyear, year, month
-import scipy.stats as stats
-import seaborn as sns
 import matplotlib.pyplot as plt
+# seaborn (import coûteux) est importé à la demande dans les étapes de rendu
 import pandas as pd
 import numpy as np
+from impact_stats import spark_box_stats, spark_sufficient_stats, welch_test
+from instrumentation import session_tracer, stage, instrument, render_debug_panel
+from schemas import SCHEMAS, format_report
 
 def create_spark_session():
     try:
@@ -20,6 +22,15 @@ def create_spark_session():
         print("Erreur lors de la création de la session Spark:", e)
         raise e
     
+def show_figure():
+    # Sérialisation de la figure courante vers Streamlit, mesurée
+    with stage('st.pyplot', 'serialize'):
+        st.pyplot(plt)
+    plt.close()
+
+# Les transformations Spark sont paresseuses : cette étape ne mesure que la construction du plan
+# et le calcul de la moyenne du gaz ; la lecture effective est comptée dans les étapes toPandas
+@instrument('load', rows=None)
 def load_data(spark,fallback_csv_path):
     try:
         pipeline = "{'$sample': {'size': 10000}}"
@@ -34,6 +45,12 @@ def load_data(spark,fallback_csv_path):
         df = spark.read.csv(fallback_csv_path, header=True, inferSchema=True)
 
     df = df.withColumnRenamed("Date - Heure", "Date_Heure")
+    # Validation unique à l'ingestion : colonnes requises (schéma Spark, sans lecture) puis règles
+    # du schéma évaluées en une seule agrégation ; un fichier invalide lève SchemaError
+    with stage('validation schéma', 'transform'):
+        rapport = SCHEMAS['consommation_brute'].spark_report(df)
+    if len(rapport):
+        st.warning(f"Valeurs hors schéma (types invalides convertis en valeurs manquantes) :\n{format_report(rapport)}")
     df = df.withColumn("Date_Heure", df["Date_Heure"].cast("timestamp"))
     df = df.withColumn("Date", df["Date_Heure"].cast("date"))
     df = df.na.drop(subset=["Consommation brute totale (MW)"])
@@ -48,117 +65,150 @@ def load_data(spark,fallback_csv_path):
 
 
 def statistical_analysis(df):
-    consommation_pd = df.toPandas()
-    group1 = consommation_pd[consommation_pd['mouvement_social_num'] == 1]['Consommation brute totale (MW)']
-    group2 = consommation_pd[consommation_pd['mouvement_social_num'] == 0]['Consommation brute totale (MW)']
-    t_stat, p_value = stats.ttest_ind(group1, group2, equal_var=False)
-    return t_stat, p_value, consommation_pd
+    # Le test et le boxplot sont calculés à partir d'agrégats Spark (statistiques suffisantes,
+    # quartiles approchés par groupe) : aucune colonne n'est rapatriée
+    resultat = welch_test(spark_sufficient_stats(df))
+    boites = spark_box_stats(df)
+    return resultat['t_stat'], resultat['p_value'], boites
 
+def to_pandas(df):
+    # Exécution du plan Spark et rapatriement des lignes, mesurés
+    with stage('toPandas', 'load') as span:
+        consommation_pd = df.toPandas()
+        span.rows = len(consommation_pd)
+    return consommation_pd
+
+@instrument('visualisation', rows=None)
 def plot_average_consumption_per_year(df):
-    avg_consumption_year = df.groupBy("Year").avg("Consommation brute totale (MW)").orderBy("Year").toPandas()
-    plt.figure(figsize=(10, 6))
-    sns.barplot(data=avg_consumption_year, x='Year', y='avg(Consommation brute totale (MW))')
+    with stage('groupBy Year + toPandas', 'aggregate') as span:
+        avg_consumption_year = df.groupBy("Year").avg("Consommation brute totale (MW)").orderBy("Year").toPandas()
+        span.rows = len(avg_consumption_year)
+    with stage('sns.barplot', 'render', rows=len(avg_consumption_year)):
+        import seaborn as sns
+        plt.figure(figsize=(10, 6))
+        sns.barplot(data=avg_consumption_year, x='Year', y='avg(Consommation brute totale (MW))')
     plt.title('Moyenne de la Consommation par Année')
     plt.xlabel('Année')
     plt.ylabel('Moyenne de Consommation (MW)')
     plt.xticks(rotation=45)
-    st.pyplot(plt)
-    plt.close()
+    show_figure()
 
+@instrument('visualisation', rows=None)
 def plot_monthly_average_consumption(df):
-    avg_consumption_month = df.groupBy("Month").avg("Consommation brute totale (MW)").orderBy("Month").toPandas()
-    plt.figure(figsize=(10, 6))
-    sns.barplot(data=avg_consumption_month, x='Month', y='avg(Consommation brute totale (MW))')
+    with stage('groupBy Month + toPandas', 'aggregate') as span:
+        avg_consumption_month = df.groupBy("Month").avg("Consommation brute totale (MW)").orderBy("Month").toPandas()
+        span.rows = len(avg_consumption_month)
+    with stage('sns.barplot', 'render', rows=len(avg_consumption_month)):
+        import seaborn as sns
+        plt.figure(figsize=(10, 6))
+        sns.barplot(data=avg_consumption_month, x='Month', y='avg(Consommation brute totale (MW))')
     plt.title('Moyenne de la Consommation par Mois')
     plt.xlabel('Mois')
     plt.ylabel('Moyenne de Consommation (MW)')
     plt.xticks(rotation=45)
-    st.pyplot(plt)
-    plt.close()
+    show_figure()
 
+@instrument('visualisation', rows=None)
 def plot_gas_vs_electricity_consumption(df):
-    consommation_pd = df.toPandas()
-    consommation_pd['Date'] = pd.to_datetime(consommation_pd['Date'])
-    consommation_pd.set_index('Date', inplace=True)
-    consommation_pd = consommation_pd.resample('W').mean()
-    plt.figure(figsize=(10, 6))
-    sns.lineplot(data=consommation_pd, x=consommation_pd.index, y='Consommation brute gaz (MW PCS 0°C) - GRTgaz', label='Consommation de Gaz')
-    sns.lineplot(data=consommation_pd, x=consommation_pd.index, y='Consommation brute électricité (MW) - RTE', label='Consommation d\'Électricité')
+    consommation_pd = to_pandas(df)
+    with stage('resample W', 'aggregate', rows=len(consommation_pd)):
+        consommation_pd['Date'] = pd.to_datetime(consommation_pd['Date'])
+        consommation_pd.set_index('Date', inplace=True)
+        consommation_pd = consommation_pd.resample('W').mean()
+    with stage('sns.lineplot', 'render', rows=len(consommation_pd)):
+        import seaborn as sns
+        plt.figure(figsize=(10, 6))
+        sns.lineplot(data=consommation_pd, x=consommation_pd.index, y='Consommation brute gaz (MW PCS 0°C) - GRTgaz', label='Consommation de Gaz')
+        sns.lineplot(data=consommation_pd, x=consommation_pd.index, y='Consommation brute électricité (MW) - RTE', label='Consommation d\'Électricité')
     plt.title('Consommation de Gaz vs Consommation d\'Électricité')
     plt.xlabel('Date')
     plt.ylabel('Consommation (MW)')
     plt.xticks(rotation=45)
     plt.legend()
-    st.pyplot(plt)
-    plt.close()
+    show_figure()
 
+@instrument('visualisation', rows=None)
 def plot_heatmap_daily_hourly_consumption(df):
-    consommation_pd = df.toPandas()
-    consommation_pd['Hour'] = pd.to_datetime(consommation_pd['Heure']).dt.hour
-    consommation_pd['DayOfWeek'] = pd.to_datetime(consommation_pd['Date']).dt.dayofweek
-    pivot_table = consommation_pd.pivot_table(values='Consommation brute totale (MW)', index='Hour', columns='DayOfWeek', aggfunc='mean')
-    plt.figure(figsize=(12, 8))
-    sns.heatmap(pivot_table, annot=True, fmt=".0f", cmap='coolwarm')
+    consommation_pd = to_pandas(df)
+    with stage('heure/jour', 'transform', rows=len(consommation_pd)):
+        consommation_pd['Hour'] = pd.to_datetime(consommation_pd['Heure']).dt.hour
+        consommation_pd['DayOfWeek'] = pd.to_datetime(consommation_pd['Date']).dt.dayofweek
+    with stage('pivot_table', 'aggregate', rows=len(consommation_pd)):
+        pivot_table = consommation_pd.pivot_table(values='Consommation brute totale (MW)', index='Hour', columns='DayOfWeek', aggfunc='mean')
+    with stage('sns.heatmap', 'render', rows=len(pivot_table)):
+        import seaborn as sns
+        plt.figure(figsize=(12, 8))
+        sns.heatmap(pivot_table, annot=True, fmt=".0f", cmap='coolwarm')
     plt.title('Heatmap of Energy Consumption by Hour and Day of Week')
     plt.xlabel('Day of Week')
     plt.ylabel('Hour of Day')
-    st.pyplot(plt)
-    plt.close()
+    show_figure()
 
+@instrument('visualisation', rows=None)
 def plot_smoothed_time_series(df):
-    consommation_pd = df.toPandas()
-    consommation_pd['Date'] = pd.to_datetime(consommation_pd['Date'])
-    if consommation_pd['Date'].duplicated().any():
-        consommation_pd = consommation_pd.drop_duplicates('Date')
-    consommation_pd.set_index('Date', inplace=True)
-    consommation_pd['Consommation_smoothed'] = consommation_pd['Consommation brute totale (MW)'].rolling(window=7).mean()
-    plt.figure(figsize=(12, 6))
-    sns.lineplot(data=consommation_pd, x=consommation_pd.index, y='Consommation_smoothed')
+    consommation_pd = to_pandas(df)
+    with stage('dédoublonnage', 'transform', rows=len(consommation_pd)):
+        consommation_pd['Date'] = pd.to_datetime(consommation_pd['Date'])
+        if consommation_pd['Date'].duplicated().any():
+            consommation_pd = consommation_pd.drop_duplicates('Date')
+        consommation_pd.set_index('Date', inplace=True)
+    with stage('rolling 7', 'aggregate', rows=len(consommation_pd)):
+        consommation_pd['Consommation_smoothed'] = consommation_pd['Consommation brute totale (MW)'].rolling(window=7).mean()
+    with stage('sns.lineplot', 'render', rows=len(consommation_pd)):
+        import seaborn as sns
+        plt.figure(figsize=(12, 6))
+        sns.lineplot(data=consommation_pd, x=consommation_pd.index, y='Consommation_smoothed')
     plt.title('Smoothed Time Series of Energy Consumption')
     plt.xlabel('Date')
     plt.ylabel('Smoothed Consumption (MW)')
     plt.xticks(rotation=45)
-    st.pyplot(plt)
-    plt.close()
+    show_figure()
 
+@instrument('visualisation', rows=None)
 def plot_correlation(df):
-    consommation_pd = df.toPandas()
-    conditions = [
-        consommation_pd['Consommation brute gaz (MW PCS 0°C) - GRTgaz'] > consommation_pd['Consommation brute électricité (MW) - RTE'],
-        consommation_pd['Consommation brute gaz (MW PCS 0°C) - GRTgaz'] <= consommation_pd['Consommation brute électricité (MW) - RTE']
-    ]
-    colors = ['red', 'blue']  
-    consommation_pd['colors'] = np.select(conditions, colors)
-
-    plt.figure(figsize=(10, 6))
-    sns.scatterplot(x='Consommation brute gaz (MW PCS 0°C) - GRTgaz',
-                    y='Consommation brute électricité (MW) - RTE',
-                    data=consommation_pd,
-                    palette=colors,
-                    hue='colors',
-                    legend=None)  
+    consommation_pd = to_pandas(df)
+    with stage('couleurs', 'transform', rows=len(consommation_pd)):
+        colors = ['red', 'blue']
+        consommation_pd['colors'] = np.where(consommation_pd['Consommation brute gaz (MW PCS 0°C) - GRTgaz'] >
+                                             consommation_pd['Consommation brute électricité (MW) - RTE'], 'red', 'blue')
+
+    with stage('sns.scatterplot', 'render', rows=len(consommation_pd)):
+        import seaborn as sns
+        plt.figure(figsize=(10, 6))
+        sns.scatterplot(x='Consommation brute gaz (MW PCS 0°C) - GRTgaz',
+                        y='Consommation brute électricité (MW) - RTE',
+                        data=consommation_pd,
+                        palette=dict(zip(colors, colors)),
+                        hue='colors',
+                        legend=None)  
 
     plt.title('Correlation between Gas and Electricity Consumption')
     plt.xlabel('Gas Consumption (MW)')
     plt.ylabel('Electricity Consumption (MW)', color='black')
-    st.pyplot(plt)
-    plt.close()
+    show_figure()
 
+@instrument('visualisation', rows=None)
 def plot_monthly_boxplot(df):
-    consommation_pd = df.toPandas()
-    consommation_pd['Month'] = pd.to_datetime(consommation_pd['Date']).dt.month
-    plt.figure(figsize=(12, 8))
-    sns.boxplot(x='Month', y='Consommation brute totale (MW)', data=consommation_pd)
+    consommation_pd = to_pandas(df)
+    with stage('mois', 'transform', rows=len(consommation_pd)):
+        consommation_pd['Month'] = pd.to_datetime(consommation_pd['Date']).dt.month
+    with stage('sns.boxplot', 'render', rows=len(consommation_pd)):
+        import seaborn as sns
+        plt.figure(figsize=(12, 8))
+        sns.boxplot(x='Month', y='Consommation brute totale (MW)', data=consommation_pd)
     plt.title('Monthly Boxplot of Energy Consumption')
     plt.xlabel('Month')
     plt.ylabel('Energy Consumption (MW)')
-    st.pyplot(plt)
-    plt.close()
+    show_figure()
 
 def main():
     st.title('Analyse de Consommation Énergétique')
 
     tabs = st.sidebar.radio("Navigation", ["Visualisation", "Analyse"])
+    debug = st.sidebar.checkbox("Mode debug (instrumentation)")
+    tracer = session_tracer(st)
+    tracer.reset()
+    tracer.enable_memory_tracing(debug)
     fallback_csv_path = './Consomation&Mouvement.csv'
     spark = create_spark_session()
     
@@ -186,14 +236,22 @@ def main():
     elif tabs == "Analyse":
         st.subheader("Analyse Statistique")
 
-        t_stat, p_value, consommation_pd = statistical_analysis(df)
+        with stage('statistical_analysis', 'aggregate') as span:
+            t_stat, p_value, boites = statistical_analysis(df)
+            span.rows = len(boites)
         st.write("T-statistic:", t_stat)
         st.write("P-value:", p_value)
         st.write("p est inférieure au seuil prédéfini ( 0.05), alors on rejette l'hypothèse nulle, ce qui suggère que les différences entre les moyennes des groupes sont statistiquement significatives.")
-        plt.figure(figsize=(10, 6))
-        sns.boxplot(x='mouvement_social_num', y='Consommation brute totale (MW)', data=consommation_pd)
+        with stage('bxp mouvement social', 'render', rows=len(boites)):
+            plt.figure(figsize=(10, 6))
+            plt.gca().bxp(boites, showfliers=False)
+            plt.xlabel('mouvement_social_num')
+            plt.ylabel('Consommation brute totale (MW)')
         plt.title('Distribution de la Consommation Énergétique par Statut de Mouvement Social')
-        st.pyplot(plt)
+        show_figure()
+
+    if debug:
+        render_debug_panel(st, tracer)
 
     spark.stop()
 
@@ -1,18 +1,47 @@
+import os
 import streamlit as st
 import pandas as pd
 import numpy as np
-import scipy.stats as stats
-import seaborn as sns
 import matplotlib.pyplot as plt
+# seaborn (import coûteux) est importé à la demande dans les étapes de rendu
 from datetime import datetime
+from functools import partial
+from anomalies import hourly_series, AnomalyStore, COLONNES_ANOMALIES
+from impact_stats import (sufficient_stats, welch_test, stratified_test, cells, bootstrap_ci,
+                          permutation_test, box_stats)
+from instrumentation import session_tracer, stage, instrument, render_debug_panel
+from timeseries_store import TimeSeriesStore
+from column_store import ColumnStore
+from schemas import SCHEMAS, SchemaError, format_report, has_columns
+import query_api
 
+# Nombre maximal de points du nuage gaz / électricité demandés au service d'agrégats (un commentaire
+# et non une chaîne : Streamlit afficherait une chaîne isolée du script)
+TAILLE_NUAGE = 20000
+
+def show_figure():
+    """
+    Envoie la figure courante à Streamlit (sérialisation mesurée) puis la ferme
+    """
+    with stage('st.pyplot', 'serialize'):
+        st.pyplot(plt)
+    plt.close()
+
+@instrument('load', rows='output')
 def load_data_pandas(csv_path):
     """
-    Charge les données avec pandas au lieu de PySpark
+    Charge les données avec pandas au lieu de PySpark, validées une fois pour toutes par le schéma
+    'consommation_brute' (colonnes, types, unités, statuts)
     """
+    schema = SCHEMAS['consommation_brute']
     try:
+        # Un fichier sans les colonnes requises est rejeté sur son seul en-tête
+        schema.check_header(csv_path)
+        
         # Charger le CSV avec pandas en gérant les lignes vides et erreurs
-        df = pd.read_csv(csv_path, skiprows=0, skip_blank_lines=True)
+        with stage('read_csv', 'load') as span:
+            df = pd.read_csv(csv_path, skiprows=0, skip_blank_lines=True)
+            span.rows = len(df)
         
         # Nettoyer les lignes complètement vides
         df = df.dropna(how='all')
@@ -21,56 +50,31 @@ def load_data_pandas(csv_path):
         st.write("Colonnes détectées:", df.columns.tolist())
         st.write("Premières lignes brutes:", df.head(2))
         
-        # Renommer la colonne pour plus de facilité
-        if 'Date - Heure' in df.columns:
-            df = df.rename(columns={'Date - Heure': 'Date_Heure'})
+        # Renommage, conversion des types et contrôle des valeurs en une passe vectorisée
+        with stage('validation schéma', 'transform', rows=len(df)):
+            df, rapport = schema.validate(df)
+        if len(rapport):
+            st.warning(f"Valeurs hors schéma (types invalides convertis en valeurs manquantes) :\n{format_report(rapport)}")
         
-        # Convertir les colonnes de date avec gestion d'erreurs améliorée
-        if 'Date_Heure' in df.columns:
-            # Nettoyer d'abord les valeurs vides dans Date_Heure
-            df = df.dropna(subset=['Date_Heure'])
-            
-            # Convertir en datetime avec gestion d'erreurs
-            df['Date_Heure'] = pd.to_datetime(df['Date_Heure'], errors='coerce', utc=True)
-            
-            # Supprimer les lignes où la conversion a échoué
-            df = df.dropna(subset=['Date_Heure'])
-            
-            # Créer les colonnes temporelles seulement si Date_Heure existe et est valide
-            if len(df) > 0:
-                df['Date'] = df['Date_Heure'].dt.date
-                df['Heure'] = df['Date_Heure'].dt.time
-                df['Year'] = df['Date_Heure'].dt.year
-                df['Month'] = df['Date_Heure'].dt.month
-                df['DayOfYear'] = df['Date_Heure'].dt.dayofyear
+        # Supprimer les lignes sans date ou sans consommation totale
+        df = df.dropna(subset=['Date_Heure', 'Consommation brute totale (MW)'])
         
-        # Nettoyer les données numériques
-        if 'Consommation brute totale (MW)' in df.columns:
-            # Convertir en numérique et supprimer les lignes avec valeurs manquantes
-            df['Consommation brute totale (MW)'] = pd.to_numeric(df['Consommation brute totale (MW)'], errors='coerce')
-            df = df.dropna(subset=['Consommation brute totale (MW)'])
+        # Créer les colonnes temporelles
+        if len(df) > 0:
+            df['Date'] = df['Date_Heure'].dt.date
+            df['Heure'] = df['Date_Heure'].dt.time
+            df['Year'] = df['Date_Heure'].dt.year
+            df['Month'] = df['Date_Heure'].dt.month
+            df['DayOfYear'] = df['Date_Heure'].dt.dayofyear
         
         # Remplir les valeurs manquantes pour la consommation de gaz avec la moyenne
-        if 'Consommation brute gaz (MW PCS 0°C) - GRTgaz' in df.columns:
-            df['Consommation brute gaz (MW PCS 0°C) - GRTgaz'] = pd.to_numeric(
-                df['Consommation brute gaz (MW PCS 0°C) - GRTgaz'], errors='coerce'
-            )
-            mean_value = df['Consommation brute gaz (MW PCS 0°C) - GRTgaz'].mean()
-            df['Consommation brute gaz (MW PCS 0°C) - GRTgaz'].fillna(mean_value, inplace=True)
-        
-        # Gérer la colonne électricité
-        if 'Consommation brute électricité (MW) - RTE' in df.columns:
-            df['Consommation brute électricité (MW) - RTE'] = pd.to_numeric(
-                df['Consommation brute électricité (MW) - RTE'], errors='coerce'
-            )
+        df['Consommation brute gaz (MW PCS 0°C) - GRTgaz'] = df['Consommation brute gaz (MW PCS 0°C) - GRTgaz'].fillna(
+            df['Consommation brute gaz (MW PCS 0°C) - GRTgaz'].mean()
+        )
         
         # Créer la variable numérique pour les mouvements sociaux
         if 'mouvement_social' in df.columns:
-            # Convertir les booléens/strings en numérique
-            df['mouvement_social'] = df['mouvement_social'].astype(str).str.lower()
-            df['mouvement_social_num'] = df['mouvement_social'].map({
-                'true': 1, 'false': 0, '1': 1, '0': 0, 'yes': 1, 'no': 0
-            }).fillna(0).astype(int)
+            df['mouvement_social_num'] = df['mouvement_social'].fillna(False).astype(int)
         else:
             df['mouvement_social_num'] = 0
         
@@ -78,193 +82,425 @@ def load_data_pandas(csv_path):
         if len(df) == 0:
             raise ValueError("Aucune donnée valide trouvée après nettoyage")
         
+        # Les colonnes du schéma et les colonnes dérivées sont garanties aux graphiques
+        df.attrs['schema'] = schema.nom
         return df
         
+    except SchemaError as e:
+        st.error(str(e))
+        return None
     except Exception as e:
         st.error(f"Erreur lors du chargement des données: {e}")
         import traceback
         st.error(f"Détails de l'erreur: {traceback.format_exc()}")
         return None
 
-def statistical_analysis(df):
+def consumption_store(df, directory=None):
     """
-    Analyse statistique avec pandas
+    Stockage multi-résolution (heure/jour/semaine/mois) de la consommation, complété avec les
+    heures de df postérieures à celles déjà enregistrées
+    """
+    store = TimeSeriesStore(directory)
+    store.append(df)
+    return store
+
+def fetch_aggregate(api, chemin, **params):
+    """
+    Résultat d'un point d'accès du service d'agrégats (query_api.py), mesuré comme un chargement
+    """
+    with stage(f'query_api {chemin}', 'load') as span:
+        resultat = query_api.fetch(api, chemin, **params)
+        span.rows = len(resultat)
+    return resultat
+
+def fetch_series(api, chemin, champ, **params):
+    """
+    Champ `champ` d'un point d'accès du service d'agrégats, indexé par son champ 'date'
+    """
+    resultat = fetch_aggregate(api, chemin, **params)
+    return pd.Series(resultat[champ].to_numpy(dtype='float64'), index=pd.to_datetime(resultat['date']), name=champ)
+
+def fetch_box_stats(api, par):
+    """
+    Boîtes à moustaches (format Axes.bxp) construites à partir des quartiles calculés par le service
+    """
+    quartiles = fetch_aggregate(api, '/box', colonne='totale', par=par)
+    return [box_stats(int(ligne.cle), ligne.q1, ligne.mediane, ligne.q3, ligne.minimum, ligne.maximum)
+            for ligne in quartiles.itertuples()]
+
+def fetch_sufficient_stats(api, strate=None):
     """
-    if 'mouvement_social_num' not in df.columns or 'Consommation brute totale (MW)' not in df.columns:
+    Statistiques suffisantes calculées par le service, indexées par (strate, groupe) comme sufficient_stats
+    """
+    return fetch_aggregate(api, '/impact', strate=strate).set_index(['strate', 'groupe'])
+
+def statistical_analysis(df, api=None):
+    """
+    Analyse statistique avec pandas (test de Welch sur les statistiques suffisantes, demandées au
+    service d'agrégats `api` s'il est fourni)
+    """
+    if api is not None:
+        resultat = welch_test(fetch_sufficient_stats(api))
+        return resultat['t_stat'], resultat['p_value'], df
+    
+    if not has_columns(df, ['mouvement_social_num', 'Consommation brute totale (MW)']):
         return None, None, df
     
-    group1 = df[df['mouvement_social_num'] == 1]['Consommation brute totale (MW)']
-    group2 = df[df['mouvement_social_num'] == 0]['Consommation brute totale (MW)']
+    resultat = welch_test(sufficient_stats(df))
+    return resultat['t_stat'], resultat['p_value'], df
+
+def stratified_analysis(df, strate, n_resamples=0, api=None):
+    """
+    Analyse stratifiée (mois, jour de la semaine ou opérateur) avec, en option, 
+    intervalle de confiance bootstrap et test de permutation (calculés par le service
+    d'agrégats `api` s'il est fourni)
+    """
+    if api is not None:
+        detail, combine = stratified_test(fetch_sufficient_stats(api, strate))
+        reechantillonnage = None
+        if n_resamples > 0:
+            resultat = fetch_aggregate(api, '/resampling', strate=strate, n=n_resamples).iloc[0]
+            reechantillonnage = {
+                'bootstrap': {'borne_basse': resultat['borne_basse'], 'borne_haute': resultat['borne_haute']},
+                'permutation': {'p_value': resultat['p_value']},
+            }
+        return detail, combine, reechantillonnage
     
-    if len(group1) > 0 and len(group2) > 0:
-        t_stat, p_value = stats.ttest_ind(group1, group2, equal_var=False)
-        return t_stat, p_value, df
-    else:
-        return None, None, df
+    detail, combine = stratified_test(sufficient_stats(df, strate=strate))
+    reechantillonnage = None
+    if n_resamples > 0:
+        cellules = cells(df, strate=strate)
+        reechantillonnage = {
+            'bootstrap': bootstrap_ci(cellules, n_resamples=n_resamples),
+            'permutation': permutation_test(cellules, n_permutations=n_resamples),
+        }
+    return detail, combine, reechantillonnage
 
-def plot_average_consumption_per_year(df):
+@instrument('visualisation')
+def plot_average_consumption_per_year(df, store=None, api=None):
     """
-    Graphique de la consommation moyenne par année
+    Graphique de la consommation moyenne par année (demandée au service d'agrégats `api` s'il est
+    fourni, sinon lue dans le stockage multi-résolution s'il est fourni)
     """
-    if 'Year' not in df.columns or 'Consommation brute totale (MW)' not in df.columns:
+    if api is None and not has_columns(df, ['Year', 'Consommation brute totale (MW)']):
         st.error("Colonnes nécessaires manquantes pour ce graphique")
         return
     
-    avg_consumption_year = df.groupby('Year')['Consommation brute totale (MW)'].mean().reset_index()
+    if api is not None:
+        annuel = fetch_aggregate(api, '/yearly', colonne='totale')
+        avg_consumption_year = annuel.rename(columns={'annee': 'Year', 'moyenne': 'Consommation brute totale (MW)'})
+    elif store is not None:
+        with stage('store.query year', 'aggregate') as span:
+            annuel = store.query(['Consommation brute totale (MW)'], resolution='year')
+            avg_consumption_year = pd.DataFrame({'Year': annuel.index.year,
+                                                 'Consommation brute totale (MW)': annuel.iloc[:, 0].to_numpy()})
+            span.rows = len(annuel)
+    else:
+        with stage('groupby Year', 'aggregate', rows=len(df)):
+            avg_consumption_year = df.groupby('Year')['Consommation brute totale (MW)'].mean().reset_index()
     
-    plt.figure(figsize=(10, 6))
-    sns.barplot(data=avg_consumption_year, x='Year', y='Consommation brute totale (MW)')
+    with stage('sns.barplot', 'render', rows=len(avg_consumption_year)):
+        import seaborn as sns
+        plt.figure(figsize=(10, 6))
+        sns.barplot(data=avg_consumption_year, x='Year', y='Consommation brute totale (MW)')
     plt.title('Moyenne de la Consommation par Année')
     plt.xlabel('Année')
     plt.ylabel('Moyenne de Consommation (MW)')
     plt.xticks(rotation=45)
-    st.pyplot(plt)
-    plt.close()
+    show_figure()
 
-def plot_monthly_average_consumption(df):
+@instrument('visualisation')
+def plot_monthly_average_consumption(df, store=None, api=None):
     """
-    Graphique de la consommation moyenne par mois
+    Graphique de la consommation moyenne par mois (demandée au service d'agrégats `api` s'il est
+    fourni, sinon lue dans le stockage multi-résolution s'il est fourni)
     """
-    if 'Month' not in df.columns or 'Consommation brute totale (MW)' not in df.columns:
+    if api is None and not has_columns(df, ['Month', 'Consommation brute totale (MW)']):
         st.error("Colonnes nécessaires manquantes pour ce graphique")
         return
     
-    avg_consumption_month = df.groupby('Month')['Consommation brute totale (MW)'].mean().reset_index()
+    if api is not None:
+        mensuel = fetch_aggregate(api, '/monthly', colonne='totale')
+        avg_consumption_month = mensuel.rename(columns={'mois': 'Month', 'moyenne': 'Consommation brute totale (MW)'})
+    elif store is not None:
+        with stage('store.query month', 'aggregate') as span:
+            # Moyenne par mois de l'année : sommes et effectifs mensuels combinés sur toutes les années
+            mensuel = store.query(['Consommation brute totale (MW)'], resolution='month', stat='all')
+            mensuel = mensuel['Consommation brute totale (MW)'].groupby(mensuel.index.month)[['sum', 'count']].sum()
+            avg_consumption_month = pd.DataFrame({'Month': mensuel.index,
+                                                  'Consommation brute totale (MW)': mensuel['sum'] / mensuel['count']})
+            span.rows = len(mensuel)
+    else:
+        with stage('groupby Month', 'aggregate', rows=len(df)):
+            avg_consumption_month = df.groupby('Month')['Consommation brute totale (MW)'].mean().reset_index()
     
-    plt.figure(figsize=(10, 6))
-    sns.barplot(data=avg_consumption_month, x='Month', y='Consommation brute totale (MW)')
+    with stage('sns.barplot', 'render', rows=len(avg_consumption_month)):
+        import seaborn as sns
+        plt.figure(figsize=(10, 6))
+        sns.barplot(data=avg_consumption_month, x='Month', y='Consommation brute totale (MW)')
     plt.title('Moyenne de la Consommation par Mois')
     plt.xlabel('Mois')
     plt.ylabel('Moyenne de Consommation (MW)')
     plt.xticks(rotation=45)
-    st.pyplot(plt)
-    plt.close()
+    show_figure()
 
-def plot_gas_vs_electricity_consumption(df):
+@instrument('visualisation')
+def plot_gas_vs_electricity_consumption(df, store=None, colonnes=None, api=None):
     """
-    Graphique de comparaison gaz vs électricité
+    Graphique de comparaison gaz vs électricité (moyennes hebdomadaires demandées au service
+    d'agrégats `api` s'il est fourni, sinon lues dans le stockage multi-résolution s'il est fourni,
+    sinon calculées sur les colonnes en mémoire partagée) et, avec le service ou les colonnes,
+    ratio hebdomadaire gaz / électricité
     """
     required_cols = ['Date', 'Consommation brute gaz (MW PCS 0°C) - GRTgaz', 'Consommation brute électricité (MW) - RTE']
-    if not all(col in df.columns for col in required_cols):
+    if api is None and not has_columns(df, required_cols):
         st.error("Colonnes nécessaires manquantes pour ce graphique")
         return
     
-    # Préparation des données
-    df_copy = df.copy()
-    df_copy['Date'] = pd.to_datetime(df_copy['Date'])
-    df_copy = df_copy.set_index('Date')
-    df_weekly = df_copy.resample('W')[required_cols[1:]].mean()
+    if api is not None:
+        df_weekly = pd.DataFrame({required_cols[1]: fetch_series(api, '/weekly', 'moyenne', colonne='gaz'),
+                                  required_cols[2]: fetch_series(api, '/weekly', 'moyenne', colonne='electricite')})
+    elif store is not None:
+        with stage('store.query week', 'aggregate') as span:
+            df_weekly = store.query(required_cols[1:], resolution='week')
+            span.rows = len(df_weekly)
+    elif colonnes is not None:
+        with stage('colonnes.weekly_means', 'aggregate', rows=len(colonnes)):
+            df_weekly = colonnes.weekly_means(('gaz', 'electricite'))
+    else:
+        # Préparation des données
+        with stage('copy + to_datetime', 'transform', rows=len(df)):
+            df_copy = df.copy()
+            df_copy['Date'] = pd.to_datetime(df_copy['Date'])
+            df_copy = df_copy.set_index('Date')
+        with stage('resample W', 'aggregate', rows=len(df_copy)):
+            df_weekly = df_copy.resample('W')[required_cols[1:]].mean()
     
-    plt.figure(figsize=(10, 6))
-    sns.lineplot(data=df_weekly, x=df_weekly.index, y='Consommation brute gaz (MW PCS 0°C) - GRTgaz', label='Consommation de Gaz')
-    sns.lineplot(data=df_weekly, x=df_weekly.index, y='Consommation brute électricité (MW) - RTE', label='Consommation d\'Électricité')
+    with stage('sns.lineplot', 'render', rows=len(df_weekly)):
+        import seaborn as sns
+        plt.figure(figsize=(10, 6))
+        sns.lineplot(data=df_weekly, x=df_weekly.index, y='Consommation brute gaz (MW PCS 0°C) - GRTgaz', label='Consommation de Gaz')
+        sns.lineplot(data=df_weekly, x=df_weekly.index, y='Consommation brute électricité (MW) - RTE', label='Consommation d\'Électricité')
     plt.title('Consommation de Gaz vs Consommation d\'Électricité')
     plt.xlabel('Date')
     plt.ylabel('Consommation (MW)')
     plt.xticks(rotation=45)
     plt.legend()
-    st.pyplot(plt)
-    plt.close()
+    show_figure()
 
-def plot_heatmap_daily_hourly_consumption(df):
+    ratio = None
+    if api is not None:
+        ratio = fetch_series(api, '/weekly-ratio', 'ratio')
+    elif colonnes is not None:
+        with stage('colonnes.ratio', 'aggregate', rows=len(colonnes)):
+            ratio = colonnes.weekly(colonnes.ratio('gaz', 'electricite'))
+    if ratio is not None:
+        with stage('plt.plot ratio', 'render', rows=len(ratio)):
+            plt.figure(figsize=(10, 4))
+            plt.plot(ratio.index, ratio.values, color='purple')
+            plt.axhline(1, color='grey', linestyle='--')
+        plt.title('Ratio Gaz / Électricité (moyenne hebdomadaire)')
+        plt.xlabel('Date')
+        plt.ylabel('Ratio')
+        plt.xticks(rotation=45)
+        show_figure()
+
+@instrument('visualisation')
+def plot_heatmap_daily_hourly_consumption(df, api=None):
     """
-    Heatmap de la consommation par heure et jour de la semaine
+    Heatmap de la consommation par heure et jour de la semaine (matrice demandée au service
+    d'agrégats `api` s'il est fourni)
     """
-    if 'Date_Heure' not in df.columns or 'Consommation brute totale (MW)' not in df.columns:
+    if api is None and not has_columns(df, ['Date_Heure', 'Consommation brute totale (MW)']):
         st.error("Colonnes nécessaires manquantes pour ce graphique")
         return
     
-    df_copy = df.copy()
-    df_copy['Hour'] = df_copy['Date_Heure'].dt.hour
-    df_copy['DayOfWeek'] = df_copy['Date_Heure'].dt.dayofweek
-    
-    pivot_table = df_copy.pivot_table(values='Consommation brute totale (MW)', 
-                                     index='Hour', 
-                                     columns='DayOfWeek', 
-                                     aggfunc='mean')
+    if api is not None:
+        pivot_table = fetch_aggregate(api, '/hour-weekday', colonne='totale').set_index('heure')
+        pivot_table.columns = pivot_table.columns.astype(int)
+    else:
+        with stage('copy + heure/jour', 'transform', rows=len(df)):
+            df_copy = df.copy()
+            df_copy['Hour'] = df_copy['Date_Heure'].dt.hour
+            df_copy['DayOfWeek'] = df_copy['Date_Heure'].dt.dayofweek
+        
+        with stage('pivot_table', 'aggregate', rows=len(df_copy)):
+            pivot_table = df_copy.pivot_table(values='Consommation brute totale (MW)', 
+                                             index='Hour', 
+                                             columns='DayOfWeek', 
+                                             aggfunc='mean')
     
-    plt.figure(figsize=(12, 8))
-    sns.heatmap(pivot_table, annot=True, fmt=".0f", cmap='coolwarm')
+    with stage('sns.heatmap', 'render', rows=len(pivot_table)):
+        import seaborn as sns
+        plt.figure(figsize=(12, 8))
+        sns.heatmap(pivot_table, annot=True, fmt=".0f", cmap='coolwarm')
     plt.title('Heatmap of Energy Consumption by Hour and Day of Week')
     plt.xlabel('Day of Week')
     plt.ylabel('Hour of Day')
-    st.pyplot(plt)
-    plt.close()
+    show_figure()
 
-def plot_smoothed_time_series(df):
+@instrument('visualisation')
+def plot_smoothed_time_series(df, api=None):
     """
-    Série temporelle lissée
+    Série temporelle lissée (demandée au service d'agrégats `api` s'il est fourni)
     """
-    if 'Date' not in df.columns or 'Consommation brute totale (MW)' not in df.columns:
+    if api is None and not has_columns(df, ['Date', 'Consommation brute totale (MW)']):
         st.error("Colonnes nécessaires manquantes pour ce graphique")
         return
     
-    df_copy = df.copy()
-    df_copy['Date'] = pd.to_datetime(df_copy['Date'])
-    
-    # Supprimer les doublons par date
-    df_copy = df_copy.drop_duplicates('Date')
-    df_copy = df_copy.set_index('Date').sort_index()
-    
-    # Appliquer le lissage
-    df_copy['Consommation_smoothed'] = df_copy['Consommation brute totale (MW)'].rolling(window=7).mean()
+    if api is not None:
+        df_copy = fetch_series(api, '/smoothed', 'lissee', colonne='totale', fenetre=7).to_frame('Consommation_smoothed')
+    else:
+        with stage('copy + dédoublonnage', 'transform', rows=len(df)):
+            df_copy = df.copy()
+            df_copy['Date'] = pd.to_datetime(df_copy['Date'])
+            
+            # Supprimer les doublons par date
+            df_copy = df_copy.drop_duplicates('Date')
+            df_copy = df_copy.set_index('Date').sort_index()
+        
+        # Appliquer le lissage
+        with stage('rolling 7', 'aggregate', rows=len(df_copy)):
+            df_copy['Consommation_smoothed'] = df_copy['Consommation brute totale (MW)'].rolling(window=7).mean()
     
-    plt.figure(figsize=(12, 6))
-    sns.lineplot(data=df_copy, x=df_copy.index, y='Consommation_smoothed')
+    with stage('sns.lineplot', 'render', rows=len(df_copy)):
+        import seaborn as sns
+        plt.figure(figsize=(12, 6))
+        sns.lineplot(data=df_copy, x=df_copy.index, y='Consommation_smoothed')
     plt.title('Smoothed Time Series of Energy Consumption')
     plt.xlabel('Date')
     plt.ylabel('Smoothed Consumption (MW)')
     plt.xticks(rotation=45)
-    st.pyplot(plt)
-    plt.close()
+    show_figure()
 
-def plot_correlation(df):
+@instrument('visualisation')
+def plot_correlation(df, colonnes=None, api=None):
     """
-    Graphique de corrélation
+    Graphique de corrélation ; avec les colonnes en mémoire partagée, le nuage est tracé
+    directement sur les tableaux et complété par la corrélation croisée décalée, et avec le
+    service d'agrégats `api` le nuage est un échantillon régulier de TAILLE_NUAGE points
     """
     required_cols = ['Consommation brute gaz (MW PCS 0°C) - GRTgaz', 'Consommation brute électricité (MW) - RTE']
-    if not all(col in df.columns for col in required_cols):
+    if api is None and not has_columns(df, required_cols):
         st.error("Colonnes nécessaires manquantes pour ce graphique")
         return
     
-    # Créer les conditions pour les couleurs
-    conditions = [
-        df['Consommation brute gaz (MW PCS 0°C) - GRTgaz'] > df['Consommation brute électricité (MW) - RTE'],
-        df['Consommation brute gaz (MW PCS 0°C) - GRTgaz'] <= df['Consommation brute électricité (MW) - RTE']
-    ]
-    colors = ['red', 'blue']
-    df_copy = df.copy()
-    df_copy['colors'] = np.select(conditions, colors)
+    gaz = electricite = None
+    if api is not None:
+        couples = fetch_aggregate(api, '/scatter', n=TAILLE_NUAGE)
+        gaz, electricite = couples['gaz'].to_numpy(dtype='float64'), couples['electricite'].to_numpy(dtype='float64')
+    elif colonnes is not None:
+        gaz, electricite = colonnes['gaz'], colonnes['electricite']
     
-    plt.figure(figsize=(10, 6))
-    sns.scatterplot(x='Consommation brute gaz (MW PCS 0°C) - GRTgaz',
-                    y='Consommation brute électricité (MW) - RTE',
-                    data=df_copy,
-                    palette=colors,
-                    hue='colors',
-                    legend=None)
+    if gaz is not None:
+        with stage('plt.scatter', 'render', rows=len(gaz)):
+            from matplotlib.colors import ListedColormap
+            plt.figure(figsize=(10, 6))
+            plt.scatter(gaz, electricite, c=gaz > electricite, cmap=ListedColormap(['blue', 'red']), s=5)
+    else:
+        # Rouge quand le gaz dépasse l'électricité, bleu sinon
+        with stage('couleurs', 'transform', rows=len(df)):
+            colors = ['red', 'blue']
+            df_copy = df.copy()
+            df_copy['colors'] = np.where(df['Consommation brute gaz (MW PCS 0°C) - GRTgaz'] >
+                                         df['Consommation brute électricité (MW) - RTE'], 'red', 'blue')
+        
+        with stage('sns.scatterplot', 'render', rows=len(df_copy)):
+            import seaborn as sns
+            plt.figure(figsize=(10, 6))
+            sns.scatterplot(x='Consommation brute gaz (MW PCS 0°C) - GRTgaz',
+                            y='Consommation brute électricité (MW) - RTE',
+                            data=df_copy,
+                            palette=dict(zip(colors, colors)),
+                            hue='colors',
+                            legend=None)
     
     plt.title('Correlation between Gas and Electricity Consumption')
     plt.xlabel('Gas Consumption (MW)')
     plt.ylabel('Electricity Consumption (MW)')
-    st.pyplot(plt)
-    plt.close()
+    show_figure()
 
-def plot_monthly_boxplot(df):
+    correlation = None
+    if api is not None:
+        correlation = fetch_aggregate(api, '/cross-correlation', max_lag=48).set_index('decalage_h')['correlation']
+        correlation = correlation.astype('float64')
+    elif colonnes is not None:
+        with stage('colonnes.cross_correlation', 'aggregate', rows=len(colonnes)):
+            correlation = colonnes.cross_correlation('gaz', 'electricite', max_lag=48)
+    if correlation is not None:
+        meilleur = correlation.idxmax()
+        st.write(f"Corrélation maximale : {correlation[meilleur]:.3f} pour un décalage de {meilleur} h "
+                 f"(électricité décalée par rapport au gaz)")
+        with stage('plt.bar decalages', 'render', rows=len(correlation)):
+            plt.figure(figsize=(10, 4))
+            plt.bar(correlation.index, correlation.values, color='grey')
+        plt.title('Corrélation croisée Gaz / Électricité')
+        plt.xlabel('Décalage (heures)')
+        plt.ylabel('Corrélation')
+        show_figure()
+
+@instrument('visualisation')
+def plot_monthly_boxplot(df, api=None):
     """
-    Boxplot mensuel
+    Boxplot mensuel (à partir des quartiles calculés par le service d'agrégats `api` s'il est fourni)
     """
-    if 'Month' not in df.columns or 'Consommation brute totale (MW)' not in df.columns:
+    if api is None and not has_columns(df, ['Month', 'Consommation brute totale (MW)']):
         st.error("Colonnes nécessaires manquantes pour ce graphique")
         return
     
-    plt.figure(figsize=(12, 8))
-    sns.boxplot(x='Month', y='Consommation brute totale (MW)', data=df)
+    if api is not None:
+        boites = fetch_box_stats(api, 'mois')
+        with stage('bxp', 'render', rows=len(boites)):
+            plt.figure(figsize=(12, 8))
+            plt.gca().bxp(boites, showfliers=False)
+    else:
+        with stage('sns.boxplot', 'render', rows=len(df)):
+            import seaborn as sns
+            plt.figure(figsize=(12, 8))
+            sns.boxplot(x='Month', y='Consommation brute totale (MW)', data=df)
     plt.title('Monthly Boxplot of Energy Consumption')
     plt.xlabel('Month')
     plt.ylabel('Energy Consumption (MW)')
-    st.pyplot(plt)
-    plt.close()
+    show_figure()
+
+@instrument('visualisation')
+def plot_consumption_anomalies(df, anomalies_store=None, api=None):
+    """
+    Série horaire avec superposition de la table des anomalies (médiane/MAD et résidus saisonniers),
+    complétée au préalable avec les seules heures non encore scorées, ou série et anomalies
+    demandées au service d'agrégats `api` s'il est fourni
+    """
+    if api is None and not has_columns(df, ['Date_Heure', 'Consommation brute totale (MW)']):
+        st.error("Colonnes nécessaires manquantes pour ce graphique")
+        return
+    
+    if api is not None:
+        serie = fetch_series(api, '/hourly', 'valeur', colonne='totale')
+        anomalies = fetch_aggregate(api, '/anomalies').reindex(columns=COLONNES_ANOMALIES)
+        anomalies['Date_Heure'] = pd.to_datetime(anomalies['Date_Heure'])
+    else:
+        with stage('hourly_series', 'aggregate', rows=len(df)):
+            serie = hourly_series(df)
+        with stage('anomalies_store.update', 'transform') as span:
+            span.rows = len(anomalies_store.update(serie))
+        with stage('anomalies_store.load', 'load') as span:
+            anomalies = anomalies_store.load(serie.index[0], serie.index[-1])
+            span.rows = len(anomalies)
+    
+    with stage('plt.plot', 'render', rows=len(serie)):
+        plt.figure(figsize=(12, 6))
+        plt.plot(serie.index, serie.values, linewidth=0.5, label='Consommation horaire')
+        plt.scatter(anomalies['Date_Heure'], anomalies['valeur'], color='red', s=15, label='Anomalies', zorder=3)
+    plt.title('Anomalies de la Consommation Horaire')
+    plt.xlabel('Date')
+    plt.ylabel('Consommation (MW)')
+    plt.xticks(rotation=45)
+    plt.legend()
+    show_figure()
+    
+    st.write(f"{len(anomalies)} heures anormales détectées.")
+    if len(anomalies) > 0:
+        st.dataframe(anomalies)
 
 def main():
     st.title('Analyse de Consommation Énergétique (Version Pandas)')
@@ -272,46 +508,81 @@ def main():
 
     tabs = st.sidebar.radio("Navigation", ["Visualisation", "Analyse"])
     
-    # Chemin vers le fichier CSV
-    csv_path = './Consomation&Mouvement.csv'
-    
-    # Vérifier si le fichier existe
-    import os
-    if not os.path.exists(csv_path):
-        st.error(f"Le fichier {csv_path} n'existe pas. Veuillez vérifier le chemin.")
-        return
+    # Instrumentation : durée, lignes et mémoire de chaque étape de l'exécution courante
+    debug = st.sidebar.checkbox("Mode debug (instrumentation)")
+    tracer = session_tracer(st)
+    tracer.reset()
+    tracer.enable_memory_tracing(debug)
     
-    # Charger les données avec pandas
-    with st.spinner("Chargement des données..."):
-        df = load_data_pandas(csv_path)
-    
-    if df is None:
-        st.error("Impossible de charger les données.")
-        return
+    # Chemin vers le fichier CSV et vers le stockage multi-résolution qui en est dérivé
+    csv_path = './Consomation&Mouvement.csv'
+    store_path = './timeseries_store'
+    colonnes_path = './column_store'
+    anomalies_path = './anomalies.csv'
     
-    st.success(f"Données chargées avec succès ! {len(df)} lignes.")
+    # Service d'agrégats partagé (query_api.py) : s'il est configuré, le tableau de bord est un client
+    # léger qui ne charge ni les données ni les stockages et demande chaque graphique au service
+    api = os.environ.get('ENERGIE_API_URL') or None
     
-    # Afficher un aperçu des données
-    with st.expander("Aperçu des données"):
-        st.write("Premières lignes :")
-        st.dataframe(df.head())
-        st.write("Colonnes disponibles :")
-        st.write(df.columns.tolist())
-        st.write("Informations sur les données :")
-        st.write(f"- Nombre de lignes: {len(df)}")
-        st.write(f"- Nombre de colonnes: {len(df.columns)}")
+    df = store = colonnes = None
+    if api is not None:
+        st.success(f"Agrégats servis par {api}.")
+    else:
+        # Vérifier si le fichier existe
+        if not os.path.exists(csv_path):
+            st.error(f"Le fichier {csv_path} n'existe pas. Veuillez vérifier le chemin.")
+            return
+        
+        # Charger les données avec pandas
+        with st.spinner("Chargement des données..."):
+            df = load_data_pandas(csv_path)
+        
+        if df is None:
+            st.error("Impossible de charger les données.")
+            return
+        
+        st.success(f"Données chargées avec succès ! {len(df)} lignes.")
+        
+        # Seules les heures absentes du stockage sont agrégées
+        if 'Date_Heure' in df.columns:
+            with stage('consumption_store', 'aggregate', rows=len(df)):
+                try:
+                    store = consumption_store(df, store_path)
+                except ValueError as e:
+                    st.warning(f"Stockage multi-résolution indisponible, agrégation sur les données horaires : {e}")
+        
+        # Colonnes gaz / électricité / totale en float32, partagées par tous les processus via le disque
+        if 'Date_Heure' in df.columns:
+            with stage('column_store', 'load', rows=len(df)):
+                try:
+                    colonnes = ColumnStore.open_or_build(colonnes_path, df, source=csv_path)
+                except ValueError as e:
+                    st.warning(f"Stockage en colonnes indisponible : {e}")
+        
+        # Afficher un aperçu des données
+        with st.expander("Aperçu des données"):
+            st.write("Premières lignes :")
+            st.dataframe(df.head())
+            st.write("Colonnes disponibles :")
+            st.write(df.columns.tolist())
+            st.write("Informations sur les données :")
+            st.write(f"- Nombre de lignes: {len(df)}")
+            st.write(f"- Nombre de colonnes: {len(df.columns)}")
+    lignes = None if df is None else len(df)
 
     if tabs == "Visualisation":
         st.subheader("Visualisation des Données")
 
         visualization_options = {
-            "Moyenne de la Consommation par Année": plot_average_consumption_per_year,
-            "Moyenne de la Consommation par Mois": plot_monthly_average_consumption,
-            "Consommation de Gaz vs Consommation d'Électricité": plot_gas_vs_electricity_consumption,
-            "Heatmap de la Consommation Énergétique par Heure et Jour de la Semaine": plot_heatmap_daily_hourly_consumption,
-            "Consommation énergétique au fil du temps": plot_smoothed_time_series,
-            "Corrélation entre la Consommation de Gaz et d'Électricité": plot_correlation,
-            "Distribution Mensuelle de la Consommation Énergétique": plot_monthly_boxplot
+            "Moyenne de la Consommation par Année": partial(plot_average_consumption_per_year, store=store, api=api),
+            "Moyenne de la Consommation par Mois": partial(plot_monthly_average_consumption, store=store, api=api),
+            "Consommation de Gaz vs Consommation d'Électricité": partial(plot_gas_vs_electricity_consumption, store=store, colonnes=colonnes, api=api),
+            "Heatmap de la Consommation Énergétique par Heure et Jour de la Semaine": partial(plot_heatmap_daily_hourly_consumption, api=api),
+            "Consommation énergétique au fil du temps": partial(plot_smoothed_time_series, api=api),
+            "Corrélation entre la Consommation de Gaz et d'Électricité": partial(plot_correlation, colonnes=colonnes, api=api),
+            "Distribution Mensuelle de la Consommation Énergétique": partial(plot_monthly_boxplot, api=api),
+            "Anomalies de la Consommation Horaire": partial(plot_consumption_anomalies,
+                                                            anomalies_store=AnomalyStore(anomalies_path), api=api)
         }
 
         selected_visualization = st.selectbox("Sélectionnez une visualisation prédéfinie", 
@@ -328,7 +599,8 @@ def main():
         st.subheader("Analyse Statistique")
 
         try:
-            t_stat, p_value, _ = statistical_analysis(df)
+            with stage('statistical_analysis', 'aggregate', rows=lignes):
+                t_stat, p_value, _ = statistical_analysis(df, api)
             
             if t_stat is not None and p_value is not None:
                 st.write("**Résultats du test t de Student:**")
@@ -341,20 +613,53 @@ def main():
                 else:
                     st.write("❌ p est supérieure au seuil prédéfini (0.05), on ne peut pas rejeter l'hypothèse nulle.")
                 
+                # Analyse stratifiée et rééchantillonnage
+                strates_disponibles = {"Mois": "mois", "Jour de la semaine": "jour_semaine"}
+                if df is not None and 'operateur' in df.columns:
+                    strates_disponibles["Opérateur"] = "operateur"
+                choix_strate = st.selectbox("Stratifier par", ["Aucune"] + list(strates_disponibles.keys()))
+                reechantillonner = st.checkbox("Intervalle de confiance bootstrap et test de permutation")
+                if choix_strate != "Aucune" or reechantillonner:
+                    strate = strates_disponibles.get(choix_strate)
+                    with st.spinner("Calcul des tests..."), stage('stratified_analysis', 'aggregate', rows=lignes):
+                        detail, combine, reechantillonnage = stratified_analysis(
+                            df, strate, n_resamples=2000 if reechantillonner else 0, api=api)
+                    if strate is not None:
+                        st.write("**Tests de Welch par strate:**")
+                        st.dataframe(detail)
+                        if combine['difference'] is not None:
+                            st.write(f"Effet combiné: {combine['difference']:.1f} MW "
+                                     f"(z = {combine['z_stat']:.4f}, p = {combine['p_value']:.4f})")
+                    if reechantillonnage is not None:
+                        bootstrap = reechantillonnage['bootstrap']
+                        st.write(f"Intervalle de confiance à 95% (bootstrap): "
+                                 f"[{bootstrap['borne_basse']:.1f}, {bootstrap['borne_haute']:.1f}] MW")
+                        st.write(f"P-value du test de permutation: {reechantillonnage['permutation']['p_value']:.4f}")
+                
                 # Boxplot
-                if 'mouvement_social_num' in df.columns and 'Consommation brute totale (MW)' in df.columns:
-                    plt.figure(figsize=(10, 6))
-                    sns.boxplot(x='mouvement_social_num', y='Consommation brute totale (MW)', data=df)
+                if api is not None or ('mouvement_social_num' in df.columns and 'Consommation brute totale (MW)' in df.columns):
+                    if api is not None:
+                        boites = fetch_box_stats(api, 'mouvement_social')
+                        with stage('bxp mouvement social', 'render', rows=len(boites)):
+                            plt.figure(figsize=(10, 6))
+                            plt.gca().bxp(boites, showfliers=False)
+                    else:
+                        with stage('sns.boxplot mouvement social', 'render', rows=len(df)):
+                            import seaborn as sns
+                            plt.figure(figsize=(10, 6))
+                            sns.boxplot(x='mouvement_social_num', y='Consommation brute totale (MW)', data=df)
                     plt.title('Distribution de la Consommation Énergétique par Statut de Mouvement Social')
                     plt.xlabel('Mouvement Social (0=Non, 1=Oui)')
                     plt.ylabel('Consommation brute totale (MW)')
-                    st.pyplot(plt)
-                    plt.close()
+                    show_figure()
             else:
                 st.warning("Impossible de réaliser l'analyse statistique avec les données disponibles.")
                 
         except Exception as e:
             st.error(f"Erreur lors de l'analyse statistique: {e}")
 
+    if debug:
+        render_debug_panel(st, tracer)
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
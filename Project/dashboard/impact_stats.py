@@ -0,0 +1,366 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+COLONNE_VALEUR = 'Consommation brute totale (MW)'
+COLONNE_GROUPE = 'mouvement_social_num'
+COLONNE_DATE = 'Date_Heure'
+
+""" Stratifications disponibles : mois, jour de la semaine ou opérateur """
+STRATES = ('mois', 'jour_semaine', 'operateur')
+STRATE_UNIQUE = 'ensemble'
+
+""" Nombre maximal d'éléments tirés par lot de rééchantillonnage (borne la mémoire des workers) """
+ELEMENTS_PAR_LOT = 5_000_000
+
+
+def strate_values(df, strate=None, colonne_date=COLONNE_DATE):
+    """
+    Calcule la strate de chaque ligne.
+
+    Args:
+    - df : DataFrame : Données de consommation.
+    - strate : str : None, 'mois', 'jour_semaine' ou 'operateur'.
+    - colonne_date : str : Colonne datetime utilisée pour 'mois' et 'jour_semaine'.
+
+    Returns:
+    - Series : La strate de chaque ligne.
+    """
+    if strate is None:
+        return pd.Series(STRATE_UNIQUE, index=df.index)
+    if strate not in STRATES:
+        raise ValueError(f"Stratification inconnue : {strate} (attendu : {STRATES})")
+    if strate == 'operateur':
+        return df['operateur'].astype(str)
+    if strate == 'mois' and 'Month' in df.columns:
+        return df['Month']
+    dates = pd.to_datetime(df[colonne_date] if colonne_date in df.columns else df['date'])
+    return dates.dt.month if strate == 'mois' else dates.dt.dayofweek
+
+
+def sufficient_stats(df, valeur=COLONNE_VALEUR, groupe=COLONNE_GROUPE, strate=None, decalage=0.0):
+    """
+    Statistiques suffisantes (effectif, somme, somme des carrés) par strate et par groupe.
+
+    Les sommes portent sur (valeur - decalage) : un décalage proche de la moyenne limite
+    les pertes de précision de la somme des carrés.
+
+    Args:
+    - df : DataFrame : Données de consommation.
+    - valeur : str : Colonne mesurée.
+    - groupe : str : Colonne binaire du groupe (1 = mouvement social).
+    - strate : str : None, 'mois', 'jour_semaine' ou 'operateur'.
+    - decalage : float : Constante retranchée aux valeurs avant sommation.
+
+    Returns:
+    - DataFrame : Colonnes n, somme, somme_carres, decalage, indexé par (strate, groupe).
+    """
+    x = pd.to_numeric(df[valeur], errors='coerce') - decalage
+    cadre = pd.DataFrame({'strate': strate_values(df, strate).to_numpy(),
+                          'groupe': df[groupe].astype('int8').to_numpy(),
+                          'x': x.to_numpy(), 'x2': (x * x).to_numpy()}).dropna(subset=['x'])
+    resultat = cadre.groupby(['strate', 'groupe']).agg(n=('x', 'size'), somme=('x', 'sum'),
+                                                       somme_carres=('x2', 'sum'))
+    resultat['decalage'] = decalage
+    return resultat
+
+
+def stream_sufficient_stats(chunks, valeur=COLONNE_VALEUR, groupe=COLONNE_GROUPE, strate=None):
+    """
+    Accumule les statistiques suffisantes sur une suite de morceaux, sans jamais les concaténer.
+
+    Le décalage est fixé à la moyenne du premier morceau.
+
+    Args:
+    - chunks : iterable : DataFrames successifs (par exemple pd.read_csv(..., chunksize=...)).
+    - valeur, groupe, strate : voir sufficient_stats.
+
+    Returns:
+    - DataFrame : Les statistiques suffisantes cumulées.
+    """
+    total = None
+    decalage = None
+    for chunk in chunks:
+        if decalage is None:
+            decalage = float(pd.to_numeric(chunk[valeur], errors='coerce').mean())
+            decalage = 0.0 if np.isnan(decalage) else decalage
+        partiel = sufficient_stats(chunk, valeur, groupe, strate, decalage)
+        total = partiel if total is None else total[['n', 'somme', 'somme_carres']].add(
+            partiel[['n', 'somme', 'somme_carres']], fill_value=0)
+        total['decalage'] = decalage
+    if total is None:
+        raise ValueError("Aucune donnée à agréger")
+    return total.astype({'n': 'int64'})
+
+
+def spark_sufficient_stats(sdf, valeur=COLONNE_VALEUR, groupe=COLONNE_GROUPE, strate=None, decalage=0.0):
+    """
+    Statistiques suffisantes calculées par Spark : seule la table agrégée est rapatriée.
+
+    Args:
+    - sdf : pyspark DataFrame : Données chargées par engie.load_data.
+    - valeur, groupe, decalage : voir sufficient_stats.
+    - strate : str : None, 'mois', 'jour_semaine' ou 'operateur'.
+
+    Returns:
+    - DataFrame : Les statistiques suffisantes, au même format que sufficient_stats.
+    """
+    from pyspark.sql import functions as F
+
+    if strate is None:
+        cle_strate = F.lit(STRATE_UNIQUE)
+    elif strate == 'mois':
+        cle_strate = F.month(F.col('Date'))
+    elif strate == 'jour_semaine':
+        # Spark numérote les jours de 1 (dimanche) à 7 ; on s'aligne sur pandas (0 = lundi)
+        cle_strate = (F.dayofweek(F.col('Date')) + 5) % 7
+    elif strate == 'operateur':
+        cle_strate = F.col('operateur').cast('string')
+    else:
+        raise ValueError(f"Stratification inconnue : {strate} (attendu : {STRATES})")
+
+    x = F.col(valeur).cast('double') - F.lit(decalage)
+    lignes = (sdf.where(F.col(valeur).isNotNull())
+              .groupBy(cle_strate.alias('strate'), F.col(groupe).cast('int').alias('groupe'))
+              .agg(F.count(F.lit(1)).alias('n'), F.sum(x).alias('somme'), F.sum(x * x).alias('somme_carres'))
+              .collect())
+    resultat = pd.DataFrame([r.asDict() for r in lignes], columns=['strate', 'groupe', 'n', 'somme', 'somme_carres'])
+    resultat['decalage'] = decalage
+    return resultat.set_index(['strate', 'groupe'])
+
+
+def _moments(stats_groupe):
+    """Effectif, moyenne et variance (non biaisée) à partir des statistiques suffisantes."""
+    n = stats_groupe['n'].to_numpy(dtype='float64')
+    somme = stats_groupe['somme'].to_numpy(dtype='float64')
+    somme_carres = stats_groupe['somme_carres'].to_numpy(dtype='float64')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        moyenne = somme / n
+        variance = np.maximum(somme_carres - somme * moyenne, 0) / (n - 1)
+    return n, moyenne + stats_groupe['decalage'].to_numpy(dtype='float64'), variance
+
+
+def welch_test(stats_suffisantes):
+    """
+    Test t de Welch (groupe 1 contre groupe 0) à partir des statistiques suffisantes.
+
+    Équivalent à scipy.stats.ttest_ind(groupe1, groupe0, equal_var=False), les strates étant fusionnées.
+
+    Args:
+    - stats_suffisantes : DataFrame : Résultat de sufficient_stats ou équivalent.
+
+    Returns:
+    - dict : t_stat, p_value, ddl, moyenne_1, moyenne_0, difference, n_1, n_0.
+    """
+    par_groupe = stats_suffisantes.groupby(level='groupe').agg(
+        {'n': 'sum', 'somme': 'sum', 'somme_carres': 'sum', 'decalage': 'first'})
+    if not {0, 1}.issubset(par_groupe.index):
+        return {'t_stat': None, 'p_value': None, 'ddl': None, 'moyenne_1': None, 'moyenne_0': None,
+                'difference': None, 'n_1': None, 'n_0': None}
+    n, moyenne, variance = _moments(par_groupe.loc[[1, 0]])
+    t_stat, p_value, ddl = _welch(moyenne[0], variance[0], n[0], moyenne[1], variance[1], n[1])
+    return {'t_stat': t_stat, 'p_value': p_value, 'ddl': ddl, 'moyenne_1': moyenne[0],
+            'moyenne_0': moyenne[1], 'difference': moyenne[0] - moyenne[1], 'n_1': int(n[0]), 'n_0': int(n[1])}
+
+
+def _welch(m1, v1, n1, m0, v0, n0):
+    """Statistique, p-value bilatérale et degrés de liberté du test de Welch (scalaires ou tableaux)."""
+    # Import différé : scipy n'est chargé qu'au premier test
+    import scipy.stats as stats
+    with np.errstate(invalid='ignore', divide='ignore'):
+        e1, e0 = v1 / n1, v0 / n0
+        t_stat = (m1 - m0) / np.sqrt(e1 + e0)
+        ddl = (e1 + e0) ** 2 / (e1 ** 2 / (n1 - 1) + e0 ** 2 / (n0 - 1))
+    return t_stat, 2 * stats.t.sf(np.abs(t_stat), ddl), ddl
+
+
+def stratified_test(stats_suffisantes):
+    """
+    Tests de Welch par strate et estimation combinée de l'effet.
+
+    L'effet combiné est la moyenne des écarts par strate pondérée par l'effectif de la strate,
+    testée par une statistique z.
+
+    Args:
+    - stats_suffisantes : DataFrame : Résultat de sufficient_stats avec une stratification.
+
+    Returns:
+    - (DataFrame, dict) : Le détail par strate et l'effet combiné (difference, z_stat, p_value).
+    """
+    larges = stats_suffisantes.unstack('groupe')
+    larges = larges[larges['n'].notna().all(axis=1)]
+    if len(larges) == 0 or not {0, 1}.issubset(larges['n'].columns):
+        return pd.DataFrame(), {'difference': None, 'z_stat': None, 'p_value': None}
+    n1, m1, v1 = _moments(larges.xs(1, axis=1, level='groupe'))
+    n0, m0, v0 = _moments(larges.xs(0, axis=1, level='groupe'))
+    t_stat, p_value, ddl = _welch(m1, v1, n1, m0, v0, n0)
+    detail = pd.DataFrame({'n_1': n1.astype('int64'), 'n_0': n0.astype('int64'), 'moyenne_1': m1,
+                           'moyenne_0': m0, 'difference': m1 - m0, 't_stat': t_stat, 'p_value': p_value,
+                           'ddl': ddl}, index=larges.index)
+
+    import scipy.stats as stats
+    poids = (n1 + n0) / (n1 + n0).sum()
+    difference = float(np.sum(poids * (m1 - m0)))
+    erreur = float(np.sqrt(np.nansum(poids ** 2 * (v1 / n1 + v0 / n0))))
+    z_stat = difference / erreur if erreur > 0 else np.nan
+    return detail, {'difference': difference, 'z_stat': z_stat, 'p_value': 2 * stats.norm.sf(abs(z_stat))}
+
+
+def cells(df, valeur=COLONNE_VALEUR, groupe=COLONNE_GROUPE, strate=None):
+    """
+    Découpe les valeurs par strate pour le rééchantillonnage.
+
+    Seule la colonne mesurée est extraite, en float64, avec le poids de chaque strate.
+
+    Returns:
+    - list : Tuples (valeurs groupe 1, valeurs groupe 0, poids), strates incomplètes écartées.
+    """
+    cadre = pd.DataFrame({'strate': strate_values(df, strate).to_numpy(),
+                          'groupe': df[groupe].astype('int8').to_numpy(),
+                          'x': pd.to_numeric(df[valeur], errors='coerce').to_numpy(dtype='float64')})
+    cadre = cadre.dropna(subset=['x'])
+    resultat = []
+    for _, morceau in cadre.groupby('strate', sort=True):
+        x1 = morceau.loc[morceau['groupe'] == 1, 'x'].to_numpy()
+        x0 = morceau.loc[morceau['groupe'] == 0, 'x'].to_numpy()
+        if len(x1) > 0 and len(x0) > 0:
+            resultat.append((x1, x0, len(morceau)))
+    total = sum(p for _, _, p in resultat)
+    return [(x1, x0, p / total) for x1, x0, p in resultat]
+
+
+def _observed(cellules):
+    return float(sum(p * (x1.mean() - x0.mean()) for x1, x0, p in cellules))
+
+
+def _taille_lot(restant, n):
+    return int(max(1, min(restant, ELEMENTS_PAR_LOT // max(n, 1))))
+
+
+def _bootstrap_worker(args):
+    """Écarts de moyennes bootstrap (tirage avec remise dans chaque groupe de chaque strate)."""
+    cellules, n_tirages, graine = args
+    rng = np.random.default_rng(graine)
+    resultats = np.zeros(n_tirages)
+    debut = 0
+    while debut < n_tirages:
+        lot = _taille_lot(n_tirages - debut, max(max(len(x1), len(x0)) for x1, x0, _ in cellules))
+        for x1, x0, poids in cellules:
+            m1 = x1[rng.integers(0, len(x1), size=(lot, len(x1)))].mean(axis=1)
+            m0 = x0[rng.integers(0, len(x0), size=(lot, len(x0)))].mean(axis=1)
+            resultats[debut:debut + lot] += poids * (m1 - m0)
+        debut += lot
+    return resultats
+
+
+def _permutation_worker(args):
+    """Écarts de moyennes sous permutation des étiquettes de groupe à l'intérieur de chaque strate."""
+    cellules, n_tirages, graine = args
+    rng = np.random.default_rng(graine)
+    resultats = np.zeros(n_tirages)
+    debut = 0
+    while debut < n_tirages:
+        lot = _taille_lot(n_tirages - debut, max(len(x1) + len(x0) for x1, x0, _ in cellules))
+        for x1, x0, poids in cellules:
+            valeurs = np.concatenate([x1, x0])
+            etiquettes = np.zeros(len(valeurs))
+            etiquettes[:len(x1)] = 1.0
+            permutees = rng.permuted(np.broadcast_to(etiquettes, (lot, len(valeurs))), axis=1)
+            somme1 = permutees @ valeurs
+            resultats[debut:debut + lot] += poids * (somme1 / len(x1) - (valeurs.sum() - somme1) / len(x0))
+        debut += lot
+    return resultats
+
+
+def _run(worker, cellules, n_tirages, n_jobs, seed):
+    """Répartit les tirages entre processus, chacun avec une graine indépendante."""
+    n_jobs = n_jobs or os.cpu_count() or 1
+    n_jobs = max(1, min(n_jobs, n_tirages))
+    graines = np.random.SeedSequence(seed).spawn(n_jobs)
+    parts = [n_tirages // n_jobs + (1 if i < n_tirages % n_jobs else 0) for i in range(n_jobs)]
+    taches = [(cellules, part, graine) for part, graine in zip(parts, graines)]
+    if n_jobs == 1:
+        return worker(taches[0])
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        return np.concatenate(list(executor.map(worker, taches)))
+
+
+def bootstrap_ci(cellules, n_resamples=2000, confiance=0.95, n_jobs=None, seed=None):
+    """
+    Intervalle de confiance bootstrap (percentile) de l'écart de moyennes groupe 1 - groupe 0.
+
+    Args:
+    - cellules : list : Résultat de cells.
+    - n_resamples : int : Nombre de rééchantillonnages.
+    - confiance : float : Niveau de confiance.
+    - n_jobs : int : Nombre de processus (tous les cœurs par défaut, 1 pour rester dans le processus courant).
+    - seed : int : Graine pour la reproductibilité.
+
+    Returns:
+    - dict : difference observée, borne_basse, borne_haute.
+    """
+    if not cellules:
+        raise ValueError("Aucune strate ne contient les deux groupes")
+    tirages = _run(_bootstrap_worker, cellules, n_resamples, n_jobs, seed)
+    alpha = (1 - confiance) / 2
+    basse, haute = np.quantile(tirages, [alpha, 1 - alpha])
+    return {'difference': _observed(cellules), 'borne_basse': float(basse), 'borne_haute': float(haute)}
+
+
+def permutation_test(cellules, n_permutations=2000, n_jobs=None, seed=None):
+    """
+    Test de permutation bilatéral de l'écart de moyennes, les permutations restant dans chaque strate.
+
+    Args:
+    - cellules : list : Résultat de cells.
+    - n_permutations : int : Nombre de permutations.
+    - n_jobs, seed : voir bootstrap_ci.
+
+    Returns:
+    - dict : difference observée et p_value.
+    """
+    if not cellules:
+        raise ValueError("Aucune strate ne contient les deux groupes")
+    tirages = _run(_permutation_worker, cellules, n_permutations, n_jobs, seed)
+    observe = _observed(cellules)
+    extremes = np.count_nonzero(np.abs(tirages) >= abs(observe) - 1e-12)
+    return {'difference': observe, 'p_value': (extremes + 1) / (n_permutations + 1)}
+
+
+""" Précision de percentile_approx (erreur relative de rang 1 / PRECISION_QUANTILES) """
+PRECISION_QUANTILES = 10000
+
+
+def box_stats(label, q1, mediane, q3, minimum, maximum):
+    """
+    Boîte à moustaches au format de matplotlib (Axes.bxp) à partir des quartiles et des extrêmes.
+
+    Les moustaches s'arrêtent à 1,5 écart interquartile des quartiles (bornées par le minimum et
+    le maximum) ; les valeurs extrêmes individuelles ne sont pas représentées.
+    """
+    ecart = q3 - q1
+    return {'label': label, 'q1': q1, 'med': mediane, 'q3': q3,
+            'whislo': max(minimum, q1 - 1.5 * ecart), 'whishi': min(maximum, q3 + 1.5 * ecart), 'fliers': []}
+
+
+def spark_box_stats(sdf, valeur=COLONNE_VALEUR, groupe=COLONNE_GROUPE):
+    """
+    Boîtes à moustaches par groupe calculées par Spark (quartiles approchés, minimum, maximum) :
+    une ligne par groupe est rapatriée au lieu des colonnes entières.
+
+    Returns:
+    - list : Une boîte par groupe (voir box_stats), dans l'ordre des groupes.
+    """
+    from pyspark.sql import functions as F
+
+    x = F.col(valeur).cast('double')
+    lignes = (sdf.where(x.isNotNull())
+              .groupBy(F.col(groupe).cast('int').alias('groupe'))
+              .agg(F.percentile_approx(x, [0.25, 0.5, 0.75], PRECISION_QUANTILES).alias('quartiles'),
+                   F.min(x).alias('minimum'), F.max(x).alias('maximum'))
+              .orderBy('groupe')
+              .collect())
+    return [box_stats(ligne['groupe'], *ligne['quartiles'], ligne['minimum'], ligne['maximum'])
+            for ligne in lignes]
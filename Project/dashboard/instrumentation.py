@@ -0,0 +1,240 @@
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+""" Étapes instrumentées ('visualisation' englobe les étapes d'un graphique complet) """
+CATEGORIES = ('load', 'transform', 'aggregate', 'render', 'serialize', 'visualisation')
+
+
+def _memoire_courante():
+    """Mémoire courante en octets : allocations suivies par tracemalloc si actif, sinon RSS du processus."""
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _nb_lignes(objet):
+    """Nombre de lignes d'un DataFrame / Series / tableau, None sinon."""
+    if isinstance(objet, (pd.DataFrame, pd.Series)):
+        return len(objet)
+    forme = getattr(objet, 'shape', None)
+    return forme[0] if forme else None
+
+
+class Span:
+    """Mesure d'une étape : durée, lignes traitées et variation mémoire."""
+
+    __slots__ = ('nom', 'categorie', 'debut', 'duree', 'rows', 'memoire_delta', 'profondeur', 'parent', 'thread')
+
+    def __init__(self, nom, categorie, profondeur, parent):
+        self.nom = nom
+        self.categorie = categorie
+        self.profondeur = profondeur
+        self.parent = parent
+        self.thread = threading.get_ident()
+        self.debut = None
+        self.duree = None
+        self.rows = None
+        self.memoire_delta = None
+
+    def as_dict(self):
+        return {'etape': self.nom, 'categorie': self.categorie, 'parent': self.parent,
+                'profondeur': self.profondeur, 'debut_s': self.debut, 'duree_ms': self.duree * 1000,
+                'rows': self.rows, 'rows_par_s': self.rows / self.duree if self.rows and self.duree else None,
+                'memoire_delta_mo': self.memoire_delta / 1e6 if self.memoire_delta is not None else None}
+
+
+""" Traceurs ayant demandé le suivi tracemalloc (partagé par tout le processus) """
+_TRACEURS_MEMOIRE = set()
+_VERROU_MEMOIRE = threading.Lock()
+
+
+class Tracer:
+    """Collecte les étapes instrumentées d'une exécution du tableau de bord."""
+
+    def __init__(self):
+        self.spans = []
+        self._origine = time.perf_counter()
+        self._local = threading.local()
+        self._verrou = threading.Lock()
+
+    def reset(self):
+        """Vide la trace (à appeler au début de chaque exécution du script Streamlit)."""
+        with self._verrou:
+            self.spans = []
+            self._origine = time.perf_counter()
+
+    def enable_memory_tracing(self, actif=True):
+        """
+        Active tracemalloc pour des variations mémoire précises (au prix d'un surcoût).
+
+        tracemalloc est global au processus : il reste actif tant qu'un traceur au moins le demande.
+        """
+        with _VERROU_MEMOIRE:
+            if actif:
+                _TRACEURS_MEMOIRE.add(id(self))
+            else:
+                _TRACEURS_MEMOIRE.discard(id(self))
+            if _TRACEURS_MEMOIRE and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            elif not _TRACEURS_MEMOIRE and tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def stage(self, nom, categorie='transform', rows=None):
+        """
+        Mesure le bloc encadré.
+
+        Exemple :
+            with stage('groupby Year', 'aggregate', rows=len(df)) as span:
+                resultat = df.groupby('Year').mean()
+        """
+        pile = getattr(self._local, 'pile', None)
+        if pile is None:
+            pile = self._local.pile = []
+        span = Span(nom, categorie, len(pile), pile[-1].nom if pile else None)
+        span.rows = rows
+        pile.append(span)
+        memoire_avant = _memoire_courante()
+        debut = time.perf_counter()
+        try:
+            yield span
+        finally:
+            fin = time.perf_counter()
+            memoire_apres = _memoire_courante()
+            pile.pop()
+            span.debut = debut - self._origine
+            span.duree = fin - debut
+            if memoire_avant is not None and memoire_apres is not None:
+                span.memoire_delta = memoire_apres - memoire_avant
+            with self._verrou:
+                self.spans.append(span)
+
+    def instrument(self, categorie='transform', nom=None, rows='input'):
+        """
+        Décorateur mesurant chaque appel de la fonction.
+
+        Args:
+        - categorie : str : Catégorie de l'étape (voir CATEGORIES).
+        - nom : str : Nom de l'étape (nom de la fonction par défaut).
+        - rows : str : 'input' compte les lignes du premier argument, 'output' celles du résultat, None rien.
+        """
+        return instrument(categorie, nom, rows, tracer=self)
+
+    def to_frame(self):
+        """Les étapes mesurées, dans l'ordre de leur début."""
+        with self._verrou:
+            lignes = [s.as_dict() for s in self.spans]
+        if not lignes:
+            return pd.DataFrame(columns=['etape', 'categorie', 'parent', 'profondeur', 'debut_s', 'duree_ms',
+                                         'rows', 'rows_par_s', 'memoire_delta_mo'])
+        return pd.DataFrame(lignes).sort_values('debut_s').reset_index(drop=True)
+
+    def summary(self):
+        """Temps total par catégorie, étapes de premier niveau uniquement pour ne pas compter deux fois."""
+        df = self.to_frame()
+        df = df[df['profondeur'] == 0]
+        return df.groupby('categorie')['duree_ms'].agg(['sum', 'count']).sort_values('sum', ascending=False)
+
+    def to_chrome_trace(self):
+        """Trace au format Chrome Trace Event, lisible dans chrome://tracing ou Perfetto."""
+        with self._verrou:
+            spans = list(self.spans)
+        evenements = [{
+            'name': s.nom, 'cat': s.categorie, 'ph': 'X', 'pid': os.getpid(), 'tid': s.thread,
+            'ts': s.debut * 1e6, 'dur': s.duree * 1e6,
+            'args': {'rows': s.rows, 'memoire_delta_octets': s.memoire_delta},
+        } for s in spans]
+        return {'traceEvents': evenements, 'displayTimeUnit': 'ms'}
+
+    def export(self, chemin):
+        """Écrit la trace au format Chrome Trace Event (JSON)."""
+        with open(chemin, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome_trace(), f, ensure_ascii=False)
+        return chemin
+
+
+""" Traceur de la session Streamlit en cours (chaque exécution du script a son propre fil) """
+_TRACEUR_COURANT = contextvars.ContextVar('traceur', default=None)
+
+""" Traceur utilisé hors session (scripts, benchmarks) """
+_TRACEUR_HORS_SESSION = Tracer()
+
+
+def session_tracer(st):
+    """
+    Traceur de la session Streamlit, créé au premier passage et conservé dans st.session_state.
+
+    À appeler au début du script : les étapes mesurées ensuite (stage, instrument) lui sont rattachées,
+    sans se mêler à celles des autres sessions servies par le même processus.
+    """
+    tracer = st.session_state.get('tracer')
+    if tracer is None:
+        tracer = st.session_state['tracer'] = Tracer()
+    _TRACEUR_COURANT.set(tracer)
+    return tracer
+
+
+def current_tracer():
+    """Traceur de la session en cours, ou traceur hors session."""
+    return _TRACEUR_COURANT.get() or _TRACEUR_HORS_SESSION
+
+
+def stage(nom, categorie='transform', rows=None, tracer=None):
+    """Mesure le bloc encadré avec le traceur donné, celui de la session en cours par défaut (voir Tracer.stage)."""
+    return (tracer or current_tracer()).stage(nom, categorie, rows)
+
+
+def instrument(categorie='transform', nom=None, rows='input', tracer=None):
+    """
+    Décorateur mesurant chaque appel de la fonction (voir Tracer.instrument).
+
+    Sans traceur explicite, le traceur est résolu à chaque appel : une fonction décorée à l'import
+    est mesurée dans la session qui l'appelle.
+    """
+    def decorateur(fonction):
+        @functools.wraps(fonction)
+        def enveloppe(*args, **kwargs):
+            with stage(nom or fonction.__name__, categorie, tracer=tracer) as span:
+                if rows == 'input' and args:
+                    span.rows = _nb_lignes(args[0])
+                resultat = fonction(*args, **kwargs)
+                if rows == 'output':
+                    span.rows = _nb_lignes(resultat)
+                return resultat
+        return enveloppe
+    return decorateur
+
+
+def render_debug_panel(st, tracer=None):
+    """
+    Panneau de la barre latérale : étapes mesurées, étape la plus lente et export de la trace.
+
+    Args:
+    - st : module streamlit.
+    - tracer : Tracer : Traceur à afficher (celui de la session en cours par défaut).
+    """
+    tracer = tracer or current_tracer()
+    df = tracer.to_frame()
+    st.sidebar.subheader("Instrumentation")
+    if len(df) == 0:
+        st.sidebar.write("Aucune étape mesurée.")
+        return
+    feuilles = df[~df['etape'].isin(df['parent'].dropna())]
+    plus_lente = feuilles.loc[feuilles['duree_ms'].idxmax()]
+    st.sidebar.write(f"Étape la plus lente : **{plus_lente['etape']}** ({plus_lente['categorie']}, "
+                     f"{plus_lente['duree_ms']:.0f} ms)")
+    st.sidebar.dataframe(df[['etape', 'categorie', 'duree_ms', 'rows', 'memoire_delta_mo']].round(2))
+    st.sidebar.download_button("Exporter la trace (JSON)", json.dumps(tracer.to_chrome_trace()),
+                               file_name="trace_dashboard.json", mime="application/json")
@@ -0,0 +1,553 @@
+"""
+Service HTTP en lecture seule des agrégats de consommation, partagé par les tableaux de bord.
+
+Les données nettoyées sont chargées une fois par processus (et rechargées seulement si leur fichier
+change) au lieu d'une fois par session Streamlit. Les agrégats sont lus dans les stockages du
+tableau de bord (multi-résolution, colonnes en mémoire partagée, table des anomalies), complétés à
+chaque rechargement. Chaque réponse encodée est gardée dans un cache en mémoire, indexé par la
+requête et la version du fichier source. Les requêtes sont traitées en parallèle (un thread par
+connexion).
+
+Points d'accès (GET) :
+    /yearly?colonne=totale               moyenne par année
+    /monthly?colonne=gaz&annee=2022      moyenne par mois (de l'année, ou par mois de l'année sur toutes les années)
+    /weekly?colonne=gaz                  moyenne par semaine
+    /weekly-ratio                        ratio horaire gaz / électricité, moyenne par semaine
+    /hour-weekday?colonne=electricite    matrice heure x jour de la semaine des moyennes
+    /smoothed?colonne=totale&fenetre=7   série journalière lissée (moyenne glissante)
+    /hourly?colonne=totale               série horaire régulière
+    /box?colonne=totale&par=mois         quartiles, minimum et maximum par mois ou par mouvement social
+    /scatter?n=5000                      échantillon régulier des couples gaz / électricité
+    /cross-correlation?max_lag=48        corrélation croisée décalée gaz / électricité (max_lag <= DECALAGE_MAX)
+    /anomalies                           heures anormales de la consommation totale
+    /impact?strate=mois                  statistiques suffisantes du test des mouvements sociaux
+    /resampling?strate=mois&n=2000       bootstrap et test de permutation des mouvements sociaux (n <= TIRAGES_MAX)
+    /regional?annee=2021                 totaux régionaux par année
+    /forecast?dataset=eco2mix            prévision exportée par pipeline.py
+    /health                              sources chargées et statistiques du cache
+
+Les réponses sont en JSON (liste d'enregistrements), ou en flux Arrow IPC avec ?format=arrow ou
+l'en-tête Accept: application/vnd.apache.arrow.stream (pyarrow requis).
+
+Exemples :
+    python query_api.py --port 8050
+    curl 'http://localhost:8050/yearly?colonne=gaz'
+"""
+import argparse
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from anomalies import AnomalyStore, hourly_series
+from column_store import COLONNES, COLONNE_DATE, ColumnStore
+from impact_stats import bootstrap_ci, cells, permutation_test, sufficient_stats
+from schemas import SCHEMAS, SchemaError
+from timeseries_store import TimeSeriesStore
+
+REPERTOIRE = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS = os.path.join(REPERTOIRE, '..', 'script', 'script_données_consommation_energies')
+
+""" Sources par défaut (celles des tableaux de bord et du pipeline) """
+CHEMIN_CONSOMMATION = './Consomation&Mouvement.csv'
+CHEMIN_REGIONAL = os.path.join(SCRIPTS, 'donnée concatenées.csv')
+REPERTOIRE_PREVISIONS = os.path.join(SCRIPTS, 'exports')
+
+""" Stockages dérivés de la consommation, sous le répertoire des stockages (mêmes noms que le tableau de bord pandas) """
+STOCKAGES = {'series': 'timeseries_store', 'colonnes': 'column_store', 'anomalies': 'anomalies.csv'}
+
+""" Nombre de réponses encodées gardées en mémoire """
+TAILLE_CACHE = 256
+
+""" Bornes des paramètres coûteux : décalage de la corrélation croisée (heures) et tirages de rééchantillonnage """
+DECALAGE_MAX = 168
+TIRAGES_MAX = 10000
+
+TYPE_JSON = 'application/json; charset=utf-8'
+TYPE_ARROW = 'application/vnd.apache.arrow.stream'
+
+
+class FormatUnavailable(Exception):
+    """Format de réponse demandé mais indisponible (pyarrow absent)."""
+
+
+def _fingerprint(chemin):
+    """Version d'un fichier (taille, date de modification) ; FileNotFoundError s'il est absent."""
+    info = os.stat(chemin)
+    return info.st_size, info.st_mtime_ns
+
+
+def load_consumption(chemin):
+    """
+    Consommation horaire validée par le schéma 'consommation_brute' (date, colonnes de COLONNES et
+    indicateur de mouvement social, préparés comme dans le tableau de bord pandas).
+    """
+    schema = SCHEMAS['consommation_brute']
+    schema.check_header(chemin)
+    df = pd.read_csv(chemin, skip_blank_lines=True).dropna(how='all')
+    df, _ = schema.validate(df)
+    if COLONNES['gaz'] in df.columns:
+        df[COLONNES['gaz']] = df[COLONNES['gaz']].fillna(df[COLONNES['gaz']].mean())
+    if 'mouvement_social' in df.columns:
+        df['mouvement_social_num'] = df['mouvement_social'].fillna(False).astype(int)
+    else:
+        df['mouvement_social_num'] = 0
+    colonnes = [COLONNE_DATE] + [c for c in COLONNES.values() if c in df.columns] + ['mouvement_social_num']
+    return df[colonnes].dropna(subset=[COLONNE_DATE, COLONNES['totale']]).reset_index(drop=True)
+
+
+class ConsumptionData:
+    """
+    Consommation chargée par le service et stockages qui en sont dérivés, partagés avec le tableau de
+    bord pandas : agrégats multi-résolution (TimeSeriesStore), colonnes horaires en mémoire partagée
+    (ColumnStore) et table des anomalies (AnomalyStore). À chaque rechargement, seules les heures
+    nouvelles sont agrégées et scorées ; les colonnes sont reconstruites si le fichier a changé.
+    """
+
+    def __init__(self, chemin, stockages='.'):
+        self.df = load_consumption(chemin)
+        self.store = TimeSeriesStore(os.path.join(stockages, STOCKAGES['series']))
+        self.store.append(self.df)
+        self.colonnes = ColumnStore.open_or_build(os.path.join(stockages, STOCKAGES['colonnes']), self.df,
+                                                  source=chemin)
+        self.anomalies = AnomalyStore(os.path.join(stockages, STOCKAGES['anomalies']))
+        self.anomalies.update(hourly_series(self.df))
+
+    def __len__(self):
+        return len(self.df)
+
+
+def load_regional(chemin):
+    """Consommation annuelle par région et filière (même lecture que geolocalisation.py)."""
+    df = pd.read_csv(chemin, usecols=['annee', 'region', 'filiere', 'valeur'], encoding='Latin1', sep=';')
+    df, _ = SCHEMAS['consommation_regionale'].validate(df)
+    df['region'] = df['region'].fillna('Inconnu')
+    return df
+
+
+def load_forecast(chemin):
+    """Prévision exportée par pipeline.py (colonnes date, prevision)."""
+    return pd.read_csv(chemin, parse_dates=['date'])
+
+
+def _column(colonne):
+    if colonne not in COLONNES:
+        raise ValueError(f"Colonne inconnue : {colonne} (disponibles : {', '.join(COLONNES)})")
+    return COLONNES[colonne]
+
+
+def _positive_int(valeur, nom):
+    try:
+        entier = int(valeur)
+    except ValueError:
+        entier = 0
+    if entier <= 0:
+        raise ValueError(f"Paramètre '{nom}' invalide : {valeur} (entier positif attendu)")
+    return entier
+
+
+def _strate(df, strate):
+    if strate == 'operateur' and 'operateur' not in df.columns:
+        raise ValueError("Stratification 'operateur' indisponible : les données n'ont pas d'opérateur")
+    return strate
+
+
+def _year(annee):
+    try:
+        return None if annee is None else int(annee)
+    except ValueError:
+        raise ValueError(f"Année invalide : {annee}") from None
+
+
+def _stored(colonnes, *noms):
+    """Colonnes horaires du stockage en colonnes (noms courts)."""
+    for nom in noms:
+        _column(nom)
+        if nom not in colonnes.colonnes:
+            raise ValueError(f"Colonne absente du stockage en colonnes : {nom}")
+    return [colonnes[nom] for nom in noms]
+
+
+def yearly_means(donnees, colonne='totale'):
+    """Moyenne de la colonne par année, lue au niveau mensuel du stockage multi-résolution."""
+    annuel = donnees.store.query([_column(colonne)], resolution='year')
+    return pd.DataFrame({'annee': annuel.index.year, 'moyenne': annuel.iloc[:, 0].to_numpy()})
+
+
+def monthly_means(donnees, colonne='totale', annee=None):
+    """Moyenne par mois de l'année `annee`, ou par mois de l'année toutes années confondues."""
+    nom = _column(colonne)
+    annee = _year(annee)
+    if annee is not None:
+        mensuel = donnees.store.query([nom], debut=f"{annee}-01-01", fin=f"{annee + 1}-01-01", resolution='month')
+        return pd.DataFrame({'mois': mensuel.index.month, 'moyenne': mensuel.iloc[:, 0].to_numpy()})
+    # Sommes et effectifs mensuels combinés sur toutes les années
+    mensuel = donnees.store.query([nom], resolution='month', stat='all')[nom]
+    mensuel = mensuel.groupby(mensuel.index.month)[['sum', 'count']].sum()
+    return pd.DataFrame({'mois': mensuel.index, 'moyenne': (mensuel['sum'] / mensuel['count']).to_numpy()})
+
+
+def weekly_means(donnees, colonne='totale'):
+    """Moyenne de la colonne par semaine (étiquetée par son lundi), lue dans le stockage multi-résolution."""
+    hebdomadaire = donnees.store.query([_column(colonne)], resolution='week')
+    return pd.DataFrame({'date': hebdomadaire.index, 'moyenne': hebdomadaire.iloc[:, 0].to_numpy()})
+
+
+def weekly_ratio(donnees):
+    """Ratio heure par heure gaz / électricité (NaN si l'électricité est nulle), moyenne par semaine."""
+    colonnes = donnees.colonnes
+    _stored(colonnes, 'gaz', 'electricite')
+    ratio = colonnes.weekly(colonnes.ratio('gaz', 'electricite'))
+    return pd.DataFrame({'date': ratio.index, 'ratio': ratio.to_numpy()})
+
+
+def hour_weekday(donnees, colonne='totale'):
+    """Matrice des moyennes : une ligne par heure, une colonne par jour de la semaine (0 = lundi)."""
+    nom = _column(colonne)
+    horaire = donnees.store.query([nom], resolution='hour', stat='all')[nom]
+    sommes = horaire[['sum', 'count']].groupby([horaire.index.hour.rename('heure'), horaire.index.dayofweek]).sum()
+    matrice = (sommes['sum'] / sommes['count']).unstack()
+    matrice.columns = [str(jour) for jour in matrice.columns]
+    return matrice.reset_index()
+
+
+def smoothed(donnees, colonne='totale', fenetre='7'):
+    """
+    Moyenne glissante sur `fenetre` jours de la première mesure de chaque jour (même série que le
+    graphique lissé du tableau de bord pandas).
+    """
+    df = donnees.df
+    fenetre = _positive_int(fenetre, 'fenetre')
+    jours = df[COLONNE_DATE].dt.normalize()
+    premieres = ~jours.duplicated()
+    serie = pd.Series(df.loc[premieres, _column(colonne)].to_numpy(), index=jours[premieres].to_numpy()).sort_index()
+    return serie.rolling(window=fenetre).mean().rename('lissee').rename_axis('date').reset_index()
+
+
+def hourly(donnees, colonne='totale'):
+    """Série horaire régulière de la colonne (heures manquantes à NaN), lue dans le stockage en colonnes."""
+    valeurs, = _stored(donnees.colonnes, colonne)
+    return pd.DataFrame({'date': donnees.colonnes.index(), 'valeur': valeurs})
+
+
+def quartiles(donnees, colonne='totale', par='mois'):
+    """Quartiles, minimum et maximum de la colonne par mois ou par statut de mouvement social (0 ou 1)."""
+    df = donnees.df
+    if par == 'mois':
+        cles = df[COLONNE_DATE].dt.month
+    elif par == 'mouvement_social':
+        cles = df['mouvement_social_num']
+    else:
+        raise ValueError(f"Regroupement inconnu : {par} (mois ou mouvement_social)")
+    groupes = df[_column(colonne)].groupby(cles.rename('cle').to_numpy())
+    resultat = groupes.quantile([0.25, 0.5, 0.75]).unstack()
+    resultat.columns = ['q1', 'mediane', 'q3']
+    resultat['minimum'] = groupes.min()
+    resultat['maximum'] = groupes.max()
+    return resultat.rename_axis('cle').reset_index()
+
+
+def scatter_sample(donnees, n='5000'):
+    """Au plus `n` couples (gaz, électricité) horaires pris à pas régulier dans le stockage en colonnes."""
+    gaz, electricite = _stored(donnees.colonnes, 'gaz', 'electricite')
+    pas = max(1, len(gaz) // _positive_int(n, 'n'))
+    return pd.DataFrame({'gaz': gaz[::pas], 'electricite': electricite[::pas]})
+
+
+def cross_correlation(donnees, max_lag='48'):
+    """
+    Corrélation de Pearson entre gaz(t) et électricité(t + k) pour k de -max_lag à max_lag heures
+    (max_lag borné par DECALAGE_MAX), calculée sur le stockage en colonnes.
+    """
+    max_lag = min(_positive_int(max_lag, 'max_lag'), DECALAGE_MAX)
+    _stored(donnees.colonnes, 'gaz', 'electricite')
+    correlation = donnees.colonnes.cross_correlation('gaz', 'electricite', max_lag=max_lag)
+    return correlation.rename('correlation').reset_index()
+
+
+def anomalies_table(donnees):
+    """Heures anormales de la consommation totale, lues dans la table des anomalies (voir anomalies.AnomalyStore)."""
+    return donnees.anomalies.load()
+
+
+def impact(donnees, strate=None):
+    """Statistiques suffisantes par strate et par groupe (1 = mouvement social), à passer à welch_test."""
+    return sufficient_stats(donnees.df, strate=_strate(donnees.df, strate)).reset_index()
+
+
+def resampling(donnees, strate=None, n='2000'):
+    """
+    Intervalle de confiance bootstrap à 95 % et test de permutation de l'écart dû aux mouvements
+    sociaux : au plus TIRAGES_MAX tirages, dans le thread de la requête (pas de pool de processus
+    par requête).
+    """
+    n = min(_positive_int(n, 'n'), TIRAGES_MAX)
+    cellules = cells(donnees.df, strate=_strate(donnees.df, strate))
+    bootstrap = bootstrap_ci(cellules, n_resamples=n, n_jobs=1)
+    return pd.DataFrame([{**bootstrap, 'p_value': permutation_test(cellules, n_permutations=n, n_jobs=1)['p_value']}])
+
+
+def regional_totals(df, annee=None):
+    """Total de la consommation par année et par région (d'une seule année si `annee` est donnée)."""
+    annee = _year(annee)
+    if annee is not None:
+        df = df[df['annee'] == annee]
+    return df.groupby(['annee', 'region'])['valeur'].sum().rename('total').reset_index()
+
+
+def forecast_table(df):
+    """Prévision telle qu'exportée par le pipeline."""
+    return df
+
+
+""" Points d'accès : chemin -> (source, fonction, paramètres acceptés) """
+ENDPOINTS = {
+    '/yearly': ('consommation', yearly_means, ('colonne',)),
+    '/monthly': ('consommation', monthly_means, ('colonne', 'annee')),
+    '/weekly': ('consommation', weekly_means, ('colonne',)),
+    '/weekly-ratio': ('consommation', weekly_ratio, ()),
+    '/hour-weekday': ('consommation', hour_weekday, ('colonne',)),
+    '/smoothed': ('consommation', smoothed, ('colonne', 'fenetre')),
+    '/hourly': ('consommation', hourly, ('colonne',)),
+    '/box': ('consommation', quartiles, ('colonne', 'par')),
+    '/scatter': ('consommation', scatter_sample, ('n',)),
+    '/cross-correlation': ('consommation', cross_correlation, ('max_lag',)),
+    '/anomalies': ('consommation', anomalies_table, ()),
+    '/impact': ('consommation', impact, ('strate',)),
+    '/resampling': ('consommation', resampling, ('strate', 'n')),
+    '/regional': ('regional', regional_totals, ('annee',)),
+    '/forecast': ('prevision', forecast_table, ('dataset',)),
+}
+
+
+class ResultCache:
+    """Cache LRU des réponses encodées, partagé par les threads du serveur."""
+
+    def __init__(self, taille=TAILLE_CACHE):
+        self.taille = taille
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, cle):
+        with self._verrou:
+            if cle in self._entrees:
+                self._entrees.move_to_end(cle)
+                self.hits += 1
+                return self._entrees[cle]
+            self.misses += 1
+            return None
+
+    def put(self, cle, valeur):
+        with self._verrou:
+            self._entrees[cle] = valeur
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille:
+                self._entrees.popitem(last=False)
+
+    def stats(self):
+        with self._verrou:
+            return {'entrees': len(self._entrees), 'taille': self.taille, 'hits': self.hits, 'misses': self.misses}
+
+
+class Datasets:
+    """
+    Sources chargées une fois par processus ; une source est rechargée si son fichier change
+    (taille ou date de modification), un seul thread à la fois. La consommation est chargée avec
+    ses stockages (voir ConsumptionData), placés dans le répertoire `stockages`.
+    """
+
+    def __init__(self, consommation=CHEMIN_CONSOMMATION, regional=CHEMIN_REGIONAL, previsions=REPERTOIRE_PREVISIONS,
+                 stockages='.'):
+        self.chemins = {'consommation': consommation, 'regional': regional}
+        self.previsions = previsions
+        self.stockages = stockages
+        self._donnees = {}
+        self._verrou = threading.Lock()
+
+    def path(self, source, dataset=None):
+        if source != 'prevision':
+            return self.chemins[source]
+        if dataset is None or not re.fullmatch(r'\w+', dataset):
+            raise ValueError("Paramètre 'dataset' requis (nom d'un jeu du pipeline, ex. eco2mix)")
+        return os.path.join(self.previsions, f"{dataset}_prevision.csv")
+
+    def get(self, source, dataset=None):
+        """
+        Returns:
+        - tuple : (version du fichier, données chargées : ConsumptionData ou DataFrame).
+        """
+        chemin = self.path(source, dataset)
+        version = _fingerprint(chemin)
+        cle = (source, dataset)
+        courant = self._donnees.get(cle)
+        if courant is None or courant[0] != version:
+            with self._verrou:
+                courant = self._donnees.get(cle)
+                if courant is None or courant[0] != version:
+                    chargeur = {'consommation': lambda c: ConsumptionData(c, self.stockages),
+                                'regional': load_regional, 'prevision': load_forecast}[source]
+                    courant = (version, chargeur(chemin))
+                    self._donnees[cle] = courant
+        return courant
+
+    def status(self):
+        return {f"{source}:{dataset}" if dataset else source: {'version': list(version), 'lignes': len(donnees)}
+                for (source, dataset), (version, donnees) in list(self._donnees.items())}
+
+
+def encode(frame, format):
+    """Encode un résultat en JSON (enregistrements, dates ISO) ou en flux Arrow IPC."""
+    if format == 'json':
+        return frame.to_json(orient='records', date_format='iso', force_ascii=False).encode('utf-8'), TYPE_JSON
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise FormatUnavailable("Format Arrow indisponible (pyarrow n'est pas installé)") from None
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sortie = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sortie, table.schema) as flux:
+        flux.write_table(table)
+    return sortie.getvalue().to_pybytes(), TYPE_ARROW
+
+
+class QueryService:
+    """Exécution des requêtes : données partagées (Datasets) et réponses encodées en cache (ResultCache)."""
+
+    def __init__(self, datasets=None, taille_cache=TAILLE_CACHE):
+        self.datasets = datasets or Datasets()
+        self.cache = ResultCache(taille_cache)
+
+    def query(self, chemin, params):
+        """Résultat d'un point d'accès sous forme de DataFrame (ValueError si la requête est invalide)."""
+        if chemin not in ENDPOINTS:
+            raise KeyError(chemin)
+        source, fonction, acceptes = ENDPOINTS[chemin]
+        inconnus = set(params) - set(acceptes)
+        if inconnus:
+            raise ValueError(f"Paramètres inconnus : {', '.join(sorted(inconnus))} (acceptés : {', '.join(acceptes)})")
+        _, donnees = self.datasets.get(source, params.get('dataset'))
+        return fonction(donnees, **{k: v for k, v in params.items() if k != 'dataset'})
+
+    def respond(self, chemin, params, format='json'):
+        """
+        Réponse encodée d'un point d'accès, lue dans le cache si la source n'a pas changé.
+
+        Returns:
+        - tuple : (corps, type de contenu, 'hit' ou 'miss').
+        """
+        if chemin not in ENDPOINTS:
+            raise KeyError(chemin)
+        source = ENDPOINTS[chemin][0]
+        version = _fingerprint(self.datasets.path(source, params.get('dataset')))
+        cle = (chemin, tuple(sorted(params.items())), format, version)
+        reponse = self.cache.get(cle)
+        if reponse is not None:
+            return reponse + ('hit',)
+        reponse = encode(self.query(chemin, params), format)
+        self.cache.put(cle, reponse)
+        return reponse + ('miss',)
+
+    def health(self):
+        return {'sources': self.datasets.status(), 'cache': self.cache.stats(), 'endpoints': list(ENDPOINTS)}
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """Requêtes GET du serveur ; le service est porté par le serveur (server.service)."""
+
+    def _send(self, statut, corps, type_contenu=TYPE_JSON, cache=None):
+        self.send_response(statut)
+        self.send_header('Content-Type', type_contenu)
+        self.send_header('Content-Length', str(len(corps)))
+        if cache is not None:
+            self.send_header('X-Cache', cache)
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def _error(self, statut, message):
+        self._send(statut, json.dumps({'erreur': message}, ensure_ascii=False).encode('utf-8'))
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {cle: valeurs[-1] for cle, valeurs in parse_qs(url.query).items()}
+        format = params.pop('format', None) or ('arrow' if TYPE_ARROW in self.headers.get('Accept', '') else 'json')
+        service = self.server.service
+        if url.path == '/health':
+            return self._send(200, json.dumps(service.health(), ensure_ascii=False).encode('utf-8'))
+        if url.path not in ENDPOINTS:
+            return self._error(404, f"Point d'accès inconnu : {url.path} (disponibles : {', '.join(ENDPOINTS)})")
+        if format not in ('json', 'arrow'):
+            return self._error(406, f"Format inconnu : {format} (json ou arrow)")
+        try:
+            corps, type_contenu, cache = service.respond(url.path, params, format)
+        except FormatUnavailable as e:
+            return self._error(406, str(e))
+        except FileNotFoundError as e:
+            return self._error(503, f"Source indisponible : {e.filename}")
+        except SchemaError as e:
+            return self._error(503, str(e))
+        except ValueError as e:
+            return self._error(400, str(e))
+        except Exception as e:
+            return self._error(500, f"{type(e).__name__} : {e}")
+        self._send(200, corps, type_contenu, cache)
+
+    def log_message(self, format, *args):
+        # Journal d'accès désactivé : une ligne par requête coûte plus que la réponse servie depuis le cache
+        pass
+
+
+def serve(host='127.0.0.1', port=8050, service=None):
+    """Démarre le serveur (un thread par connexion) et le retourne sans bloquer l'appelant."""
+    serveur = ThreadingHTTPServer((host, port), QueryHandler)
+    serveur.daemon_threads = True
+    serveur.service = service or QueryService()
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    return serveur
+
+
+def fetch(base_url, chemin, **params):
+    """
+    Client des tableaux de bord : résultat d'un point d'accès sous forme de DataFrame.
+
+    Args:
+    - base_url : str : Adresse du service (ex. http://localhost:8050).
+    - chemin : str : Point d'accès (ex. '/yearly').
+    - params : Paramètres de la requête (les valeurs None sont omises).
+    """
+    import requests
+    params = {k: v for k, v in params.items() if v is not None}
+    reponse = requests.get(f"{base_url.rstrip('/')}{chemin}?{urlencode(params)}", timeout=30)
+    if reponse.status_code != 200:
+        raise ValueError(f"Requête {chemin} refusée ({reponse.status_code}) : {reponse.json().get('erreur')}")
+    return pd.DataFrame(reponse.json())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service HTTP en lecture seule des agrégats de consommation")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--consommation', default=CHEMIN_CONSOMMATION, help="CSV de consommation (tableaux de bord)")
+    parser.add_argument('--regional', default=CHEMIN_REGIONAL, help="CSV de consommation régionale")
+    parser.add_argument('--previsions', default=REPERTOIRE_PREVISIONS, help="Répertoire des prévisions du pipeline")
+    parser.add_argument('--stockages', default='.', help="Répertoire des stockages dérivés de la consommation")
+    parser.add_argument('--cache', type=int, default=TAILLE_CACHE, help="Nombre de réponses gardées en cache")
+    args = parser.parse_args()
+
+    service = QueryService(Datasets(args.consommation, args.regional, args.previsions, args.stockages), args.cache)
+    serveur = serve(args.host, args.port, service)
+    print(f"Service à l'écoute sur http://{args.host}:{args.port} ({', '.join(ENDPOINTS)}, /health)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        serveur.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import pandas as pd
+
+""" Statuts publiés par les opérateurs (GRTgaz, Teréga, RTE) """
+STATUTS = ('Définitif', 'Consolidé', 'Provisoire')
+
+""" Valeurs textuelles acceptées pour les colonnes booléennes """
+BOOLEENS = {'true': True, 'false': False, '1': True, '0': False, '1.0': True, '0.0': False,
+            'yes': True, 'no': False, 'vrai': True, 'faux': False}
+
+""" Part maximale de lignes en infraction à une règle avant rejet du fichier """
+SEUIL_REJET = 0.05
+
+COLONNES_RAPPORT = ['colonne', 'regle', 'lignes', 'part', 'exemple', 'premiere_ligne']
+
+
+class SchemaError(ValueError):
+    """Fichier rejeté : colonnes requises absentes ou trop de valeurs invalides."""
+
+
+class Column:
+    """
+    Contrat d'une colonne : type, unité, présence obligatoire, valeurs manquantes tolérées,
+    bornes et valeurs autorisées.
+
+    Types : 'datetime' (UTC), 'float', 'int', 'bool', 'category', 'str'.
+    """
+
+    __slots__ = ('nom', 'dtype', 'unite', 'requis', 'nullable', 'min', 'max', 'valeurs')
+
+    def __init__(self, nom, dtype, unite=None, requis=True, nullable=True, min=None, max=None, valeurs=None):
+        self.nom = nom
+        self.dtype = dtype
+        self.unite = unite
+        self.requis = requis
+        self.nullable = nullable
+        self.min = min
+        self.max = max
+        self.valeurs = None if valeurs is None else list(valeurs)
+
+
+def _parse(serie, dtype):
+    """Conversion vectorisée d'une colonne brute vers son type ; les échecs deviennent NaN / NaT."""
+    if dtype == 'datetime':
+        if isinstance(serie.dtype, pd.DatetimeTZDtype):
+            return serie.dt.tz_convert('UTC')
+        return pd.to_datetime(serie, errors='coerce', utc=True)
+    if dtype == 'float':
+        if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+            return serie.astype('float64')
+        return pd.to_numeric(serie, errors='coerce').astype('float64')
+    if dtype == 'int':
+        return pd.to_numeric(serie, errors='coerce').round().astype('Int64')
+    if dtype == 'bool':
+        if pd.api.types.is_bool_dtype(serie):
+            return serie.astype('boolean')
+        return serie.astype(str).str.strip().str.lower().map(BOOLEENS).astype('boolean')
+    if dtype == 'category':
+        return serie.astype('category')
+    return serie
+
+
+class Schema:
+    """
+    Schéma d'une source de données, compilé une fois en règles vectorisées (une opération par
+    colonne et par règle, sur la colonne entière).
+
+    La validation a lieu à l'ingestion : l'en-tête seul suffit à rejeter un fichier auquel il manque
+    des colonnes, puis les colonnes sont typées et les infractions comptées dans un rapport compact.
+    Un DataFrame marqué par le chargeur (df.attrs['schema']) garantit ses colonnes aux graphiques,
+    dont les vérifications deviennent sans effet (voir has_columns).
+    """
+
+    def __init__(self, nom, colonnes, renommage=None, derivees=(), seuil_rejet=SEUIL_REJET):
+        self.nom = nom
+        self.colonnes = {colonne.nom: colonne for colonne in colonnes}
+        self.renommage = dict(renommage or {})
+        self.derivees = tuple(derivees)
+        self.seuil_rejet = seuil_rejet
+        self.requises = [colonne.nom for colonne in colonnes if colonne.requis]
+        self.garanties = frozenset(self.requises) | frozenset(self.derivees)
+        self.regles = self._compile()
+
+    def _compile(self):
+        """Liste des règles (colonne, nom, test(brut, typé) -> masque des lignes en infraction)."""
+        regles = []
+        for colonne in self.colonnes.values():
+            nom = colonne.nom
+            if not colonne.nullable:
+                regles.append((nom, 'manquant', lambda brut, valeur: brut.isna()))
+            if colonne.dtype not in ('str', 'category'):
+                regles.append((nom, 'type', lambda brut, valeur: valeur.isna() & brut.notna()))
+            if colonne.min is not None:
+                regles.append((nom, 'min', lambda brut, valeur, borne=colonne.min: (valeur < borne).fillna(False)))
+            if colonne.max is not None:
+                regles.append((nom, 'max', lambda brut, valeur, borne=colonne.max: (valeur > borne).fillna(False)))
+            if colonne.valeurs is not None:
+                regles.append((nom, 'valeur', lambda brut, valeur, autorisees=colonne.valeurs:
+                               valeur.notna() & ~valeur.isin(autorisees)))
+        return regles
+
+    def check_columns(self, colonnes):
+        """Lève SchemaError si une colonne requise manque (noms après renommage)."""
+        presentes = {self.renommage.get(c, c) for c in colonnes}
+        manquantes = [c for c in self.requises if c not in presentes]
+        if manquantes:
+            raise SchemaError(f"Fichier rejeté ({self.nom}) : colonnes manquantes {manquantes}")
+
+    def check_header(self, chemin, **options):
+        """Vérifie les colonnes d'un CSV en ne lisant que son en-tête."""
+        self.check_columns(pd.read_csv(chemin, nrows=0, **options).columns)
+
+    def validate(self, df):
+        """
+        Renomme, type et contrôle les colonnes du schéma présentes dans df.
+
+        Args:
+        - df : DataFrame : Données brutes.
+
+        Returns:
+        - DataFrame : Données typées (les valeurs non convertibles sont à NaN / NaT).
+        - DataFrame : Rapport des infractions (colonne, règle, lignes, part, exemple, première ligne).
+        """
+        df = df.rename(columns=self.renommage)
+        self.check_columns(df.columns)
+        presentes = [nom for nom in self.colonnes if nom in df.columns]
+        types = {nom: _parse(df[nom], self.colonnes[nom].dtype) for nom in presentes}
+
+        infractions = []
+        for nom, regle, test in self.regles:
+            if nom not in types:
+                continue
+            masque = test(df[nom], types[nom]).to_numpy(dtype=bool)
+            nombre = int(masque.sum())
+            if nombre:
+                premiere = int(masque.argmax())
+                infractions.append({'colonne': nom, 'regle': regle, 'lignes': nombre, 'part': nombre / len(df),
+                                    'exemple': str(df[nom].iloc[premiere]), 'premiere_ligne': premiere})
+        rapport = pd.DataFrame(infractions, columns=COLONNES_RAPPORT)
+        if (rapport['part'] > self.seuil_rejet).any():
+            raise SchemaError(f"Fichier rejeté ({self.nom}) :\n{format_report(rapport)}")
+        return df.assign(**types), rapport
+
+    def spark_report(self, df):
+        """
+        Mêmes règles compilées en expressions Spark, évaluées en une seule agrégation.
+
+        Returns:
+        - DataFrame : Rapport des infractions (sans exemple ni première ligne).
+        """
+        from pyspark.sql import functions as F
+        self.check_columns(df.columns)
+        types_spark = {'datetime': 'timestamp', 'float': 'double', 'int': 'long', 'bool': 'boolean'}
+        conditions = {}
+        for colonne in self.colonnes.values():
+            if colonne.nom not in df.columns:
+                continue
+            brut = F.col(f"`{colonne.nom}`")
+            valeur = brut.cast(types_spark[colonne.dtype]) if colonne.dtype in types_spark else brut
+            if not colonne.nullable:
+                conditions[(colonne.nom, 'manquant')] = brut.isNull()
+            if colonne.dtype in types_spark:
+                conditions[(colonne.nom, 'type')] = brut.isNotNull() & valeur.isNull()
+            if colonne.min is not None:
+                conditions[(colonne.nom, 'min')] = valeur < colonne.min
+            if colonne.max is not None:
+                conditions[(colonne.nom, 'max')] = valeur > colonne.max
+            if colonne.valeurs is not None:
+                conditions[(colonne.nom, 'valeur')] = valeur.isNotNull() & ~valeur.isin(colonne.valeurs)
+        cles = list(conditions)
+        ligne = df.agg(F.count(F.lit(1)).alias('n'),
+                       *[F.sum(F.when(conditions[cle], 1).otherwise(0)).alias(f"r{i}") for i, cle in enumerate(cles)]
+                       ).collect()[0]
+        total = max(ligne['n'], 1)
+        infractions = [{'colonne': nom, 'regle': regle, 'lignes': ligne[f"r{i}"], 'part': ligne[f"r{i}"] / total,
+                        'exemple': None, 'premiere_ligne': None}
+                       for i, (nom, regle) in enumerate(cles) if ligne[f"r{i}"]]
+        rapport = pd.DataFrame(infractions, columns=COLONNES_RAPPORT)
+        if (rapport['part'] > self.seuil_rejet).any():
+            raise SchemaError(f"Fichier rejeté ({self.nom}) :\n{format_report(rapport)}")
+        return rapport
+
+    def describe(self):
+        """Contrat du schéma sous forme de tableau (nom, type, unité, requis, valeurs autorisées)."""
+        return pd.DataFrame([{'colonne': c.nom, 'type': c.dtype, 'unite': c.unite, 'requis': c.requis,
+                              'nullable': c.nullable, 'valeurs': c.valeurs} for c in self.colonnes.values()])
+
+
+def format_report(rapport):
+    """Rapport d'infractions en texte compact, une ligne par (colonne, règle)."""
+    lignes = []
+    for infraction in rapport.itertuples(index=False):
+        exemple = '' if infraction.exemple is None else f", ex. '{infraction.exemple}' (ligne {infraction.premiere_ligne})"
+        lignes.append(f"- {infraction.colonne} : {infraction.regle}, {infraction.lignes} lignes "
+                      f"({infraction.part:.1%}){exemple}")
+    return '\n'.join(lignes)
+
+
+COLONNE_GAZ = 'Consommation brute gaz (MW PCS 0°C) - GRTgaz'
+COLONNE_ELEC = 'Consommation brute électricité (MW) - RTE'
+COLONNE_TOTALE = 'Consommation brute totale (MW)'
+
+""" Schémas par source de données """
+SCHEMAS = {
+    # Consomation&Mouvement.csv (consommation quotidienne brute ODRE enrichie des mouvements sociaux)
+    'consommation_brute': Schema(
+        'consommation_brute',
+        [
+            Column('Date_Heure', 'datetime', nullable=False),
+            Column(COLONNE_GAZ, 'float', unite='MW PCS 0°C', min=0),
+            Column('Consommation brute gaz (MW PCS 0°C) - Teréga', 'float', unite='MW PCS 0°C', requis=False, min=0),
+            Column(COLONNE_ELEC, 'float', unite='MW', min=0),
+            Column(COLONNE_TOTALE, 'float', unite='MW', min=0),
+            Column('Statut - GRTgaz', 'category', requis=False, valeurs=STATUTS),
+            Column('Statut - Teréga', 'category', requis=False, valeurs=STATUTS),
+            Column('Statut - RTE', 'category', requis=False, valeurs=STATUTS),
+            Column('mouvement_social', 'bool', requis=False),
+        ],
+        renommage={'Date - Heure': 'Date_Heure'},
+        # Colonnes ajoutées par les chargeurs des tableaux de bord à partir des colonnes validées
+        derivees=('Date', 'Heure', 'Year', 'Month', 'DayOfYear', 'mouvement_social_num'),
+    ),
+    # eco2mix-national-tr.csv (Data_Analysis.py, pipeline.py)
+    'eco2mix': Schema(
+        'eco2mix',
+        [
+            Column('date_heure', 'datetime', nullable=False),
+            Column('consommation', 'float', unite='MW', min=0),
+            Column('taux_co2', 'float', unite='gCO2/kWh', requis=False, min=0),
+            Column('nature', 'category', requis=False,
+                   valeurs=('Données temps réel', 'Données consolidées', 'Données définitives')),
+        ],
+    ),
+    # donnée concatenées.csv (geolocalisation.py)
+    'consommation_regionale': Schema(
+        'consommation_regionale',
+        [
+            Column('annee', 'int', nullable=False, min=1990, max=2100),
+            Column('region', 'str'),
+            Column('filiere', 'str'),
+            Column('valeur', 'float', unite='MWh'),
+        ],
+    ),
+}
+
+
+def has_columns(df, colonnes):
+    """
+    Vrai si df contient toutes les colonnes ; sans effet (aucune recherche) pour un DataFrame
+    marqué par un chargeur dont le schéma garantit déjà ces colonnes.
+    """
+    schema = SCHEMAS.get(df.attrs.get('schema'))
+    if schema is not None and schema.garanties.issuperset(colonnes):
+        return True
+    return all(colonne in df.columns for colonne in colonnes)
@@ -0,0 +1,310 @@
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+COLONNE_DATE = 'Date_Heure'
+
+""" Colonnes de consommation conservées par défaut """
+COLONNES = ['Consommation brute totale (MW)', 'Consommation brute gaz (MW PCS 0°C) - GRTgaz',
+            'Consommation brute électricité (MW) - RTE']
+
+""" Niveaux précalculés, du plus fin au plus grossier, et leur règle de découpage (seaux étiquetés par leur début) """
+NIVEAUX = ('hour', 'day', 'week', 'month')
+REGLES = {'hour': 'h', 'day': 'D', 'week': 'W-MON', 'month': 'MS'}
+
+""" Statistiques conservées par colonne et manière de les combiner entre seaux """
+STATS = ('count', 'sum', 'min', 'max')
+COMBINAISON = {'count': 'sum', 'sum': 'sum', 'min': 'min', 'max': 'max'}
+
+""" Résolutions de requête : niveaux utilisables, du plus grossier au plus fin (un seau doit tenir dans une période) """
+RESOLUTIONS = {
+    'hour': ('hour',),
+    'day': ('day', 'hour'),
+    'week': ('week', 'day', 'hour'),
+    'month': ('month', 'day', 'hour'),
+    'year': ('month', 'day', 'hour'),
+}
+REGLES_SORTIE = dict(REGLES, year='YS')
+
+""" Le niveau horaire est découpé en un fichier par mois (clé aaaamm) : un ajout ne réécrit que le mois en cours """
+NIVEAUX_PAR_MOIS = ('hour',)
+
+
+def _floor(ts, niveau):
+    """Début du seau du niveau contenant ts."""
+    if niveau == 'hour':
+        return ts.floor('h')
+    jour = ts.floor('D')
+    if niveau == 'day':
+        return jour
+    if niveau == 'week':
+        return jour - pd.Timedelta(days=jour.dayofweek)
+    return jour - pd.Timedelta(days=jour.day - 1)
+
+
+def _ceil(ts, niveau):
+    """Premier début de seau du niveau postérieur ou égal à ts."""
+    debut = _floor(ts, niveau)
+    if debut == ts:
+        return ts
+    if niveau == 'month':
+        return debut + pd.offsets.MonthBegin(1)
+    return debut + {'hour': pd.Timedelta(hours=1), 'day': pd.Timedelta(days=1), 'week': pd.Timedelta(days=7)}[niveau]
+
+
+def bucket_stats(frame, regle):
+    """
+    Statistiques par seau (count, sum, min, max de chaque colonne), seaux vides exclus.
+
+    Args:
+    - frame : DataFrame : Valeurs indexées par date.
+    - regle : str : Règle de découpage pandas (seaux fermés et étiquetés à gauche).
+
+    Returns:
+    - DataFrame : Colonnes (colonne, stat), index = début de seau.
+    """
+    echantillons = frame.resample(regle, label='left', closed='left')
+    stats = pd.concat({stat: getattr(echantillons, stat)() for stat in STATS}, axis=1)
+    stats = stats.swaplevel(axis=1)[[(c, s) for c in frame.columns for s in STATS]]
+    return stats[(stats.xs('count', axis=1, level=1) > 0).any(axis=1)]
+
+
+def _agregations(stats):
+    return {colonne: COMBINAISON[colonne[1]] for colonne in stats.columns}
+
+
+def combine(stats, regle=None):
+    """
+    Combine des statistiques de seaux : par étiquette identique, ou après redécoupage selon `regle`.
+
+    Les combinaisons sont exactes (sommes des effectifs et des sommes, min des min, max des max).
+    """
+    if len(stats) == 0:
+        return stats
+    if regle is None:
+        return stats.groupby(level=0).agg(_agregations(stats))
+    combines = stats.resample(regle, label='left', closed='left').agg(_agregations(stats))
+    return combines[(combines.xs('count', axis=1, level=1) > 0).any(axis=1)]
+
+
+class TimeSeriesStore:
+    """
+    Série de consommation précalculée aux niveaux heure / jour / semaine / mois (count, sum, min, max).
+
+    Les requêtes lisent le niveau le plus grossier compatible avec la résolution demandée pour
+    l'intérieur de la plage, et les niveaux plus fins seulement pour les bords non alignés : une vue
+    pluriannuelle mensuelle lit quelques centaines de lignes au lieu de tout l'historique horaire.
+
+    Le stockage est en ajout seul : `append` ne prend que les dates postérieures à la dernière date
+    enregistrée. Si des données déjà enregistrées sont révisées, il faut reconstruire le stockage
+    (supprimer son répertoire).
+    """
+
+    def __init__(self, directory=None, colonnes=None):
+        self.directory = directory
+        self.colonnes = list(colonnes) if colonnes is not None else None
+        self.debut = None
+        self.fin = None
+        self.partitions = {niveau: [] for niveau in NIVEAUX}
+        self._cache = {}
+        self.octets_lus = 0
+        self.lignes_lues = 0
+        if directory is not None and os.path.exists(self._manifest_path()):
+            with open(self._manifest_path(), encoding='utf-8') as f:
+                manifeste = json.load(f)
+            self.colonnes = manifeste['colonnes']
+            self.debut = pd.Timestamp(manifeste['debut'])
+            self.fin = pd.Timestamp(manifeste['fin'])
+            self.partitions = manifeste['partitions']
+
+    @classmethod
+    def from_frame(cls, df, colonnes=None):
+        """Stockage en mémoire construit à partir d'un DataFrame."""
+        store = cls(colonnes=colonnes)
+        store.append(df)
+        return store
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, 'manifest.json')
+
+    def _partition_path(self, niveau, cle):
+        nom = f"{niveau}_{cle}.pkl" if niveau in NIVEAUX_PAR_MOIS else f"{niveau}.pkl"
+        return os.path.join(self.directory, nom)
+
+    def _partition_keys(self, index, niveau):
+        if niveau in NIVEAUX_PAR_MOIS:
+            return (index.year * 100 + index.month).to_numpy()
+        return np.zeros(len(index), dtype='int64')
+
+    def _load(self, niveau, cle):
+        """Partition d'un niveau, lue sur disque à la première utilisation."""
+        if (niveau, cle) not in self._cache:
+            partition = None
+            if self.directory is not None and cle in self.partitions[niveau]:
+                chemin = self._partition_path(niveau, cle)
+                self.octets_lus += os.path.getsize(chemin)
+                with open(chemin, 'rb') as f:
+                    partition = pickle.load(f)
+            self._cache[(niveau, cle)] = partition
+        return self._cache[(niveau, cle)]
+
+    def append(self, df):
+        """
+        Ajoute les nouvelles dates et met à jour tous les niveaux.
+
+        Seuls les seaux finaux de chaque niveau peuvent recevoir des données déjà partiellement
+        agrégées : ils sont combinés, le reste de l'historique n'est ni relu ni réécrit (hormis la
+        partition horaire du mois en cours).
+
+        Args:
+        - df : DataFrame : Données indexées par date, ou avec une colonne 'Date_Heure'.
+
+        Returns:
+        - int : Nombre de lignes ajoutées.
+        """
+        if COLONNE_DATE in df.columns:
+            df = df.set_index(COLONNE_DATE)
+        if not isinstance(df.index, pd.DatetimeIndex):
+            raise ValueError("Les données doivent être indexées par date ou contenir la colonne Date_Heure")
+        if self.colonnes is None:
+            self.colonnes = [c for c in COLONNES if c in df.columns] or list(df.select_dtypes('number').columns)
+        manquantes = [c for c in self.colonnes if c not in df.columns]
+        if manquantes:
+            raise ValueError(f"Colonnes absentes des données : {manquantes}")
+        if self.fin is not None and (df.index.tz is None) != (self.fin.tz is None):
+            raise ValueError("Les dates ajoutées et celles du stockage doivent être toutes deux avec ou sans fuseau")
+
+        nouvelles = df[self.colonnes].astype('float64').sort_index()
+        nouvelles = nouvelles[nouvelles.index.notna()]
+        if self.fin is not None:
+            nouvelles = nouvelles[nouvelles.index > self.fin]
+        if len(nouvelles) == 0:
+            return 0
+
+        modifiees = []
+        for niveau in NIVEAUX:
+            stats = bucket_stats(nouvelles, REGLES[niveau])
+            for cle, morceau in stats.groupby(self._partition_keys(stats.index, niveau)):
+                cle = int(cle)
+                existant = self._load(niveau, cle)
+                if existant is not None:
+                    debut = morceau.index[0]
+                    # Seul le dernier seau existant peut chevaucher les nouveaux
+                    morceau = pd.concat([existant[existant.index < debut],
+                                         combine(pd.concat([existant[existant.index >= debut], morceau]))])
+                self._cache[(niveau, cle)] = morceau
+                if cle not in self.partitions[niveau]:
+                    self.partitions[niveau].append(cle)
+                modifiees.append((niveau, cle))
+
+        self.debut = nouvelles.index[0] if self.debut is None else self.debut
+        self.fin = nouvelles.index[-1]
+        if self.directory is not None:
+            self._save(modifiees)
+        return len(nouvelles)
+
+    def _save(self, modifiees):
+        os.makedirs(self.directory, exist_ok=True)
+        for niveau, cle in modifiees:
+            chemin = self._partition_path(niveau, cle)
+            with open(chemin + '.tmp', 'wb') as f:
+                pickle.dump(self._cache[(niveau, cle)], f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(chemin + '.tmp', chemin)
+        # Le manifeste est écrit en dernier : un ajout interrompu laisse l'ancien état lisible
+        with open(self._manifest_path(), 'w', encoding='utf-8') as f:
+            json.dump({'colonnes': self.colonnes, 'debut': self.debut.isoformat(), 'fin': self.fin.isoformat(),
+                       'partitions': self.partitions}, f, ensure_ascii=False, indent=2)
+
+    def _timestamp(self, valeur):
+        if valeur is None:
+            return None
+        ts = pd.Timestamp(valeur)
+        if self.fin is not None and self.fin.tz is not None and ts.tz is None:
+            ts = ts.tz_localize(self.fin.tz)
+        return ts
+
+    def plan(self, debut=None, fin=None, resolution='day'):
+        """
+        Niveaux lus pour une requête : liste de (niveau, debut, fin), bornes None = non bornées.
+
+        L'intérieur de la plage aligné sur les seaux du niveau le plus grossier utilisable est lu à ce
+        niveau ; les bords sont lus aux niveaux plus fins.
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Résolution inconnue : {resolution} (disponibles : {', '.join(RESOLUTIONS)})")
+        return self._plan(RESOLUTIONS[resolution], self._timestamp(debut), self._timestamp(fin))
+
+    def _plan(self, niveaux, debut, fin):
+        if debut is not None and fin is not None and debut >= fin:
+            return []
+        niveau = niveaux[0]
+        if len(niveaux) == 1:
+            return [(niveau, debut, fin)]
+        a = _ceil(debut, niveau) if debut is not None else None
+        b = _floor(fin, niveau) if fin is not None else None
+        if a is not None and b is not None and a >= b:
+            return self._plan(niveaux[1:], debut, fin)
+        segments = [(niveau, a, b)]
+        if a is not None:
+            segments = self._plan(niveaux[1:], debut, a) + segments
+        if b is not None:
+            segments = segments + self._plan(niveaux[1:], b, fin)
+        return segments
+
+    def _read(self, niveau, debut, fin):
+        cles = self.partitions[niveau]
+        if niveau in NIVEAUX_PAR_MOIS:
+            cles = [c for c in cles if (debut is None or c >= debut.year * 100 + debut.month)
+                    and (fin is None or c <= fin.year * 100 + fin.month)]
+        morceaux = [p for p in (self._load(niveau, c) for c in sorted(cles)) if p is not None]
+        if not morceaux:
+            return None
+        stats = pd.concat(morceaux) if len(morceaux) > 1 else morceaux[0]
+        masque = pd.Series(True, index=stats.index)
+        if debut is not None:
+            masque &= stats.index >= debut
+        if fin is not None:
+            masque &= stats.index < fin
+        stats = stats[masque.to_numpy()]
+        self.lignes_lues += len(stats)
+        return stats
+
+    def query(self, colonnes=None, debut=None, fin=None, resolution='day', stat='mean'):
+        """
+        Statistiques de consommation à la résolution demandée sur la plage [debut, fin).
+
+        Args:
+        - colonnes : list : Colonnes voulues (toutes par défaut).
+        - debut, fin : Timestamp ou str : Bornes de la plage (None = non bornée).
+        - resolution : str : 'hour', 'day', 'week', 'month' ou 'year'.
+        - stat : str : 'mean', 'count', 'sum', 'min', 'max', ou 'all' pour toutes les statistiques.
+
+        Returns:
+        - DataFrame : Une ligne par période (étiquetée par son début) ; une colonne par colonne
+          demandée, ou des colonnes (colonne, stat) si stat='all'.
+        """
+        if self.colonnes is None:
+            return pd.DataFrame()
+        colonnes = list(colonnes) if colonnes is not None else self.colonnes
+        morceaux = []
+        for niveau, a, b in self.plan(debut, fin, resolution):
+            stats = self._read(niveau, a, b)
+            if stats is not None and len(stats) > 0:
+                morceaux.append(stats[[(c, s) for c in colonnes for s in STATS]])
+        if not morceaux:
+            return pd.DataFrame(columns=colonnes)
+        stats = combine(pd.concat(morceaux).sort_index(), REGLES_SORTIE[resolution]).rename_axis('periode')
+        if stat == 'all':
+            moyennes = {(c, 'mean'): stats[(c, 'sum')] / stats[(c, 'count')].where(stats[(c, 'count')] > 0)
+                        for c in colonnes}
+            return pd.concat([stats, pd.DataFrame(moyennes)], axis=1)[
+                [(c, s) for c in colonnes for s in STATS + ('mean',)]]
+        if stat == 'mean':
+            return pd.DataFrame({c: stats[(c, 'sum')] / stats[(c, 'count')].where(stats[(c, 'count')] > 0)
+                                 for c in colonnes})
+        if stat not in STATS:
+            raise ValueError(f"Statistique inconnue : {stat}")
+        return stats.xs(stat, axis=1, level=1)[colonnes]
@@ -1,12 +1,15 @@
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
-import seaborn as sns
-from statsmodels.tsa.seasonal import seasonal_decompose
-from statsmodels.tsa.arima.model import ARIMA
+
+# seaborn et statsmodels, coûteux à importer, sont chargés dans les fonctions qui les utilisent :
+# importer ce module ne lit aucun fichier et ne trace rien
 
 file_path = 'eco2mix-national-tr.csv'
 
+""" Variables calendaires de feature_matrix.py utilisées comme exogènes de la prévision """
+EXOGENES = ['week_end', 'ferie', 'jour_annee_sin', 'jour_annee_cos']
+
 def load_data(file_path):
     """Charger les données à partir d'un fichier CSV."""
     return pd.read_csv(file_path, sep=';')
@@ -38,6 +41,7 @@ def plot_energy_consumption_over_time(df):
 
 def plot_energy_co2_relation(df):
     """Diagramme de dispersion pour la relation entre la consommation d'énergie et les émissions de CO2."""
+    import seaborn as sns
     plt.figure(figsize=(8, 6))
     sns.scatterplot(data=df, x="consommation", y="taux_co2")
     plt.title("Relation entre la consommation d'énergie et les émissions de CO2")
@@ -48,8 +52,9 @@ def plot_energy_co2_relation(df):
 
 def plot_correlation_heatmap(df):
     """Matrice de corrélation et heatmap."""
+    import seaborn as sns
     plt.figure(figsize=(12, 10))
-    correlation_matrix = df.corr()
+    correlation_matrix = df.corr(numeric_only=True)
     sns.heatmap(correlation_matrix, annot=True, fmt=".2f", cmap='coolwarm',
                 square=True, annot_kws={'size': 8})
     plt.xticks(rotation=45, ha='right', size=10)
@@ -58,12 +63,21 @@ def plot_correlation_heatmap(df):
     plt.tight_layout()
     st.pyplot(plt.gcf())  
 
-def forecast_arima(df, order=(5,1,0), steps=30):
-    """Prévision de la consommation d'énergie avec ARIMA."""
-    model = ARIMA(df['consommation'], order=order)
+def forecast_arima(df, order=(5,1,0), steps=30, features=None):
+    """
+    Prévision de la consommation d'énergie avec ARIMA.
+
+    Avec une matrice de variables (feature_matrix.FeatureMatrix alignée sur df), les variables
+    calendaires connues à l'avance (EXOGENES) sont utilisées comme régresseurs exogènes.
+    """
+    from statsmodels.tsa.arima.model import ARIMA
+    if features is None:
+        model = ARIMA(df['consommation'], order=order)
+        model_fit = model.fit()
+        return model_fit.forecast(steps=steps)
+    model = ARIMA(df['consommation'], exog=features.select(EXOGENES), order=order)
     model_fit = model.fit()
-    forecast = model_fit.forecast(steps=steps)
-    return forecast
+    return model_fit.forecast(steps=steps, exog=features.future_calendar(steps, EXOGENES))
 
 def plot_forecast(df, forecast):
     """Tracer les données observées et la prévision."""
@@ -80,6 +94,7 @@ def plot_forecast(df, forecast):
 
 def boxplot_energy_consumption(df):
     """Boîte à moustaches pour la consommation d'énergie."""
+    import seaborn as sns
     plt.figure(figsize=(10, 6))
     sns.boxplot(data=df[['consommation']])
     plt.title("Boîte à moustaches de la consommation d'énergie")
@@ -121,6 +136,7 @@ def year_with_highest_consumption(df):
 
 def violinplot_energy_consumption(df):
     """Diagramme de violon pour explorer la distribution de la consommation d'énergie."""
+    import seaborn as sns
     plt.figure(figsize=(10, 6))
     sns.violinplot(y=df["consommation"], color="skyblue")
     plt.title("Distribution de la consommation d'énergie")
@@ -129,17 +145,18 @@ def violinplot_energy_consumption(df):
     st.pyplot(plt.gcf())
 
 
-df = load_data(file_path)
+if __name__ == "__main__":
+    df = load_data(file_path)
 
-"""Affichez les graphiques individuels avec Streamlit"""
+    """Affichez les graphiques individuels avec Streamlit"""
 
-plot_energy_consumption_by_source(df)
-plot_energy_consumption_over_time(df)
-plot_energy_co2_relation(df)
-plot_correlation_heatmap(df)
-forecast = forecast_arima(df)
-plot_forecast(df, forecast)
-max_consumption_year = year_with_highest_consumption(df)
-boxplot_energy_consumption(df)
-plot_consumption_by_year(df, max_consumption_year)
-violinplot_energy_consumption(df)
+    plot_energy_consumption_by_source(df)
+    plot_energy_consumption_over_time(df)
+    plot_energy_co2_relation(df)
+    plot_correlation_heatmap(df)
+    forecast = forecast_arima(df)
+    plot_forecast(df, forecast)
+    max_consumption_year = year_with_highest_consumption(df)
+    boxplot_energy_consumption(df)
+    plot_consumption_by_year(df, max_consumption_year)
+    violinplot_energy_consumption(df)
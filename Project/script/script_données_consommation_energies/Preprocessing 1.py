@@ -1,13 +1,19 @@
 import pandas as pd
-from sklearn.impute import SimpleImputer
-from sklearn.preprocessing import StandardScaler
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
 
 file = 'eco2mix-national-tr.csv'
-df = pd.read_csv(file, sep=';',low_memory=False,skiprows=1, encoding='Latin1')
-print(df.columns)
+
+def load_eco2mix(file):
+    """
+    Charge l'export eco2mix national (séparateur ';', première ligne ignorée, encodage Latin1).
+
+    Args:
+    - file : str : Chemin du fichier CSV.
+
+    Returns:
+    - df : DataFrame : Les données brutes.
+    """
+    return pd.read_csv(file, sep=';',low_memory=False,skiprows=1, encoding='Latin1')
 
 # """ Suppression colonnes jugées peu pertinentes pour la suite des analyses   """
 # def drop_columns(df, columns_to_drop):
@@ -52,7 +58,6 @@ def check_missing_values(df):
     print("Nombre de valeurs manquantes par colonne :")
     print(missing_values)
     
-check_missing_values(df)
 
 
 def fillna_with_mean(df, columns):
@@ -74,28 +79,30 @@ columns_to_fill = ["consommation","prevision_j1","prevision_j","fioul","charbon"
                    "taux_co2","fioul_tac","fioul_cogen","fioul_autres","gaz_tac","gaz_cogen","gaz_ccg","hydraulique_fil_eau_eclusee","hydraulique_lacs","hydraulique_step_turbinage",
                    "bioenergies_dechets","bioenergies_biomasse","bioenergies_biogaz"]                                                                                     
 
-# """Appel de la fonction pour remplacer les valeurs manquantes par la moyenne"""
-fillna_with_mean(df, columns_to_fill)
-
-
-
-
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+    import seaborn as sns
 
-df.describe()
-## Matrice de correlation 
-correlation_matrix = df.corr()
-print(correlation_matrix)
-plt.figure(figsize=(12, 10))
+    df = load_eco2mix(file)
+    print(df.columns)
+    check_missing_values(df)
 
+    # """Appel de la fonction pour remplacer les valeurs manquantes par la moyenne"""
+    fillna_with_mean(df, columns_to_fill)
 
-sns.heatmap(correlation_matrix, annot=True, fmt=".2f", cmap='coolwarm', 
-            square=True, annot_kws={'size':8}) 
+    df.describe()
+    ## Matrice de correlation 
+    correlation_matrix = df.corr(numeric_only=True)
+    print(correlation_matrix)
+    plt.figure(figsize=(12, 10))
 
+    sns.heatmap(correlation_matrix, annot=True, fmt=".2f", cmap='coolwarm', 
+                square=True, annot_kws={'size':8}) 
 
-plt.xticks(rotation=45, ha='right', size=15) 
-plt.yticks(size=15)
-# Titre et affichage
-plt.title('Matrice de Corrélation')
-plt.tight_layout()
-plt.show()
+    plt.xticks(rotation=45, ha='right', size=15) 
+    plt.yticks(size=15)
+    # Titre et affichage
+    plt.title('Matrice de Corrélation')
+    plt.tight_layout()
+    plt.show()
 
@@ -71,21 +71,35 @@ def export_dataset_to_csv(dataset_id, delimiter=";", list_separator=",", quote_a
         print("Error exporting dataset:", e)
         return None
 
-dataset_id = "consommation-nationale-horaire-de-gaz-donnees-provisoires-grtgaz-terega-v2"
+def get_dataset(dataset_id):
+    # Métadonnées du jeu (dates de modification et de traitement des données)
+    base_url = sourceUrl+"/catalog/datasets/{}".format(dataset_id)
+    
+    try:
+        response = requests.get(base_url)
+        response.raise_for_status()
+        data = response.json()
+        return data.get('dataset', data)
+    except requests.exceptions.RequestException as e:
+        print("Error fetching dataset metadata:", e)
+        return None
+
+if __name__ == "__main__":
+    dataset_id = "consommation-nationale-horaire-de-gaz-donnees-provisoires-grtgaz-terega-v2"
 
-csv_data = export_dataset_to_csv(dataset_id)
-if csv_data:
-    # Save CSV data to a file
-    with open("exported_dataset.csv", "wb") as csv_file:
-        csv_file.write(csv_data)
-    print("Dataset exported to 'exported_dataset.csv'")
-else:
-    print("Failed to export dataset.")
+    csv_data = export_dataset_to_csv(dataset_id)
+    if csv_data:
+        # Save CSV data to a file
+        with open("exported_dataset.csv", "wb") as csv_file:
+            csv_file.write(csv_data)
+        print("Dataset exported to 'exported_dataset.csv'")
+    else:
+        print("Failed to export dataset.")
     
-dataset_id = "consommation-nationale-horaire-de-gaz-donnees-provisoires-grtgaz-terega-v2"
+    dataset_id = "consommation-nationale-horaire-de-gaz-donnees-provisoires-grtgaz-terega-v2"
 
-data = query_dataset_records(dataset_id,select="consommation_journaliere_mwh_pcs",limit=10)
-if data:
-    print("Received data from API:", data)
-else:
-    print("Failed to fetch data from API.")
+    data = query_dataset_records(dataset_id,select="consommation_journaliere_mwh_pcs",limit=10)
+    if data:
+        print("Received data from API:", data)
+    else:
+        print("Failed to fetch data from API.")
@@ -1,12 +1,18 @@
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from statsmodels.tsa.arima.model import ARIMA
-from Data_Analysis import * 
+from Data_Analysis import (file_path, load_data, plot_energy_consumption_by_source,
+                           plot_energy_consumption_over_time, plot_energy_co2_relation, plot_correlation_heatmap,
+                           boxplot_energy_consumption, year_with_highest_consumption, plot_consumption_by_year,
+                           violinplot_energy_consumption)
 
 
-df = pd.read_csv('eco2mix-national-tr.csv', sep=';')
+@st.cache_data
+def load_data_cached(file_path):
+    # Lecture unique du CSV, partagée entre les réexécutions du script Streamlit
+    return load_data(file_path)
+
+
+# Copie : certains graphiques ajoutent des colonnes au DataFrame
+df = load_data_cached(file_path).copy()
 
 option = st.sidebar.selectbox(
     'Choisissez le graphique que vous voulez afficher:',
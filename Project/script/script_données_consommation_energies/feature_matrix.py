@@ -0,0 +1,324 @@
+"""
+Matrice de variables explicatives de la consommation : calendrier, jours fériés français, jours de
+grève, retards et moyennes glissantes de la consommation.
+
+La matrice est construite une fois en float32 contigu (lignes x variables) et mise en cache sur
+disque avec la série qui l'a produite : quand des pas de temps sont ajoutés (ou les derniers révisés)
+en fin de série, seules les lignes concernées sont recalculées.
+
+Exemple :
+    store = FeatureStore('.features/eco2mix')
+    matrice = store.update(serie_horaire, greves=strike_days())
+    X = matrice.select(COLONNES_CALENDRIER)
+"""
+import hashlib
+import inspect
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+REPERTOIRE = os.path.dirname(os.path.abspath(__file__))
+CHEMIN_GREVES = os.path.join(REPERTOIRE, '..', '..', 'data', 'Mouvement_sociaux', 'mouvements-sociaux-depuis-2002.csv')
+
+""" Les variables calendaires sont calculées en heure légale française """
+FUSEAU = 'Europe/Paris'
+
+""" Jours fériés fixes (mois, jour) et mobiles (jours après Pâques : lundi de Pâques, Ascension, lundi de Pentecôte) """
+JOURS_FERIES_FIXES = [(1, 1), (5, 1), (5, 8), (7, 14), (8, 15), (11, 1), (11, 11), (12, 25)]
+JOURS_FERIES_PAQUES = (1, 39, 50)
+
+""" Retards et fenêtres des moyennes glissantes, en pas de la série, selon sa fréquence """
+DECALAGES = {'h': (1, 24, 168), 'D': (1, 7, 364)}
+FENETRES = {'h': (24, 168), 'D': (7, 28)}
+
+""" Variables connues à l'avance (utilisables comme exogènes d'une prévision) """
+COLONNES_CALENDRIER = ['annee', 'mois', 'jour_annee', 'jour_semaine', 'heure', 'week_end', 'ferie',
+                       'heure_sin', 'heure_cos', 'jour_annee_sin', 'jour_annee_cos']
+
+
+def easter(annees):
+    """
+    Dimanche de Pâques (calendrier grégorien, algorithme de Meeus/Jones/Butcher).
+
+    Args:
+    - annees : array : Années.
+
+    Returns:
+    - DatetimeIndex : Date de Pâques de chaque année.
+    """
+    annees = np.asarray(annees, dtype='int64')
+    a, b, c = annees % 19, annees // 100, annees % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    n = h + l - 7 * m + 114
+    return pd.DatetimeIndex(pd.to_datetime(pd.DataFrame({'year': annees, 'month': n // 31, 'day': n % 31 + 1})))
+
+
+def public_holidays(annees):
+    """Jours fériés nationaux (métropole) des années demandées."""
+    annees = np.unique(np.asarray(annees, dtype='int64'))
+    fixes = pd.to_datetime(pd.DataFrame({'year': np.repeat(annees, len(JOURS_FERIES_FIXES)),
+                                         'month': np.tile([m for m, _ in JOURS_FERIES_FIXES], len(annees)),
+                                         'day': np.tile([j for _, j in JOURS_FERIES_FIXES], len(annees))}))
+    paques = easter(annees)
+    mobiles = [paques + pd.Timedelta(days=decalage) for decalage in JOURS_FERIES_PAQUES]
+    return pd.DatetimeIndex(fixes).append(mobiles).unique().sort_values()
+
+
+def strike_days(csv_path=CHEMIN_GREVES):
+    """
+    Jours couverts par un préavis de grève (data/Mouvement_sociaux), du début à la fin du mouvement.
+
+    Returns:
+    - DatetimeIndex : Jours de grève.
+    """
+    mouvements = pd.read_csv(csv_path, sep=';', usecols=['Date', 'date_de_fin'], encoding='utf-8-sig')
+    debuts = pd.to_datetime(mouvements['Date'], errors='coerce')
+    fins = pd.to_datetime(mouvements['date_de_fin'], errors='coerce').fillna(debuts)
+    valides = debuts.notna()
+    durees = (fins[valides] - debuts[valides]).dt.days.clip(lower=0).to_numpy() + 1
+    jours = np.repeat(debuts[valides].to_numpy(), durees) + \
+        np.concatenate([np.arange(duree) for duree in durees]).astype('timedelta64[D]')
+    return pd.DatetimeIndex(jours).unique().sort_values()
+
+
+def _local(index):
+    return index.tz_convert(FUSEAU) if index.tz is not None else index
+
+
+def calendar_features(index, greves=None):
+    """
+    Variables calendaires (et indicateur de grève) d'un index de dates.
+
+    Args:
+    - index : DatetimeIndex : Dates (converties en heure française si elles ont un fuseau).
+    - greves : DatetimeIndex : Jours de grève (indicateur 'greve' omis si None).
+
+    Returns:
+    - dict : Nom de la variable -> tableau float32.
+    """
+    local = _local(index)
+    jours = local.normalize()
+    if jours.tz is not None:
+        jours = jours.tz_localize(None)
+    heure = (local.hour + local.minute / 60).to_numpy(dtype='float64')
+    jour_annee = local.dayofyear.to_numpy(dtype='float64')
+    jour_semaine = local.dayofweek.to_numpy()
+    variables = {
+        'annee': local.year.to_numpy(),
+        'mois': local.month.to_numpy(),
+        'jour_annee': jour_annee,
+        'jour_semaine': jour_semaine,
+        'heure': heure,
+        'week_end': jour_semaine >= 5,
+        'ferie': jours.isin(public_holidays(np.unique(local.year))) if len(local) else np.zeros(0, bool),
+        'heure_sin': np.sin(2 * np.pi * heure / 24),
+        'heure_cos': np.cos(2 * np.pi * heure / 24),
+        'jour_annee_sin': np.sin(2 * np.pi * jour_annee / 365.25),
+        'jour_annee_cos': np.cos(2 * np.pi * jour_annee / 365.25),
+    }
+    if greves is not None:
+        variables['greve'] = jours.isin(greves)
+    return {nom: np.asarray(valeurs, dtype='float32') for nom, valeurs in variables.items()}
+
+
+def lag_features(serie, frequence):
+    """
+    Retards et moyennes glissantes de la série (fenêtres sur le passé strict, décalées d'un pas).
+
+    Returns:
+    - dict : Nom de la variable -> tableau float32 (NaN tant que l'historique est insuffisant).
+    """
+    valeurs = serie.astype('float64')
+    variables = {f"retard_{k}": valeurs.shift(k) for k in DECALAGES[frequence]}
+    passe = valeurs.shift(1)
+    for fenetre in FENETRES[frequence]:
+        variables[f"moyenne_{fenetre}"] = passe.rolling(fenetre, min_periods=fenetre).mean()
+    return {nom: v.to_numpy(dtype='float32') for nom, v in variables.items()}
+
+
+def _nanoseconds(index):
+    """Instants de l'index en nanosecondes UTC (quelle que soit la résolution de l'index)."""
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return index.values.astype('datetime64[ns]').view('int64')
+
+
+def _frequency(index):
+    """Fréquence régulière de l'index ('h' ou 'D'), sinon ValueError."""
+    pas = np.unique(np.diff(_nanoseconds(index)))
+    frequences = {pd.Timedelta(hours=1).value: 'h', pd.Timedelta(days=1).value: 'D'}
+    if len(pas) != 1 or pas[0] not in frequences:
+        raise ValueError("La série doit être horaire ou journalière et régulière (utiliser asfreq)")
+    return frequences[pas[0]]
+
+
+class FeatureMatrix:
+    """Matrice float32 C-contiguë (lignes x variables), avec son index de dates et le nom des colonnes."""
+
+    def __init__(self, valeurs, colonnes, index):
+        self.valeurs = np.ascontiguousarray(valeurs, dtype='float32')
+        self.colonnes = list(colonnes)
+        self.index = index
+
+    def __len__(self):
+        return len(self.valeurs)
+
+    def column(self, nom):
+        return self.valeurs[:, self.colonnes.index(nom)]
+
+    def select(self, colonnes, lignes=None):
+        """Sous-matrice contiguë des colonnes demandées (et des lignes, masque ou tranche)."""
+        positions = [self.colonnes.index(nom) for nom in colonnes]
+        valeurs = self.valeurs if lignes is None else self.valeurs[lignes]
+        return np.ascontiguousarray(valeurs[:, positions])
+
+    def complete_rows(self):
+        """Masque des lignes sans valeur manquante (l'historique des retards est disponible)."""
+        return ~np.isnan(self.valeurs).any(axis=1)
+
+    def future_calendar(self, steps, colonnes=COLONNES_CALENDRIER):
+        """Variables calendaires des `steps` pas suivant la fin de la matrice."""
+        pas = self.index[1] - self.index[0]
+        futur = pd.date_range(self.index[-1] + pas, periods=steps, freq=pas)
+        variables = calendar_features(futur)
+        return np.ascontiguousarray(np.column_stack([variables[nom] for nom in colonnes]), dtype='float32')
+
+    def to_frame(self):
+        return pd.DataFrame(self.valeurs, index=self.index, columns=self.colonnes)
+
+
+def build_features(serie, greves=None):
+    """
+    Construit la matrice de variables d'une série régulière (horaire ou journalière).
+
+    Args:
+    - serie : Series : Consommation indexée par date.
+    - greves : DatetimeIndex : Jours de grève (voir strike_days).
+
+    Returns:
+    - FeatureMatrix : Variables calendaires, grève, retards et moyennes glissantes.
+    """
+    frequence = _frequency(serie.index)
+    variables = calendar_features(serie.index, greves)
+    variables.update(lag_features(serie, frequence))
+    matrice = np.empty((len(serie), len(variables)), dtype='float32')
+    for j, valeurs in enumerate(variables.values()):
+        matrice[:, j] = valeurs
+    return FeatureMatrix(matrice, variables.keys(), serie.index)
+
+
+def _code_fingerprint():
+    """Empreinte du code qui calcule les variables : le modifier (ex. règles des jours fériés) invalide le cache."""
+    code = ''.join(inspect.getsource(f) for f in (easter, public_holidays, _local, calendar_features, lag_features,
+                                                  build_features))
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+def _common_length(index_a, valeurs_a, index_b, valeurs_b):
+    """Nombre de premiers pas identiques (date et valeur, NaN compris) entre deux séries."""
+    n = min(len(index_a), len(index_b))
+    egaux = (index_a[:n] == index_b[:n]) & \
+        ((valeurs_a[:n] == valeurs_b[:n]) | (np.isnan(valeurs_a[:n]) & np.isnan(valeurs_b[:n])))
+    return n if egaux.all() else int(egaux.argmin())
+
+
+class FeatureStore:
+    """
+    Cache disque de la matrice de variables d'une série.
+
+    La série couverte (index.npy, serie.npy) est conservée avec la matrice (matrice.npy) ; le
+    manifeste enregistre la version des données et les paramètres (retards, fenêtres, jours fériés,
+    fuseau, jours de grève et empreinte du code de calcul). Les variables d'une ligne ne dépendant que du passé, les lignes antérieures au premier
+    pas ajouté ou révisé restent valables : seules les suivantes sont recalculées, avec l'historique
+    nécessaire aux retards. Un changement de paramètres reconstruit la matrice.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _parametres(self, greves):
+        empreinte = None
+        if greves is not None:
+            empreinte = hashlib.sha256(_nanoseconds(pd.DatetimeIndex(greves)).tobytes()).hexdigest()
+        # Aller-retour JSON : comparable tel quel au manifeste relu (tuples -> listes)
+        return json.loads(json.dumps({'decalages': DECALAGES, 'fenetres': FENETRES,
+                                      'colonnes_calendrier': COLONNES_CALENDRIER, 'feries_fixes': JOURS_FERIES_FIXES,
+                                      'feries_paques': JOURS_FERIES_PAQUES, 'fuseau': FUSEAU, 'greves': empreinte,
+                                      'code': _code_fingerprint()}))
+
+    def _path(self, nom):
+        return os.path.join(self.directory, nom)
+
+    def load(self):
+        """Matrice, série couverte (float64) et manifeste en cache (None si absents)."""
+        if not os.path.exists(self._path('manifest.json')):
+            return None, None, None
+        with open(self._path('manifest.json'), encoding='utf-8') as f:
+            manifeste = json.load(f)
+        index = pd.DatetimeIndex(np.load(self._path('index.npy')).view('datetime64[ns]'))
+        if manifeste['fuseau'] is not None:
+            index = index.tz_localize('UTC').tz_convert(manifeste['fuseau'])
+        matrice = FeatureMatrix(np.load(self._path('matrice.npy')), manifeste['colonnes'], index)
+        return matrice, np.load(self._path('serie.npy')), manifeste
+
+    def _save(self, matrice, valeurs, manifeste):
+        os.makedirs(self.directory, exist_ok=True)
+        tableaux = {'matrice': matrice.valeurs, 'index': _nanoseconds(matrice.index), 'serie': valeurs}
+        for nom, tableau in tableaux.items():
+            with open(self._path(f"{nom}.npy.tmp"), 'wb') as f:
+                np.save(f, tableau)
+            os.replace(self._path(f"{nom}.npy.tmp"), self._path(f"{nom}.npy"))
+        # Le manifeste est écrit en dernier : il n'est à jour que si les tableaux le sont
+        with open(self._path('manifest.json.tmp'), 'w', encoding='utf-8') as f:
+            json.dump(manifeste, f, ensure_ascii=False, indent=2)
+        os.replace(self._path('manifest.json.tmp'), self._path('manifest.json'))
+
+    def update(self, serie, greves=None, version=None):
+        """
+        Retourne la matrice de la série, en ne calculant que ce qui manque au cache.
+
+        Args:
+        - serie : Series : Consommation régulière (horaire ou journalière) indexée par date.
+        - greves : DatetimeIndex : Jours de grève.
+        - version : str : Version des données (ex. version ODRE), enregistrée dans le manifeste.
+
+        Returns:
+        - FeatureMatrix : La matrice à jour.
+        """
+        frequence = _frequency(serie.index)
+        parametres = self._parametres(greves)
+        index = _nanoseconds(serie.index)
+        valeurs = serie.to_numpy(dtype='float64')
+        matrice, couverte, manifeste = self.load()
+        lignes = 0
+        if manifeste is not None and manifeste['parametres'] == parametres and manifeste['frequence'] == frequence:
+            lignes = _common_length(_nanoseconds(matrice.index), couverte, index, valeurs)
+        if manifeste is not None and lignes == len(serie) == len(matrice) and manifeste['version'] == version:
+            matrice.index = serie.index
+            return matrice
+
+        if lignes == 0:
+            matrice = build_features(serie, greves)
+        elif lignes == len(serie):
+            matrice = FeatureMatrix(matrice.valeurs[:lignes], matrice.colonnes, serie.index)
+        else:
+            # Historique nécessaire au calcul des retards et moyennes glissantes des lignes recalculées
+            historique = max(max(DECALAGES[frequence]), max(FENETRES[frequence]) + 1)
+            nouvelles = build_features(serie.iloc[max(0, lignes - historique):], greves)
+            nouvelles = nouvelles.valeurs[len(nouvelles) - (len(serie) - lignes):]
+            matrice = FeatureMatrix(np.concatenate([matrice.valeurs[:lignes], nouvelles]), matrice.colonnes,
+                                    serie.index)
+
+        self._save(matrice, valeurs, {'lignes': len(serie), 'colonnes': matrice.colonnes, 'frequence': frequence,
+                                      'fuseau': None if serie.index.tz is None else str(serie.index.tz),
+                                      'version': version, 'parametres': parametres,
+                                      'recalculees': len(serie) - lignes})
+        return matrice
@@ -0,0 +1,250 @@
+"""
+Récupération concurrente de plusieurs jeux du catalogue ODRE (gaz GRTgaz/Teréga, eco2mix national
+temps réel, consommation régionale).
+
+Les jeux sont téléchargés en parallèle : le temps total est celui du jeu le plus long et non la somme
+des temps. Le nombre de connexions simultanées est limité par hôte et toutes les requêtes passent par
+un même limiteur de débit. Chaque export CSV est écrit au fil de l'eau dans le répertoire du jeu ;
+un manifeste enregistre la version ODRE, le nombre de lignes et l'empreinte de chaque fichier, et un
+jeu dont la version n'a pas changé n'est pas retéléchargé.
+
+Exemples :
+    python fetcher.py
+    python fetcher.py --datasets gaz eco2mix --per-host 2 --rate 2
+    python fetcher.py --dataset regional=consommation-annuelle-d-electricite-et-gaz-par-region --force
+"""
+import argparse
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+
+from apicall import sourceUrl
+
+""" Jeux récupérés par défaut : nom local -> identifiant ODRE """
+DATASETS = {
+    'gaz': 'consommation-nationale-horaire-de-gaz-donnees-provisoires-grtgaz-terega-v2',
+    'eco2mix': 'eco2mix-national-tr',
+    # Source de 'donnée concatenées.csv' (geolocalisation.py)
+    'regional': 'consommation-annuelle-d-electricite-et-gaz-par-region',
+}
+
+""" Connexions simultanées par hôte et requêtes par seconde (tous jeux confondus) """
+LIMITE_PAR_HOTE = 4
+REQUETES_PAR_SECONDE = 5
+
+""" Taille des blocs lus sur le réseau, nombre de tentatives et délais (connexion, lecture) en secondes """
+TAILLE_BLOC = 1 << 20
+TENTATIVES = 3
+DELAIS = (10, 300)
+
+
+class RateLimiter:
+    """
+    Seau à jetons partagé par toutes les tâches : au plus `rate` requêtes par seconde en régime
+    établi, avec des rafales de `burst` requêtes.
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError("Le débit doit être strictement positif")
+        self.rate = rate
+        self.capacite = burst or max(1, int(rate))
+        self.jetons = self.capacite
+        self.dernier = time.monotonic()
+        self._verrou = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._verrou:
+            while True:
+                maintenant = time.monotonic()
+                self.jetons = min(self.capacite, self.jetons + (maintenant - self.dernier) * self.rate)
+                self.dernier = maintenant
+                if self.jetons >= 1:
+                    self.jetons -= 1
+                    return
+                await asyncio.sleep((1 - self.jetons) / self.rate)
+
+
+class Fetcher:
+    """
+    Téléchargement concurrent des exports CSV ODRE vers un stockage local.
+
+    Les appels HTTP (bloquants, via requests) s'exécutent dans un pool de threads piloté par asyncio ;
+    un sémaphore par hôte borne les connexions ouvertes et le limiteur de débit espace les requêtes.
+    """
+
+    def __init__(self, directory, base_url=sourceUrl, per_host=LIMITE_PAR_HOTE, rate=REQUETES_PAR_SECONDE):
+        self.directory = directory
+        self.base_url = base_url
+        self.per_host = per_host
+        self.rate = rate
+        self.session = requests.Session()
+        adaptateur = requests.adapters.HTTPAdapter(pool_maxsize=per_host)
+        self.session.mount('http://', adaptateur)
+        self.session.mount('https://', adaptateur)
+        self._semaphores = {}
+        self._limiteur = None
+        self._executeur = None
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, 'manifest.json')
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifeste):
+        with open(self.manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifeste, f, ensure_ascii=False, indent=2)
+        os.replace(self.manifest_path + '.tmp', self.manifest_path)
+
+    def _get_json(self, url):
+        reponse = self.session.get(url, timeout=DELAIS)
+        reponse.raise_for_status()
+        return reponse.json()
+
+    def _stream_to_file(self, url, params, chemin):
+        """Écrit la réponse bloc par bloc ; retourne (lignes de données, octets, SHA-256)."""
+        h = hashlib.sha256()
+        octets = sauts = 0
+        dernier = b'\n'
+        with self.session.get(url, params=params, stream=True, timeout=DELAIS) as reponse:
+            reponse.raise_for_status()
+            with open(chemin + '.part', 'wb') as f:
+                for bloc in reponse.iter_content(TAILLE_BLOC):
+                    f.write(bloc)
+                    h.update(bloc)
+                    octets += len(bloc)
+                    sauts += bloc.count(b'\n')
+                    dernier = bloc[-1:]
+        os.replace(chemin + '.part', chemin)
+        lignes = sauts + (dernier != b'\n') - 1 if octets else 0
+        return max(lignes, 0), octets, h.hexdigest()
+
+    async def _request(self, fonction, url, *args):
+        """Exécute un appel HTTP bloquant sous les limites (hôte, débit), avec nouvelles tentatives."""
+        hote = urlsplit(url).netloc
+        semaphore = self._semaphores.setdefault(hote, asyncio.Semaphore(self.per_host))
+        boucle = asyncio.get_running_loop()
+        for tentative in range(1, TENTATIVES + 1):
+            try:
+                async with semaphore:
+                    await self._limiteur.acquire()
+                    return await boucle.run_in_executor(self._executeur, fonction, url, *args)
+            except requests.exceptions.RequestException as e:
+                # Seules les erreurs transitoires (réseau, 429, 5xx) sont retentées
+                statut = e.response.status_code if e.response is not None else None
+                if tentative == TENTATIVES or (statut is not None and statut != 429 and statut < 500):
+                    raise
+                await asyncio.sleep(2 ** tentative)
+
+    async def fetch_one(self, nom, dataset_id, precedent=None, force=False):
+        """
+        Récupère un jeu si sa version ODRE diffère de celle du manifeste.
+
+        Args:
+        - nom : str : Nom local du jeu (sous-répertoire du stockage).
+        - dataset_id : str : Identifiant ODRE.
+        - precedent : dict : Entrée du manifeste de la récupération précédente.
+        - force : bool : Retélécharger même si la version n'a pas changé.
+
+        Returns:
+        - dict : Entrée du manifeste (version, lignes, octets, sha256, durée, statut).
+        """
+        debut = time.perf_counter()
+        url = f"{self.base_url}/catalog/datasets/{dataset_id}"
+        metadonnees = await self._request(self._get_json, url)
+        defaut = metadonnees.get('dataset', metadonnees).get('metas', {}).get('default', {})
+        version = defaut.get('data_processed') or defaut.get('modified')
+
+        repertoire = os.path.join(self.directory, nom)
+        chemin = os.path.join(repertoire, 'data.csv')
+        if (not force and precedent is not None and version is not None and os.path.exists(chemin)
+                and precedent.get('dataset_id') == dataset_id and precedent.get('version') == version):
+            return dict(precedent, statut='inchange', duree_s=round(time.perf_counter() - debut, 3))
+
+        os.makedirs(repertoire, exist_ok=True)
+        lignes, octets, empreinte = await self._request(
+            self._stream_to_file, url + '/exports/csv', {'delimiter': ';', 'with_bom': False}, chemin)
+        return {'dataset_id': dataset_id, 'version': version, 'fichier': os.path.relpath(chemin, self.directory),
+                'lignes': lignes, 'octets': octets, 'sha256': empreinte, 'statut': 'telecharge',
+                'recupere_le': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                'duree_s': round(time.perf_counter() - debut, 3)}
+
+    async def fetch_all(self, datasets, force=False):
+        """
+        Récupère tous les jeux en parallèle puis réécrit le manifeste ; un jeu en échec garde son
+        entrée précédente, marquée avec l'erreur.
+
+        Args:
+        - datasets : dict : Nom local -> identifiant ODRE.
+
+        Returns:
+        - dict : Le manifeste.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        manifeste = self.load_manifest()
+        self._limiteur = RateLimiter(self.rate)
+        self._executeur = ThreadPoolExecutor(max_workers=max(len(datasets), self.per_host))
+        try:
+            noms = list(datasets)
+            resultats = await asyncio.gather(
+                *(self.fetch_one(nom, datasets[nom], manifeste.get(nom), force) for nom in noms),
+                return_exceptions=True)
+        finally:
+            self._executeur.shutdown(wait=False)
+        for nom, resultat in zip(noms, resultats):
+            if isinstance(resultat, Exception):
+                manifeste[nom] = dict(manifeste.get(nom, {'dataset_id': datasets[nom]}),
+                                      statut='erreur', erreur=str(resultat))
+            else:
+                manifeste[nom] = resultat
+        self._write_manifest(manifeste)
+        return manifeste
+
+
+def fetch_datasets(directory, datasets=None, force=False, **options):
+    """Point d'entrée synchrone : récupère `datasets` (DATASETS par défaut) dans `directory`."""
+    return asyncio.run(Fetcher(directory, **options).fetch_all(datasets or DATASETS, force))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Récupération concurrente des jeux ODRE")
+    parser.add_argument('--datasets', nargs='+', choices=list(DATASETS), default=list(DATASETS),
+                        help="Jeux à récupérer")
+    parser.add_argument('--dataset', action='append', default=[], metavar='NOM=ID',
+                        help="Jeu supplémentaire ou identifiant ODRE à substituer")
+    parser.add_argument('--output-dir', default='odre_store', help="Répertoire du stockage local")
+    parser.add_argument('--per-host', type=int, default=LIMITE_PAR_HOTE, help="Connexions simultanées par hôte")
+    parser.add_argument('--rate', type=float, default=REQUETES_PAR_SECONDE, help="Requêtes par seconde")
+    parser.add_argument('--force', action='store_true', help="Retélécharger même sans nouvelle version")
+    args = parser.parse_args()
+
+    datasets = {nom: DATASETS[nom] for nom in args.datasets}
+    for valeur in args.dataset:
+        nom, _, dataset_id = valeur.partition('=')
+        if not dataset_id:
+            parser.error(f"--dataset attend NOM=ID, reçu {valeur!r}")
+        datasets[nom] = dataset_id
+
+    debut = time.perf_counter()
+    manifeste = fetch_datasets(args.output_dir, datasets, args.force, per_host=args.per_host, rate=args.rate)
+    for nom in datasets:
+        entree = manifeste[nom]
+        details = entree.get('erreur') or f"{entree.get('lignes', 0)} lignes, version {entree.get('version')}"
+        print(f"{nom:<12} {entree['statut']:<11} {entree.get('duree_s', 0):>7.2f} s  {details}")
+    print(f"Total : {time.perf_counter() - debut:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
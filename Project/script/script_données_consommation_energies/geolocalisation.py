@@ -1,11 +1,22 @@
 
+import os
+import sys
 import streamlit as st
 import pandas as pd
 import pydeck as pdk
 import numpy as np
 
-# Chargement des données
-df = pd.read_csv('donnée concatenées.csv', usecols=['annee', 'region', 'filiere', 'valeur'], encoding='Latin1', sep=';')
+# Chargement des données : totaux par année et par région demandés au service d'agrégats (query_api.py)
+# si ENERGIE_API_URL est défini, sinon lecture du CSV complet
+api = os.environ.get('ENERGIE_API_URL')
+if api:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'dashboard'))
+    import query_api
+    df = query_api.fetch(api, '/regional').rename(columns={'total': 'valeur'})
+else:
+    df = pd.read_csv('donnée concatenées.csv', usecols=['annee', 'region', 'filiere', 'valeur'], encoding='Latin1', sep=';')
+    # Conversion de la colonne 'filiere' en string
+    df['filiere'] = df['filiere'].astype(str)
 df['annee'] = pd.to_datetime(df['annee'], format='%Y')
 
 # Mapping des régions françaises vers leurs coordonnées
@@ -28,9 +39,6 @@ region_to_coords={
 # Remplacer les valeurs nulles dans la colonne 'region' par 'Inconnu'
 df['region'].fillna('Inconnu', inplace=True)
 
-# Conversion de la colonne 'filiere' en string
-df['filiere'] = df['filiere'].astype(str)
-
 # Fonction pour calculer les totaux de consommation par région et par année
 def calculate_consumption_totals(df, year):
     df_year = df[df['annee'].dt.year == year]
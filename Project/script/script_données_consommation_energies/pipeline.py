@@ -0,0 +1,351 @@
+"""
+Pipeline batch sans interface : fetch → clean → reshape → aggregate → features → forecast.
+
+Chaque étape est identifiée par une empreinte (SHA-256) de son entrée, de ses paramètres et de son
+code : une étape dont l'empreinte n'a pas changé depuis la dernière exécution est sautée, et son
+résultat n'est relu que si une étape suivante doit être recalculée. Les jeux de données sont
+indépendants et traités en parallèle.
+
+Exemples :
+    python pipeline.py
+    python pipeline.py --datasets eco2mix --jobs 1 --until aggregate
+    python pipeline.py --source consommation_brute=../../data/consommation-quotidienne-brute.csv
+"""
+import argparse
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import pickle
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+REPERTOIRE = os.path.dirname(os.path.abspath(__file__))
+if REPERTOIRE not in sys.path:
+    sys.path.insert(0, REPERTOIRE)
+
+from apicall import export_dataset_to_csv, get_dataset
+from Data_Analysis import forecast_arima
+import feature_matrix
+
+
+def _load_script(nom_fichier, nom_module):
+    """Importe un script du répertoire dont le nom n'est pas un identifiant Python (ex. 'Preprocessing 1.py')."""
+    spec = importlib.util.spec_from_file_location(nom_module, os.path.join(REPERTOIRE, nom_fichier))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+preprocessing = _load_script('Preprocessing 1.py', 'preprocessing')
+
+COLONNE_GAZ = 'Consommation brute gaz (MW PCS 0°C) - GRTgaz'
+COLONNE_ELEC = 'Consommation brute électricité (MW) - RTE'
+COLONNE_TOTALE = 'Consommation brute totale (MW)'
+
+""" Jeux de données ODRE traités par le pipeline """
+DATASETS = {
+    'eco2mix': {
+        'dataset_id': 'eco2mix-national-tr',
+        'colonne_date': 'date_heure',
+        'colonne_valeur': 'consommation',
+        'colonnes_numeriques': preprocessing.columns_to_fill,
+        'renommage': {},
+    },
+    'consommation_brute': {
+        'dataset_id': 'consommation-quotidienne-brute',
+        'colonne_date': 'Date - Heure',
+        'colonne_valeur': COLONNE_TOTALE,
+        'colonnes_numeriques': [COLONNE_GAZ, COLONNE_ELEC, COLONNE_TOTALE],
+        # Noms des champs de l'export ODRE -> libellés attendus par les tableaux de bord
+        'renommage': {
+            'date_heure': 'Date - Heure',
+            'consommation_brute_gaz_grtgaz': COLONNE_GAZ,
+            'consommation_brute_electricite_rte': COLONNE_ELEC,
+            'consommation_brute_totale': COLONNE_TOTALE,
+        },
+    },
+}
+
+""" Étapes dans l'ordre d'exécution """
+ETAPES = ('fetch', 'clean', 'reshape', 'aggregate', 'features', 'forecast')
+
+""" Paramètres de la prévision (ceux de Data_Analysis.forecast_arima) """
+ORDRE_ARIMA = (5, 1, 0)
+HORIZON_PREVISION = 30
+
+
+def _empreinte(*parties):
+    """SHA-256 d'une suite de chaînes / objets sérialisables en JSON."""
+    h = hashlib.sha256()
+    for partie in parties:
+        h.update(partie if isinstance(partie, bytes) else json.dumps(partie, sort_keys=True, default=str).encode())
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def file_hash(chemin, taille_bloc=1 << 20):
+    """Empreinte SHA-256 du contenu d'un fichier, lu par blocs."""
+    h = hashlib.sha256()
+    with open(chemin, 'rb') as f:
+        for bloc in iter(lambda: f.read(taille_bloc), b''):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+def fetch(spec, chemin_brut, source=None):
+    """
+    Récupère le CSV brut du jeu (export ODRE, ou fichier local si `source` est fourni).
+
+    La version publiée par ODRE (date de traitement des données) est comparée à celle du fichier déjà
+    téléchargé : le téléchargement n'a lieu que si le jeu a été mis à jour.
+
+    Args:
+    - spec : dict : Description du jeu (voir DATASETS).
+    - chemin_brut : str : Emplacement du CSV brut dans le répertoire de travail.
+    - source : str : Fichier local à utiliser à la place de l'API.
+
+    Returns:
+    - bool : True si le fichier brut a été (re)écrit.
+    """
+    if source is not None:
+        if os.path.exists(chemin_brut) and file_hash(source) == file_hash(chemin_brut):
+            return False
+        shutil.copyfile(source, chemin_brut)
+        return True
+
+    chemin_version = chemin_brut + '.version'
+    metadonnees = get_dataset(spec['dataset_id'])
+    version = None
+    if metadonnees is not None:
+        defaut = metadonnees.get('metas', {}).get('default', {})
+        version = defaut.get('data_processed') or defaut.get('modified')
+    if version is not None and os.path.exists(chemin_brut) and os.path.exists(chemin_version):
+        with open(chemin_version, encoding='utf-8') as f:
+            if f.read() == version:
+                return False
+
+    contenu = export_dataset_to_csv(spec['dataset_id'])
+    if contenu is None:
+        if os.path.exists(chemin_brut):
+            print(f"Export de {spec['dataset_id']} impossible : réutilisation du fichier existant")
+            return False
+        raise ValueError(f"Impossible de récupérer le jeu {spec['dataset_id']}")
+    with open(chemin_brut + '.tmp', 'wb') as f:
+        f.write(contenu)
+    os.replace(chemin_brut + '.tmp', chemin_brut)
+    if version is not None:
+        with open(chemin_version, 'w', encoding='utf-8') as f:
+            f.write(version)
+    return True
+
+
+def clean(chemin_brut, spec):
+    """
+    Lit le CSV brut, harmonise les noms de colonnes et remplace les valeurs manquantes des colonnes
+    numériques par leur moyenne (fillna_with_mean de Preprocessing 1.py).
+    """
+    df = pd.read_csv(chemin_brut, sep=';', low_memory=False)
+    df = df.rename(columns=spec['renommage']).dropna(how='all')
+    colonnes = [c for c in spec['colonnes_numeriques'] if c in df.columns]
+    for colonne in colonnes:
+        df[colonne] = pd.to_numeric(df[colonne], errors='coerce')
+    return preprocessing.fillna_with_mean(df, colonnes)
+
+
+def reshape(df, spec):
+    """Série horaire régulière : index datetime UTC trié, moyenne des pas infra-horaires, colonnes numériques."""
+    colonnes = [c for c in spec['colonnes_numeriques'] if c in df.columns]
+    dates = pd.to_datetime(df[spec['colonne_date']], errors='coerce', utc=True)
+    horaire = df[colonnes].set_index(dates.rename('Date_Heure'))
+    horaire = horaire[horaire.index.notna()].sort_index()
+    return horaire.resample('h').mean()
+
+
+def aggregate(horaire, spec):
+    """Moyennes journalières, mensuelles et annuelles de la consommation."""
+    valeur = horaire[spec['colonne_valeur']]
+    return {
+        'journalier': valeur.resample('D').mean().dropna().to_frame(),
+        'mensuel': valeur.resample('MS').mean().dropna().to_frame(),
+        'annuel': valeur.groupby(valeur.index.year).mean().rename_axis('annee').to_frame(),
+    }
+
+
+def features(agregats, spec, repertoire=None):
+    """
+    Matrice de variables (calendrier, grèves, retards) de la consommation journalière sur une grille
+    régulière (feature_matrix.py). Avec `repertoire`, la matrice y est mise en cache et seuls les jours
+    ajoutés depuis l'exécution précédente sont calculés.
+    """
+    journalier = agregats['journalier'][spec['colonne_valeur']].asfreq('D')
+    greves = feature_matrix.strike_days() if os.path.exists(feature_matrix.CHEMIN_GREVES) else None
+    if repertoire is None:
+        matrice = feature_matrix.build_features(journalier, greves)
+    else:
+        matrice = feature_matrix.FeatureStore(os.path.join(repertoire, 'features')).update(journalier, greves)
+    return {'journalier': journalier, 'matrice': matrice}
+
+
+def forecast(variables, spec):
+    """Prévision ARIMA de la consommation journalière, exogènes calendaires tirés de la matrice de variables."""
+    journalier = variables['journalier']
+    prevision = forecast_arima(pd.DataFrame({'consommation': journalier.to_numpy()}),
+                               order=ORDRE_ARIMA, steps=HORIZON_PREVISION, features=variables['matrice'])
+    dates = pd.date_range(journalier.index[-1] + pd.Timedelta(days=1), periods=HORIZON_PREVISION, freq='D')
+    return pd.DataFrame({'prevision': prevision.to_numpy()}, index=dates.rename('date'))
+
+
+""" Fonctions (ou modules entiers) dont le code entre dans l'empreinte de chaque étape """
+CODE_ETAPES = {
+    'clean': (clean, preprocessing.fillna_with_mean),
+    'reshape': (reshape,),
+    'aggregate': (aggregate,),
+    # Tout feature_matrix : jours fériés, Pâques, variables et cache (FeatureStore.update) compris
+    'features': (features, feature_matrix),
+    'forecast': (forecast, forecast_arima),
+}
+
+""" Fichiers lus par une étape en plus de son entrée : leur contenu (ou leur absence) entre dans l'empreinte """
+FICHIERS_ETAPES = {
+    'features': (feature_matrix.CHEMIN_GREVES,),
+}
+
+
+def _exports(nom, etape, resultat, output_dir):
+    """Écrit les résultats exportés de l'étape (CSV) et retourne leurs chemins."""
+    if etape == 'aggregate':
+        chemins = []
+        for niveau, frame in resultat.items():
+            chemin = os.path.join(output_dir, f"{nom}_{niveau}.csv")
+            frame.to_csv(chemin)
+            chemins.append(chemin)
+        return chemins
+    if etape == 'forecast':
+        chemin = os.path.join(output_dir, f"{nom}_prevision.csv")
+        resultat.to_csv(chemin)
+        return [chemin]
+    return []
+
+
+def run_dataset(nom, work_dir, output_dir, source=None, until='forecast', force=False):
+    """
+    Exécute les étapes d'un jeu de données en sautant celles dont l'empreinte n'a pas changé.
+
+    Args:
+    - nom : str : Nom du jeu (clé de DATASETS).
+    - work_dir : str : Répertoire des résultats intermédiaires et du manifeste.
+    - output_dir : str : Répertoire des CSV exportés (agrégats, prévision).
+    - source : str : Fichier local remplaçant l'export ODRE.
+    - until : str : Dernière étape à exécuter.
+    - force : bool : Recalcule toutes les étapes.
+
+    Returns:
+    - dict : Pour chaque étape, 'execute' ou 'cache' et la durée en secondes.
+    """
+    spec = DATASETS[nom]
+    repertoire = os.path.join(work_dir, nom)
+    os.makedirs(repertoire, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
+    chemin_manifeste = os.path.join(repertoire, 'manifest.json')
+    manifeste = {}
+    if os.path.exists(chemin_manifeste) and not force:
+        with open(chemin_manifeste, encoding='utf-8') as f:
+            manifeste = json.load(f)
+
+    rapport = {}
+    debut = time.perf_counter()
+    chemin_brut = os.path.join(repertoire, 'brut.csv')
+    telecharge = fetch(spec, chemin_brut, source)
+    cle = file_hash(chemin_brut)
+    rapport['fetch'] = {'statut': 'execute' if telecharge else 'cache',
+                        'duree_s': time.perf_counter() - debut, 'empreinte': cle}
+
+    resultat = None
+    for etape in ETAPES[1:ETAPES.index(until) + 1]:
+        debut = time.perf_counter()
+        code = ''.join(inspect.getsource(f) for f in CODE_ETAPES[etape])
+        fichiers = [file_hash(c) if os.path.exists(c) else None for c in FICHIERS_ETAPES.get(etape, ())]
+        cle = _empreinte(etape, cle, code, spec, fichiers)
+        chemin = os.path.join(repertoire, f"{etape}.pkl")
+        precedent = manifeste.get(etape, {})
+        exports_presents = all(os.path.exists(c) for c in precedent.get('exports', []))
+        if precedent.get('empreinte') == cle and os.path.exists(chemin) and exports_presents:
+            # Résultat à jour : il n'est relu que si l'étape suivante doit être recalculée
+            resultat = None
+            rapport[etape] = {'statut': 'cache', 'duree_s': time.perf_counter() - debut, 'empreinte': cle}
+            continue
+        if resultat is None:
+            if etape == 'clean':
+                entree = chemin_brut
+            else:
+                with open(os.path.join(repertoire, f"{ETAPES[ETAPES.index(etape) - 1]}.pkl"), 'rb') as f:
+                    entree = pickle.load(f)
+        else:
+            entree = resultat
+        if etape == 'features':
+            resultat = features(entree, spec, repertoire)
+        else:
+            resultat = globals()[etape](entree, spec)
+        with open(chemin + '.tmp', 'wb') as f:
+            pickle.dump(resultat, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(chemin + '.tmp', chemin)
+        manifeste[etape] = {'empreinte': cle, 'exports': _exports(nom, etape, resultat, output_dir)}
+        with open(chemin_manifeste, 'w', encoding='utf-8') as f:
+            json.dump(manifeste, f, indent=2)
+        rapport[etape] = {'statut': 'execute', 'duree_s': time.perf_counter() - debut, 'empreinte': cle}
+    return rapport
+
+
+def run(noms, work_dir, output_dir, sources=None, until='forecast', force=False, n_jobs=None):
+    """
+    Exécute le pipeline sur plusieurs jeux, en parallèle (un processus par jeu).
+
+    Returns:
+    - dict : Le rapport de run_dataset de chaque jeu.
+    """
+    sources = sources or {}
+    for nom in noms:
+        if nom not in DATASETS:
+            raise ValueError(f"Jeu inconnu : {nom} (disponibles : {', '.join(DATASETS)})")
+    n_jobs = min(len(noms), n_jobs or os.cpu_count() or 1)
+    arguments = [(nom, work_dir, output_dir, sources.get(nom), until, force) for nom in noms]
+    if n_jobs == 1:
+        return {nom: run_dataset(*args) for nom, args in zip(noms, arguments)}
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        futures = {nom: executor.submit(run_dataset, *args) for nom, args in zip(noms, arguments)}
+        return {nom: future.result() for nom, future in futures.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline batch fetch → clean → reshape → aggregate → features → forecast")
+    parser.add_argument('--datasets', nargs='+', default=list(DATASETS), choices=list(DATASETS))
+    parser.add_argument('--source', action='append', default=[], metavar='JEU=CHEMIN',
+                        help="Fichier CSV local à utiliser à la place de l'export ODRE")
+    parser.add_argument('--work-dir', default=os.path.join(REPERTOIRE, '.pipeline'))
+    parser.add_argument('--output-dir', default=os.path.join(REPERTOIRE, 'exports'))
+    parser.add_argument('--until', default='forecast', choices=ETAPES)
+    parser.add_argument('--jobs', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help="Recalcule toutes les étapes")
+    args = parser.parse_args()
+
+    sources = {}
+    for valeur in args.source:
+        nom, _, chemin = valeur.partition('=')
+        if not chemin:
+            parser.error(f"--source attend JEU=CHEMIN, reçu : {valeur}")
+        sources[nom] = os.path.abspath(chemin)
+
+    rapports = run(args.datasets, args.work_dir, args.output_dir, sources, args.until, args.force, args.jobs)
+    for nom, rapport in rapports.items():
+        for etape, info in rapport.items():
+            print(f"[{nom}] {etape:<9} {info['statut']:<8} {info['duree_s']:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
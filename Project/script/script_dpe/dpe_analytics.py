@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from dpe_loader import DPE_CLASSES, load_dpe
+
+""" Colonnes DPE utilisées par les agrégats (noms du format résidentiel) """
+COLONNES_AGREGATS = ['tv016_departement_code', 'code_insee_commune_actualise', 'annee_construction',
+                     'consommation_energie', 'classe_consommation_energie', 'estimation_ges',
+                     'classe_estimation_ges']
+
+""" Dimensions d'agrégation disponibles et colonne source correspondante """
+DIMENSIONS = {
+    'departement': 'tv016_departement_code',
+    'commune': 'code_insee_commune_actualise',
+    'periode': 'periode_construction',
+}
+
+""" Colonnes d'étiquette selon l'indicateur demandé """
+CLASSES = {
+    'energie': 'classe_consommation_energie',
+    'ges': 'classe_estimation_ges',
+}
+
+""" Périodes de construction du DPE (identiques à la colonne Période_construction des DPE tertiaires) """
+PERIODES_CONSTRUCTION = ['avant 1948', '1948-1974', '1975-1977', '1978-1982', '1983-1988', '1989-2000',
+                         '2001-2005', '2006-2012', '2013-2021', 'après 2021']
+BORNES_PERIODES = [-np.inf, 1947, 1974, 1977, 1982, 1988, 2000, 2005, 2012, 2021, np.inf]
+
+""" Histogramme de consommation (kWhep/m²/an) servant au calcul incrémental des médianes """
+LARGEUR_BIN = 2.0
+NB_BINS = 750
+
+FICHIER_MANIFESTE = 'manifest.json'
+
+""" Taille des blocs (début et fin de la partie déjà lue) comparés pour reconnaître un export complété par ajout """
+TAILLE_EMPREINTE = 1 << 16
+
+
+def _prefix_hash(csv_path, taille):
+    """Empreinte des TAILLE_EMPREINTE premiers et derniers octets des `taille` premiers octets du fichier."""
+    h = hashlib.sha256()
+    with open(csv_path, 'rb') as f:
+        h.update(f.read(min(taille, TAILLE_EMPREINTE)))
+        f.seek(max(taille - TAILLE_EMPREINTE, 0))
+        h.update(f.read(taille - f.tell()))
+    return h.hexdigest()
+
+
+def _ends_with_newline(csv_path, taille):
+    with open(csv_path, 'rb') as f:
+        f.seek(taille - 1)
+        return f.read(1) == b'\n'
+
+
+def periode_construction(df):
+    """
+    Calcule la période de construction de chaque certificat.
+
+    L'année de construction est découpée selon les périodes du DPE ; à défaut, la colonne
+    'Période_construction' des DPE tertiaires est utilisée.
+
+    Args:
+    - df : DataFrame : Certificats DPE.
+
+    Returns:
+    - Series : Période de construction (catégorie ordonnée).
+    """
+    dtype = pd.CategoricalDtype(PERIODES_CONSTRUCTION, ordered=True)
+    if 'annee_construction' in df.columns:
+        annees = df['annee_construction'].astype('float64')
+        periode = pd.cut(annees, BORNES_PERIODES, labels=PERIODES_CONSTRUCTION).astype(dtype)
+    else:
+        periode = pd.Series(pd.Categorical([None] * len(df), dtype=dtype), index=df.index)
+    if 'Période_construction' in df.columns:
+        periode = periode.fillna(df['Période_construction'].astype(str).astype(dtype))
+    return periode
+
+
+class DPEAggregates:
+    """
+    Agrégats matérialisés des certificats DPE par département, commune et période de construction.
+
+    Les agrégats sont additifs (effectifs par étiquette, histogramme de consommation) : l'arrivée
+    de nouveaux certificats se traduit par une addition, sans relecture des certificats déjà traités.
+    Les requêtes du tableau de bord sont servies à partir de ces agrégats.
+    """
+
+    def __init__(self):
+        # {(dimension, indicateur): DataFrame clé x étiquettes A..G}
+        self.distributions = {}
+        # {dimension: Series d'effectifs indexée par (clé, bin)}
+        self.histogrammes = {}
+        # Fichiers déjà intégrés : {chemin: {'size', 'mtime_ns', 'rows', 'empreinte'}}
+        self.manifest = {}
+
+    def update(self, df):
+        """
+        Intègre un lot de nouveaux certificats dans les agrégats.
+
+        Args:
+        - df : DataFrame : Certificats DPE (format résidentiel ou tertiaire harmonisé).
+
+        Returns:
+        - int : Nombre de certificats intégrés.
+        """
+        if len(df) == 0:
+            return 0
+        df = df.assign(periode_construction=periode_construction(df))
+        consommation = pd.to_numeric(df.get('consommation_energie'), errors='coerce')
+        bins = np.clip(np.floor(consommation.to_numpy(dtype='float64') / LARGEUR_BIN), 0, NB_BINS - 1)
+
+        for dimension, colonne in DIMENSIONS.items():
+            if colonne not in df.columns:
+                continue
+            cle = df[colonne]
+            for indicateur, colonne_classe in CLASSES.items():
+                if colonne_classe not in df.columns:
+                    continue
+                effectifs = (pd.crosstab(cle, df[colonne_classe])
+                             .reindex(columns=DPE_CLASSES, fill_value=0))
+                effectifs.columns = effectifs.columns.astype(str)
+                effectifs.index = effectifs.index.astype(str)
+                self._add_distribution((dimension, indicateur), effectifs)
+
+            valide = ~np.isnan(bins) & cle.notna().to_numpy()
+            histogramme = (pd.DataFrame({'cle': cle[valide].astype(str).to_numpy(),
+                                         'bin': bins[valide].astype('int32')})
+                           .groupby(['cle', 'bin']).size())
+            ancien = self.histogrammes.get(dimension)
+            self.histogrammes[dimension] = (histogramme if ancien is None
+                                            else ancien.add(histogramme, fill_value=0).astype('int64'))
+        return len(df)
+
+    def _add_distribution(self, cle, effectifs):
+        ancien = self.distributions.get(cle)
+        if ancien is None:
+            self.distributions[cle] = effectifs.astype('int64')
+        else:
+            self.distributions[cle] = ancien.add(effectifs, fill_value=0).astype('int64')
+
+    def refresh(self, csv_paths):
+        """
+        Intègre les fichiers DPE nouveaux ou complétés depuis le dernier rafraîchissement.
+
+        Un fichier déjà présent dans le manifeste avec la même taille et la même date de
+        modification est ignoré. Un fichier qui a grandi par ajout de lignes (partie déjà lue
+        inchangée) n'est lu qu'à partir de la taille enregistrée : seuls les certificats ajoutés
+        sont intégrés. Toute autre modification est refusée (ValueError), les certificats ne
+        pouvant pas être retirés des agrégats : un export réécrit doit être fourni sous un
+        nouveau chemin, ou les agrégats reconstruits.
+
+        Args:
+        - csv_paths : list : Chemins des exports DPE.
+
+        Returns:
+        - list : Les fichiers effectivement intégrés (en tout ou en partie).
+        """
+        integres = []
+        for csv_path in csv_paths:
+            chemin = os.path.abspath(csv_path)
+            stat = os.stat(chemin)
+            signature = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+            deja_vu = self.manifest.get(chemin)
+            if deja_vu and all(deja_vu.get(k) == v for k, v in signature.items()):
+                continue
+            offset = None
+            if deja_vu:
+                lu = deja_vu['size']
+                if (stat.st_size < lu or deja_vu.get('empreinte') != _prefix_hash(chemin, lu)
+                        or not _ends_with_newline(chemin, lu)):
+                    raise ValueError(f"Export déjà intégré modifié autrement que par ajout de lignes : {chemin} "
+                                     "(fournir un nouvel export ou reconstruire les agrégats)")
+                offset = lu
+            df = load_dpe(chemin, harmonise=True, offset=offset)
+            df = df[[c for c in COLONNES_AGREGATS + ['Période_construction'] if c in df.columns]]
+            signature['rows'] = self.update(df) + (deja_vu['rows'] if deja_vu else 0)
+            signature['empreinte'] = _prefix_hash(chemin, stat.st_size)
+            self.manifest[chemin] = signature
+            integres.append(chemin)
+        return integres
+
+    def distribution(self, dimension='departement', indicateur='energie', keys=None, normalise=False):
+        """
+        Répartition des certificats par étiquette pour une dimension donnée.
+
+        Args:
+        - dimension : str : 'departement', 'commune' ou 'periode'.
+        - indicateur : str : 'energie' ou 'ges'.
+        - keys : list : Restreindre à certaines clés (codes département, codes INSEE, périodes).
+        - normalise : bool : Retourner des parts plutôt que des effectifs.
+
+        Returns:
+        - DataFrame : Une ligne par clé, une colonne par étiquette A..G.
+        """
+        if dimension not in DIMENSIONS or indicateur not in CLASSES:
+            raise ValueError(f"Agrégat inconnu : {dimension}/{indicateur}")
+        effectifs = self.distributions.get((dimension, indicateur),
+                                           pd.DataFrame(columns=DPE_CLASSES, dtype='int64'))
+        if keys is not None:
+            effectifs = effectifs.reindex([str(k) for k in keys], fill_value=0)
+        elif dimension == 'periode':
+            effectifs = effectifs.reindex([p for p in PERIODES_CONSTRUCTION if p in effectifs.index])
+        if normalise:
+            return effectifs.div(effectifs.sum(axis=1).replace(0, np.nan), axis=0)
+        return effectifs
+
+    def median_consumption(self, dimension='departement', keys=None):
+        """
+        Médiane de la consommation d'énergie (kWhep/m²/an) par clé, interpolée sur l'histogramme.
+
+        Args:
+        - dimension : str : 'departement', 'commune' ou 'periode'.
+        - keys : list : Restreindre à certaines clés.
+
+        Returns:
+        - DataFrame : Colonnes 'mediane' et 'effectif', indexé par clé.
+        """
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Dimension inconnue : {dimension}")
+        histogramme = self.histogrammes.get(dimension)
+        if histogramme is None or len(histogramme) == 0:
+            return pd.DataFrame(columns=['mediane', 'effectif'])
+        if keys is not None:
+            histogramme = histogramme[histogramme.index.get_level_values('cle').isin([str(k) for k in keys])]
+
+        h = histogramme.sort_index().rename('n').reset_index()
+        h['cumul'] = h.groupby('cle')['n'].cumsum()
+        h['effectif'] = h.groupby('cle')['n'].transform('sum')
+        moitie = h['effectif'] / 2
+        # Premier bin de chaque clé où l'effectif cumulé atteint la moitié
+        median_bin = h[h['cumul'] >= moitie].groupby('cle').head(1)
+        avant = median_bin['cumul'] - median_bin['n']
+        mediane = (median_bin['bin'] + (median_bin['effectif'] / 2 - avant) / median_bin['n']) * LARGEUR_BIN
+        return pd.DataFrame({'mediane': mediane.to_numpy(), 'effectif': median_bin['effectif'].to_numpy()},
+                            index=pd.Index(median_bin['cle'].to_numpy(), name='cle'))
+
+    def save(self, directory):
+        """Enregistre les agrégats et le manifeste dans un répertoire."""
+        os.makedirs(directory, exist_ok=True)
+        for (dimension, indicateur), effectifs in self.distributions.items():
+            effectifs.to_pickle(os.path.join(directory, f"classes_{dimension}_{indicateur}.pkl"))
+        for dimension, histogramme in self.histogrammes.items():
+            histogramme.to_pickle(os.path.join(directory, f"histogramme_{dimension}.pkl"))
+        with open(os.path.join(directory, FICHIER_MANIFESTE), 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory):
+        """Recharge des agrégats enregistrés avec save (agrégats vides si le répertoire n'existe pas)."""
+        agregats = cls()
+        if not os.path.isdir(directory):
+            return agregats
+        for dimension in DIMENSIONS:
+            for indicateur in CLASSES:
+                chemin = os.path.join(directory, f"classes_{dimension}_{indicateur}.pkl")
+                if os.path.exists(chemin):
+                    agregats.distributions[(dimension, indicateur)] = pd.read_pickle(chemin)
+            chemin = os.path.join(directory, f"histogramme_{dimension}.pkl")
+            if os.path.exists(chemin):
+                agregats.histogrammes[dimension] = pd.read_pickle(chemin)
+        chemin = os.path.join(directory, FICHIER_MANIFESTE)
+        if os.path.exists(chemin):
+            with open(chemin, encoding='utf-8') as f:
+                agregats.manifest = json.load(f)
+        return agregats
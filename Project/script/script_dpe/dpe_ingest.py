@@ -0,0 +1,294 @@
+"""
+Ingestion parallèle d'exports DPE (résidentiels et tertiaires) vers un jeu partitionné.
+
+Chaque fichier est découpé en plages d'octets alignées sur des fins de ligne situées hors des champs
+entre guillemets ; chaque plage est analysée par un processus distinct avec le chargeur typé de
+dpe_loader et devient une partition du jeu. Le manifeste liste les partitions dans l'ordre des
+fichiers (triés) puis des plages : l'ordre des lignes relues ne dépend pas du nombre de processus.
+
+Exemples :
+    python dpe_ingest.py ../../data/DPE_Logements/dpe-france.csv ../../data/donnée_batiments/dpe-v2-tertiaire-2.csv
+    python dpe_ingest.py exports/*.csv --output-dir dpe_dataset --jobs 8 --chunk-size 32M
+"""
+import argparse
+import io
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from dpe_loader import (CLASSE_DTYPE, COLONNES_HARMONISEES, FORMATS_DPE, convert_types, detect_format,
+                        harmonise_colonnes, read_options)
+
+""" Taille maximale d'une plage analysée par un processus, et taille minimale en découpage automatique """
+TAILLE_PLAGE = 64 << 20
+TAILLE_PLAGE_MIN = 1 << 20
+
+""" Taille des blocs lus pour repérer les fins de ligne """
+TAILLE_BLOC = 1 << 20
+
+FICHIER_MANIFESTE = 'manifest.json'
+
+
+def parse_size(taille):
+    """Convertit '512K', '32M', '1G' ou un entier en nombre d'octets."""
+    if isinstance(taille, int):
+        return taille
+    multiplicateurs = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    if taille[-1].upper() in multiplicateurs:
+        return int(float(taille[:-1]) * multiplicateurs[taille[-1].upper()])
+    return int(taille)
+
+
+def split_ranges(csv_path, taille_plage=TAILLE_PLAGE):
+    """
+    Découpe un fichier en plages d'environ `taille_plage` octets finissant chacune par une fin de ligne.
+
+    Les guillemets sont comptés au fil de la lecture : une fin de ligne n'est une coupure possible
+    que si elle est hors d'un champ entre guillemets (les adresses peuvent contenir des retours à
+    la ligne).
+
+    Args:
+    - csv_path : str : Chemin du fichier CSV.
+    - taille_plage : int : Taille visée des plages, en octets.
+
+    Returns:
+    - bytes : L'en-tête (première ligne, fin de ligne comprise).
+    - list : Les plages (début, fin) de données, en octets.
+    """
+    taille = os.path.getsize(csv_path)
+    coupures = []
+    cible = 0
+    pair = True
+    position = 0
+    with open(csv_path, 'rb') as f:
+        while True:
+            bloc = f.read(TAILLE_BLOC)
+            if not bloc:
+                break
+            # La parité des guillemets est connue jusqu'à l'indice `lu` du bloc
+            lu = 0
+            while True:
+                depart = max(cible - position, lu)
+                fin_ligne = bloc.find(b'\n', depart) if depart < len(bloc) else -1
+                if fin_ligne < 0:
+                    break
+                if bloc.count(b'"', lu, fin_ligne + 1) % 2:
+                    pair = not pair
+                lu = fin_ligne + 1
+                if pair:
+                    coupures.append(position + lu)
+                    cible = position + lu + taille_plage
+            if bloc.count(b'"', lu) % 2:
+                pair = not pair
+            position += len(bloc)
+        if not coupures:
+            f.seek(0)
+            return f.read(), []
+        f.seek(0)
+        entete = f.read(coupures[0])
+
+    bornes = coupures + ([taille] if coupures[-1] < taille else [])
+    return entete, list(zip(bornes[:-1], bornes[1:]))
+
+
+def parse_range(tache):
+    """
+    Analyse une plage d'octets (précédée de l'en-tête du fichier) et l'écrit comme partition.
+
+    Args:
+    - tache : dict : Fichier, plage, en-tête, format, encodage, colonnes, harmonisation et partition.
+
+    Returns:
+    - dict : Description de la partition (lignes, colonnes, modalités des catégories).
+    """
+    with open(tache['source'], 'rb') as f:
+        f.seek(tache['debut'])
+        donnees = f.read(tache['fin'] - tache['debut'])
+    spec = FORMATS_DPE[tache['format']]
+    options = read_options(spec, tache['encodage'], tache['colonnes'])
+    # Les colonnes sans type déclaré sont lues en texte : le type inféré sur une seule plage pourrait
+    # différer d'une plage à l'autre ; on signale seulement celles qui sont entièrement numériques
+    types_declares = set(options['dtype'])
+    options['dtype'] = defaultdict(lambda: 'str', options['dtype'])
+    df = pd.read_csv(io.BytesIO(tache['entete'] + donnees), **options)
+    df = convert_types(df, spec)
+    numeriques = [colonne for colonne in df.columns if colonne not in types_declares
+                  and pd.to_numeric(df[colonne], errors='coerce').count() == df[colonne].count()]
+    if tache['harmonise'] and tache['format'] == 'tertiaire':
+        df = harmonise_colonnes(df)
+        numeriques = [COLONNES_HARMONISEES.get(colonne, colonne) for colonne in numeriques]
+
+    _write_partition(df, tache['partition'])
+    categories = {colonne: df[colonne].cat.categories.tolist() for colonne in df.columns
+                  if isinstance(df[colonne].dtype, pd.CategoricalDtype) and df[colonne].dtype != CLASSE_DTYPE}
+    return {'fichier': os.path.basename(tache['partition']), 'source': tache['source'], 'debut': tache['debut'],
+            'fin': tache['fin'], 'lignes': len(df), 'colonnes': df.columns.tolist(), 'categories': categories,
+            'numeriques': numeriques}
+
+
+def convert_numeric(tache):
+    """Convertit en nombres les colonnes texte numériques dans toutes les partitions, et réécrit la partition."""
+    chemin, colonnes = tache
+    df = pd.read_pickle(chemin, compression=None)
+    for colonne in colonnes:
+        df[colonne] = pd.to_numeric(df[colonne])
+    _write_partition(df, chemin)
+
+
+def _write_partition(df, chemin):
+    df.to_pickle(chemin + '.tmp', compression=None)
+    os.replace(chemin + '.tmp', chemin)
+
+
+def ingest(csv_paths, directory, jobs=None, taille_plage=None, columns=None, harmonise=True):
+    """
+    Ingère un ou plusieurs exports DPE dans un jeu partitionné (une partition pickle par plage).
+
+    Args:
+    - csv_paths : list : Fichiers DPE (résidentiels et/ou tertiaires).
+    - directory : str : Répertoire du jeu (remplacé).
+    - jobs : int : Nombre de processus (nombre de cœurs par défaut).
+    - taille_plage : int : Taille des plages en octets (par défaut, de quoi occuper tous les processus).
+    - columns : list : Colonnes à charger (toutes par défaut).
+    - harmonise : bool : Renommer les colonnes tertiaires avec les noms du format résidentiel.
+
+    Returns:
+    - dict : Le manifeste du jeu.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    csv_paths = sorted(os.path.abspath(chemin) for chemin in csv_paths)
+    total = sum(os.path.getsize(chemin) for chemin in csv_paths)
+    if taille_plage is None:
+        taille_plage = min(TAILLE_PLAGE, max(TAILLE_PLAGE_MIN, total // (2 * jobs) + 1))
+
+    os.makedirs(directory, exist_ok=True)
+    for ancien in os.listdir(directory):
+        if ancien.startswith('part-') or ancien == FICHIER_MANIFESTE:
+            os.remove(os.path.join(directory, ancien))
+
+    fichiers = []
+    taches = []
+    for i, chemin in enumerate(csv_paths):
+        nom_format, encodage = detect_format(chemin)
+        entete, plages = split_ranges(chemin, taille_plage)
+        info = os.stat(chemin)
+        fichiers.append({'chemin': chemin, 'format': nom_format, 'encodage': encodage, 'taille': info.st_size,
+                         'mtime_ns': info.st_mtime_ns, 'plages': len(plages)})
+        for j, (debut, fin) in enumerate(plages):
+            taches.append({'source': chemin, 'debut': debut, 'fin': fin, 'entete': entete, 'format': nom_format,
+                           'encodage': encodage, 'colonnes': columns, 'harmonise': harmonise,
+                           'partition': os.path.join(directory, f"part-{i:04d}-{j:05d}.pkl")})
+
+    # map conserve l'ordre des tâches, quel que soit l'ordre de fin des processus
+    executeur = ProcessPoolExecutor(max_workers=min(jobs, len(taches))) if jobs > 1 and len(taches) > 1 else None
+    try:
+        executer = map if executeur is None else executeur.map
+        partitions = list(executer(parse_range, taches))
+
+        colonnes = []
+        categories = {}
+        numeriques = set()
+        texte = set()
+        for partition in partitions:
+            colonnes.extend(colonne for colonne in partition['colonnes'] if colonne not in colonnes)
+            for colonne, modalites in partition.pop('categories').items():
+                categories.setdefault(colonne, set()).update(modalites)
+            numeriques.update(partition['numeriques'])
+            texte.update(set(partition['colonnes']) - set(partition.pop('numeriques')))
+        # Colonnes numériques dans toutes les partitions qui les contiennent : même type que pour une
+        # lecture du fichier entier
+        numeriques -= texte
+        conversions = [(os.path.join(directory, partition['fichier']),
+                        [colonne for colonne in partition['colonnes'] if colonne in numeriques])
+                       for partition in partitions]
+        conversions = [conversion for conversion in conversions if conversion[1]]
+        if conversions:
+            list(executer(convert_numeric, conversions))
+        for partition in partitions:
+            del partition['colonnes']
+    finally:
+        if executeur is not None:
+            executeur.shutdown()
+
+    manifeste = {'fichiers': fichiers, 'partitions': partitions, 'colonnes': colonnes,
+                 'categories': {colonne: sorted(modalites, key=str) for colonne, modalites in categories.items()},
+                 'lignes': sum(partition['lignes'] for partition in partitions)}
+    chemin = os.path.join(directory, FICHIER_MANIFESTE)
+    with open(chemin + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifeste, f, ensure_ascii=False, indent=2)
+    os.replace(chemin + '.tmp', chemin)
+    return manifeste
+
+
+def _load_manifest(directory):
+    with open(os.path.join(directory, FICHIER_MANIFESTE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def iter_dataset(directory, columns=None):
+    """
+    Parcourt les partitions d'un jeu dans l'ordre du manifeste (ex. pour DPEAggregates.update).
+
+    Les catégories de toutes les partitions partagent les mêmes modalités.
+    """
+    manifeste = _load_manifest(directory)
+    for partition in manifeste['partitions']:
+        df = pd.read_pickle(os.path.join(directory, partition['fichier']), compression=None)
+        if columns is not None:
+            df = df[[colonne for colonne in columns if colonne in df.columns]]
+        for colonne, modalites in manifeste['categories'].items():
+            if colonne in df.columns:
+                df[colonne] = df[colonne].cat.set_categories(modalites)
+        yield df
+
+
+def read_dataset(directory, columns=None):
+    """
+    Relit un jeu partitionné en un seul DataFrame, lignes dans l'ordre des fichiers et des plages.
+
+    Args:
+    - directory : str : Répertoire du jeu.
+    - columns : list : Colonnes à relire (toutes par défaut).
+
+    Returns:
+    - df : DataFrame : Les certificats DPE typés.
+    """
+    manifeste = _load_manifest(directory)
+    colonnes = [colonne for colonne in manifeste['colonnes'] if columns is None or colonne in columns]
+    parties = list(iter_dataset(directory, colonnes))
+    if not parties:
+        return pd.DataFrame(columns=colonnes)
+    df = pd.concat(parties, ignore_index=True).reindex(columns=colonnes)
+    # Une colonne absente de certaines partitions (formats mélangés) perd son type à la concaténation
+    for colonne, modalites in manifeste['categories'].items():
+        if colonne in df.columns and not isinstance(df[colonne].dtype, pd.CategoricalDtype):
+            df[colonne] = df[colonne].astype(pd.CategoricalDtype(modalites))
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion parallèle d'exports DPE")
+    parser.add_argument('csv_paths', nargs='+', help="Fichiers DPE à ingérer")
+    parser.add_argument('--output-dir', default='dpe_dataset', help="Répertoire du jeu partitionné")
+    parser.add_argument('--jobs', type=int, default=None, help="Nombre de processus (cœurs par défaut)")
+    parser.add_argument('--chunk-size', default=None, help="Taille des plages (ex. 32M ; automatique par défaut)")
+    parser.add_argument('--columns', nargs='+', default=None, help="Colonnes à charger")
+    parser.add_argument('--no-harmonise', action='store_true', help="Garder les noms de colonnes tertiaires")
+    args = parser.parse_args()
+
+    debut = time.perf_counter()
+    manifeste = ingest(args.csv_paths, args.output_dir, jobs=args.jobs,
+                       taille_plage=None if args.chunk_size is None else parse_size(args.chunk_size),
+                       columns=args.columns, harmonise=not args.no_harmonise)
+    duree = time.perf_counter() - debut
+    octets = sum(fichier['taille'] for fichier in manifeste['fichiers'])
+    print(f"{manifeste['lignes']} lignes, {len(manifeste['partitions'])} partitions, "
+          f"{duree:.2f} s ({octets / 1e6 / duree:.1f} Mo/s) -> {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import datetime
+import io
+
+import numpy as np
+import pandas as pd
+
+""" Classes énergie / GES, de la meilleure (A) à la pire (G) """
+DPE_CLASSES = ["A", "B", "C", "D", "E", "F", "G"]
+CLASSE_DTYPE = pd.CategoricalDtype(DPE_CLASSES, ordered=True)
+
+""" Bornes de validité des années (les exports contiennent des valeurs comme -1 ou 7000) """
+ANNEE_MIN = 1600
+ANNEE_MAX = datetime.date.today().year + 1
+
+""" Description des deux formats d'export DPE présents dans le projet """
+FORMATS_DPE = {
+    # data/DPE_Logements/dpe-france.csv : séparateur ';', virgule décimale, dates jj/mm/aaaa
+    'residentiel': {
+        'sep': ';',
+        'decimal': ',',
+        'date_format': '%d/%m/%Y',
+        'dates': ['date_etablissement_dpe'],
+        'classes': ['classe_consommation_energie', 'classe_estimation_ges'],
+        'annees': ['annee_construction'],
+        'floats': ['consommation_energie', 'estimation_ges', 'surface_thermique_lot',
+                   'latitude', 'longitude', 'geo_score'],
+        'categories': ['nom_methode_dpe', 'version_methode_dpe', 'tr001_modele_dpe_type_libelle',
+                       'tr002_type_batiment_description', 'code_insee_commune_actualise',
+                       'tv016_departement_code'],
+    },
+    # data/donnée_batiments/dpe-v2-tertiaire-2.csv : en-têtes entre guillemets, séparateur ',', dates ISO
+    'tertiaire': {
+        'sep': ',',
+        'decimal': '.',
+        'date_format': '%Y-%m-%d',
+        'dates': ['Date_réception_DPE', 'Date_établissement_DPE', 'Date_visite_diagnostiqueur',
+                  'Date_fin_validité_DPE'],
+        'classes': ['Etiquette_DPE', 'Etiquette_GES'],
+        'annees': ['Année_construction', 'Année_relève_conso_énergie_n°1',
+                   'Année_relève_conso_énergie_n°2', 'Année_relève_conso_énergie_n°3'],
+        'floats': ['Version_DPE', 'Conso_kWhep/m²/an', 'Emission_GES_kgCO2/m²/an', 'Nombre_occupant',
+                   'Surface_(SHON)', 'Surface_utile', 'Score_BAN', 'Coordonnée_cartographique_X_(BAN)',
+                   'Coordonnée_cartographique_Y_(BAN)', 'N°_étage_appartement',
+                   'Conso_é_finale_énergie_n°1', 'Conso_é_primaire_énergie_n°1', 'Frais_annuel_énergie_n°1',
+                   'Conso_é_finale_énergie_n°2', 'Conso_é_primaire_énergie_n°2', 'Frais_annuel_énergie_n°2',
+                   'Conso_é_finale_énergie_n°3', 'Conso_é_primaire_énergie_n°3', 'Frais_annuel_énergie_n°3'],
+        'categories': ['Modèle_DPE', 'Méthode_du_DPE', 'Catégorie_ERP', 'Période_construction',
+                       'Secteur_activité', 'Type_énergie_principale_chauffage', 'Nom__commune_(BAN)',
+                       'Code_INSEE_(BAN)', 'Code_postal_(BAN)', 'Statut_géocodage', 'N°_département_(BAN)',
+                       'N°_région_(BAN)', 'Type_énergie_n°1', 'Type_usage_énergie_n°1', 'Type_énergie_n°2',
+                       'Type_usage_énergie_n°2', 'Type_énergie_n°3', 'Type_usage_énergie_n°3'],
+    },
+}
+
+""" Correspondance des colonnes tertiaires vers les noms du format résidentiel """
+COLONNES_HARMONISEES = {
+    'Date_établissement_DPE': 'date_etablissement_dpe',
+    'Conso_kWhep/m²/an': 'consommation_energie',
+    'Etiquette_DPE': 'classe_consommation_energie',
+    'Emission_GES_kgCO2/m²/an': 'estimation_ges',
+    'Etiquette_GES': 'classe_estimation_ges',
+    'Année_construction': 'annee_construction',
+    'Surface_utile': 'surface_thermique_lot',
+    'Code_INSEE_(BAN)': 'code_insee_commune_actualise',
+    'N°_département_(BAN)': 'tv016_departement_code',
+    'Adresse_(BAN)': 'geo_adresse',
+    'Score_BAN': 'geo_score',
+}
+
+
+def detect_format(csv_path, sample_size=65536):
+    """
+    Détecte le format d'export DPE et l'encodage d'un fichier à partir de ses premiers octets.
+
+    Args:
+    - csv_path : str : Chemin du fichier CSV.
+    - sample_size : int : Nombre d'octets lus pour la détection.
+
+    Returns:
+    - (str, str) : Le nom du format ('residentiel' ou 'tertiaire') et l'encodage à utiliser.
+    """
+    with open(csv_path, 'rb') as f:
+        sample = f.read(sample_size)
+
+    if sample.startswith(b'\xef\xbb\xbf'):
+        encoding = 'utf-8-sig'
+    else:
+        try:
+            sample.decode('utf-8')
+            encoding = 'utf-8'
+        except UnicodeDecodeError as e:
+            # Un échantillon tronqué peut couper un caractère multi-octets en fin de buffer ;
+            # sinon il s'agit d'un export ADEME historique, encodé en page de code DOS (cp850)
+            tronque = len(sample) == sample_size and e.start >= len(sample) - 3
+            encoding = 'utf-8' if tronque else 'cp850'
+
+    header = sample.split(b'\n', 1)[0]
+    nom_format = 'residentiel' if header.count(b';') > header.count(b',') else 'tertiaire'
+    return nom_format, encoding
+
+
+def _encode_classes(serie):
+    """Convertit une colonne catégorielle d'étiquettes en catégorie ordonnée A < ... < G."""
+    categories = serie.cat.categories.astype(str).str.strip().str.upper()
+    # Travail sur les codes : une seule passe sur les modalités, pas sur les lignes
+    # (le -1 ajouté en fin de table absorbe les codes manquants, qui valent -1)
+    correspondance = np.append(pd.Index(DPE_CLASSES).get_indexer(categories), -1)
+    nouveaux_codes = correspondance[serie.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(nouveaux_codes, dtype=CLASSE_DTYPE), index=serie.index,
+                     name=serie.name)
+
+
+def _encode_annees(serie):
+    """Passe une colonne d'années en entier compact, les valeurs aberrantes devenant manquantes."""
+    serie = serie.where((serie >= ANNEE_MIN) & (serie <= ANNEE_MAX))
+    return serie.round().astype('Int16')
+
+
+def read_options(spec, encoding, columns=None):
+    """
+    Options de pd.read_csv pour un format DPE : séparateurs et types compacts par colonne.
+
+    Args:
+    - spec : dict : Format d'export (voir FORMATS_DPE).
+    - encoding : str : Encodage du fichier.
+    - columns : list : Colonnes à charger (toutes par défaut).
+
+    Returns:
+    - dict : Arguments nommés de pd.read_csv.
+    """
+    dtypes = {}
+    for colonne in spec['classes'] + spec['categories']:
+        dtypes[colonne] = 'category'
+    for colonne in spec['floats'] + spec['annees']:
+        dtypes[colonne] = 'float32'
+    for colonne in spec['dates']:
+        # Les dates sont très répétitives : on ne parse que les modalités distinctes
+        dtypes[colonne] = 'category'
+    if columns is not None:
+        dtypes = {colonne: dtype for colonne, dtype in dtypes.items() if colonne in columns}
+    return {'sep': spec['sep'], 'decimal': spec['decimal'], 'encoding': encoding, 'usecols': columns,
+            'dtype': dtypes, 'engine': 'c', 'low_memory': False}
+
+
+def convert_types(df, spec):
+    """Encode les étiquettes, les années et les dates d'un DPE lu avec read_options."""
+    for colonne in spec['classes']:
+        if colonne in df.columns:
+            df[colonne] = _encode_classes(df[colonne])
+    for colonne in spec['annees']:
+        if colonne in df.columns:
+            df[colonne] = _encode_annees(df[colonne])
+    for colonne in spec['dates']:
+        if colonne in df.columns:
+            modalites = pd.to_datetime(df[colonne].cat.categories, format=spec['date_format'], errors='coerce')
+            df[colonne] = modalites.take(df[colonne].cat.codes.to_numpy(), allow_fill=True, fill_value=pd.NaT)
+    return df
+
+
+def load_dpe(csv_path, columns=None, nom_format=None, encoding=None, harmonise=False, offset=None):
+    """
+    Charge un export DPE (résidentiel ou tertiaire) en un DataFrame typé et compact, en une seule lecture.
+
+    Les étiquettes énergie et GES deviennent des catégories ordonnées A < ... < G (les valeurs
+    hors barème comme 'N' deviennent manquantes), les libellés répétitifs des catégories, les
+    mesures des float32, les années des Int16 et les dates des datetime64.
+
+    Args:
+    - csv_path : str : Chemin du fichier CSV.
+    - columns : list : Colonnes à charger (toutes par défaut).
+    - nom_format : str : 'residentiel' ou 'tertiaire' (détecté automatiquement par défaut).
+    - encoding : str : Encodage du fichier (détecté automatiquement par défaut).
+    - harmonise : bool : Renommer les colonnes tertiaires avec les noms du format résidentiel.
+    - offset : int : Ne lire que les lignes commençant à cette position (octets), avec l'en-tête
+      du fichier (lignes ajoutées à un export déjà lu jusqu'à offset).
+
+    Returns:
+    - df : DataFrame : Les certificats DPE typés.
+    """
+    format_detecte, encoding_detecte = detect_format(csv_path)
+    nom_format = nom_format or format_detecte
+    encoding = encoding or encoding_detecte
+    if nom_format not in FORMATS_DPE:
+        raise ValueError(f"Format DPE inconnu : {nom_format}")
+    spec = FORMATS_DPE[nom_format]
+
+    source = csv_path
+    if offset:
+        with open(csv_path, 'rb') as f:
+            entete = f.readline()
+            f.seek(max(offset, len(entete)))
+            source = io.BytesIO(entete + f.read())
+    df = pd.read_csv(source, **read_options(spec, encoding, columns))
+    df = convert_types(df, spec)
+
+    if harmonise and nom_format == 'tertiaire':
+        df = harmonise_colonnes(df)
+    return df
+
+
+def load_dpe_residentiel(csv_path, columns=None):
+    """Charge un export DPE logements (format dpe-france.csv)."""
+    return load_dpe(csv_path, columns=columns, nom_format='residentiel')
+
+
+def load_dpe_tertiaire(csv_path, columns=None, harmonise=False):
+    """Charge un export DPE tertiaire (format dpe-v2-tertiaire)."""
+    return load_dpe(csv_path, columns=columns, nom_format='tertiaire', harmonise=harmonise)
+
+
+def harmonise_colonnes(df):
+    """
+    Renomme les colonnes d'un DPE tertiaire avec les noms du format résidentiel.
+
+    Args:
+    - df : DataFrame : DPE tertiaire chargé avec load_dpe.
+
+    Returns:
+    - df : DataFrame : Le même DataFrame avec les colonnes communes renommées.
+    """
+    return df.rename(columns={ancien: nouveau for ancien, nouveau in COLONNES_HARMONISEES.items()
+                              if ancien in df.columns})
+
+
+def memory_footprint(df):
+    """Retourne l'empreinte mémoire d'un DataFrame en Mo."""
+    return df.memory_usage(deep=True).sum() / 1e6
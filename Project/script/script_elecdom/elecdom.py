@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+
+""" Noms courts des colonnes de elecdom-donnees-de-consommation-annuelle.csv """
+COLONNES_ELECDOM = {
+    'Appareil suivi': 'appareil',
+    'ID logement': 'logement',
+    'Consommation annuelle  AN1': 'an1',
+    'Consommation annuelle AN1': 'an1',
+    'Consommation annuelle AN2': 'an2',
+    'Type': 'type',
+}
+
+""" Compteur général du logement : exclu des sommes par appareil pour ne pas compter deux fois """
+APPAREIL_GENERAL = 'Général'
+
+""" Statut de suivi d'une mesure selon les années renseignées """
+SUIVIS = ['complet', 'an1_seul', 'an2_seul', 'aucun']
+SUIVI_DTYPE = pd.CategoricalDtype(SUIVIS)
+
+""" Traitement des valeurs AN2 (ou AN1) manquantes dans les comparaisons """
+MODES_MANQUANTS = ('exclure', 'zero')
+
+
+def load_elecdom(csv_path):
+    """
+    Charge les consommations annuelles ElecDom sous forme compacte.
+
+    Les libellés d'appareils et de types deviennent des catégories, les consommations des
+    float32, et une colonne 'suivi' indique explicitement quelles années sont renseignées.
+
+    Args:
+    - csv_path : str : Chemin du fichier CSV.
+
+    Returns:
+    - df : DataFrame : Colonnes appareil, logement, an1, an2, type, suivi.
+    """
+    df = pd.read_csv(csv_path, sep=';', encoding='utf-8-sig',
+                     dtype={'Appareil suivi': 'category', 'Type': 'category', 'ID logement': 'int32',
+                            'Consommation annuelle  AN1': 'float32', 'Consommation annuelle AN1': 'float32',
+                            'Consommation annuelle AN2': 'float32'})
+    df = df.rename(columns=COLONNES_ELECDOM)
+    manquant = [c for c in ['appareil', 'logement', 'an1', 'an2'] if c not in df.columns]
+    if manquant:
+        raise ValueError(f"Colonnes ElecDom manquantes : {manquant}")
+    if 'type' not in df.columns:
+        df['type'] = pd.Categorical([None] * len(df))
+    df['suivi'] = suivi(df)
+    return df[['appareil', 'logement', 'an1', 'an2', 'type', 'suivi']]
+
+
+def suivi(df):
+    """Statut de suivi de chaque ligne : 'complet', 'an1_seul', 'an2_seul' ou 'aucun'."""
+    a1 = df['an1'].notna().to_numpy()
+    a2 = df['an2'].notna().to_numpy()
+    codes = np.select([a1 & a2, a1 & ~a2, ~a1 & a2], [0, 1, 2], default=3)
+    return pd.Categorical.from_codes(codes, dtype=SUIVI_DTYPE)
+
+
+def _paires(df, manquants):
+    """Consommations AN1/AN2 retenues pour la comparaison selon le traitement des manquants."""
+    if manquants not in MODES_MANQUANTS:
+        raise ValueError(f"Traitement des manquants inconnu : {manquants} (attendu : {MODES_MANQUANTS})")
+    an1 = df['an1'].astype('float64')
+    an2 = df['an2'].astype('float64')
+    if manquants == 'zero':
+        # Un appareil absent une année est compté comme n'ayant rien consommé
+        garde = (df['suivi'] != 'aucun').to_numpy()
+        return an1.fillna(0)[garde], an2.fillna(0)[garde], garde
+    garde = (df['suivi'] == 'complet').to_numpy()
+    return an1[garde], an2[garde], garde
+
+
+def compare_years(df, by='appareil', manquants='exclure', inclure_general=False):
+    """
+    Compare les consommations AN1 et AN2 par groupe, en opérations vectorisées.
+
+    Args:
+    - df : DataFrame : Données chargées avec load_elecdom.
+    - by : str ou list : Colonne(s) de regroupement ('appareil', 'logement', 'type', ...).
+    - manquants : str : 'exclure' ne garde que les lignes renseignées les deux années,
+      'zero' compte une année manquante comme une consommation nulle.
+    - inclure_general : bool : Garder le compteur général dans les sommes.
+
+    Returns:
+    - DataFrame : an1, an2, delta, delta_pct, nb_paires et effectifs an1_seul / an2_seul par groupe,
+      trié par delta décroissant.
+    """
+    if not inclure_general:
+        df = df[df['appareil'] != APPAREIL_GENERAL]
+    an1, an2, garde = _paires(df, manquants)
+    cles = [by] if isinstance(by, str) else list(by)
+    groupes = [df[c][garde] for c in cles]
+
+    resultat = pd.DataFrame({'an1': an1, 'an2': an2}).groupby(groupes, observed=True).agg(
+        an1=('an1', 'sum'), an2=('an2', 'sum'), nb_paires=('an1', 'size'))
+    resultat['delta'] = resultat['an2'] - resultat['an1']
+    resultat['delta_pct'] = resultat['delta'] / resultat['an1'].replace(0, np.nan) * 100
+
+    # Effectifs des lignes incomplètes, pour rendre explicite ce qui a été écarté
+    incomplets = pd.crosstab([df[c] for c in cles], df['suivi']).reindex(columns=SUIVIS, fill_value=0)
+    resultat = resultat.join(incomplets[['an1_seul', 'an2_seul']], how='outer').fillna(
+        {'an1_seul': 0, 'an2_seul': 0, 'nb_paires': 0})
+    resultat = resultat.astype({'nb_paires': 'int64', 'an1_seul': 'int64', 'an2_seul': 'int64'})
+    resultat = resultat[(resultat['nb_paires'] + resultat['an1_seul'] + resultat['an2_seul']) > 0]
+    return resultat.sort_values('delta', ascending=False)
+
+
+def appliance_shares(df, annee='an2'):
+    """
+    Part de chaque appareil dans la consommation suivie de son logement.
+
+    Args:
+    - df : DataFrame : Données chargées avec load_elecdom.
+    - annee : str : 'an1' ou 'an2'.
+
+    Returns:
+    - DataFrame : Une ligne par (logement, appareil) avec consommation et part, la part étant
+      calculée sur la somme des appareils suivis du logement (compteur général exclu).
+    """
+    if annee not in ('an1', 'an2'):
+        raise ValueError(f"Année inconnue : {annee}")
+    appareils = df[(df['appareil'] != APPAREIL_GENERAL) & df[annee].notna()]
+    conso = appareils.groupby(['logement', 'appareil'], observed=True)[annee].sum().rename('consommation')
+    total = conso.groupby(level='logement').transform('sum')
+    return pd.DataFrame({'consommation': conso, 'part': conso / total.replace(0, np.nan)})
+
+
+def rank_appliances(df, annee='an2', metric='part_moyenne'):
+    """
+    Classement des appareils sur l'ensemble des logements.
+
+    Args:
+    - df : DataFrame : Données chargées avec load_elecdom.
+    - annee : str : 'an1' ou 'an2'.
+    - metric : str : 'part_moyenne', 'consommation_moyenne' ou 'consommation_totale'.
+
+    Returns:
+    - DataFrame : Statistiques par appareil avec leur rang (1 = le plus consommateur).
+    """
+    parts = appliance_shares(df, annee).reset_index()
+    resultat = parts.groupby('appareil', observed=True).agg(
+        consommation_totale=('consommation', 'sum'), consommation_moyenne=('consommation', 'mean'),
+        part_moyenne=('part', 'mean'), nb_logements=('logement', 'nunique'))
+    if metric not in resultat.columns:
+        raise ValueError(f"Critère de classement inconnu : {metric}")
+    resultat['rang'] = resultat[metric].rank(ascending=False, method='min').astype('int64')
+    return resultat.sort_values('rang')
+
+
+class ElecDomQuery:
+    """
+    Point d'accès des tableaux de bord aux consommations ElecDom.
+
+    Les données sont chargées une seule fois ; les résultats de chaque requête sont mis en cache
+    puisqu'ils ne dépendent que des paramètres.
+    """
+
+    def __init__(self, csv_path=None, df=None):
+        if df is None:
+            if csv_path is None:
+                raise ValueError("Il faut fournir csv_path ou df")
+            df = load_elecdom(csv_path)
+        self.df = df
+        self._cache = {}
+
+    def _cached(self, cle, calcul):
+        if cle not in self._cache:
+            self._cache[cle] = calcul()
+        return self._cache[cle]
+
+    def appliances(self, manquants='exclure'):
+        """Comparaison AN1 → AN2 par appareil."""
+        return self._cached(('appareil', manquants), lambda: compare_years(self.df, 'appareil', manquants))
+
+    def households(self, manquants='exclure'):
+        """Comparaison AN1 → AN2 par logement (somme des appareils suivis)."""
+        return self._cached(('logement', manquants), lambda: compare_years(self.df, 'logement', manquants))
+
+    def breakdown(self, logement, annee='an2'):
+        """Répartition de la consommation d'un logement par appareil."""
+        parts = self._cached(('parts', annee), lambda: appliance_shares(self.df, annee))
+        if logement not in parts.index.get_level_values('logement'):
+            return parts.iloc[0:0].droplevel('logement')
+        return parts.xs(logement, level='logement').sort_values('consommation', ascending=False)
+
+    def ranking(self, annee='an2', metric='part_moyenne', top=None):
+        """Classement des appareils, éventuellement limité aux `top` premiers."""
+        classement = self._cached(('rang', annee, metric), lambda: rank_appliances(self.df, annee, metric))
+        return classement if top is None else classement.head(top)
+
+    def missing_report(self):
+        """Nombre de lignes par statut de suivi et par appareil."""
+        return self._cached(('suivi',), lambda: pd.crosstab(self.df['appareil'], self.df['suivi'])
+                            .reindex(columns=SUIVIS, fill_value=0))